@@ -5,21 +5,27 @@ Sistema Modo Examen - ESP32-CAM con YOLO
 
 import cv2
 import numpy as np
-from ultralytics import YOLO
 from datetime import datetime
 import os
+import sys
 import time
 import requests
 
+# Módulos compartidos con el servidor (api_proy_final/)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from frame_source import MjpegStreamReader
+from motion_gate import MotionGate
+from inference_backends import INFERENCE_BACKEND, load_model
+from detections import PROHIBITED, count_persons, parse_boxes, predict_kwargs, prohibited_mask
+
 # CONFIGURACIÓN
 ESP32_IP = "192.168.0.139"
 CAPTURE_URL = f"http://{ESP32_IP}/capture"
 CONFIDENCE = 0.45
 
-PROHIBITED = {
-    67: "Celular/Teléfono",
-    73: "Libro",
-}
+# "poll" = GET /capture por frame, "mjpeg" = conexión continua al stream (puerto 81)
+CAPTURE_MODE = os.getenv("CAPTURE_MODE", "poll").lower()
+STREAM_URL = f"http://{ESP32_IP}:81/stream"
 
 SAVE_PATH = "exam_logs/"
 IMAGES_PATH = f"{SAVE_PATH}images/"
@@ -37,10 +43,15 @@ class ExamMonitor:
         self.incident_count = 0
         self.person_count = 0
         self.led_available = False
+        self.stream = None
+        self.stream_seq = 0
+        
+        # Solo se corre YOLO cuando la escena cambia (o cada 5 s)
+        self.motion_gate = MotionGate(threshold=0.01, force_interval=5.0)
         
         # YOLO
-        print("\n📦 Cargando YOLO...")
-        self.model = YOLO('yolov8n.pt')
+        print(f"\n📦 Cargando YOLO (backend: {INFERENCE_BACKEND})...")
+        self.model = load_model(INFERENCE_BACKEND)
         print("✓ YOLO cargado")
         
         # Verificar ESP32
@@ -52,8 +63,14 @@ class ExamMonitor:
             print(f"✗ No conecta")
             exit(1)
         
+        # Stream MJPEG (opcional)
+        if CAPTURE_MODE == "mjpeg":
+            print(f"\n🎥 Conectando a stream MJPEG {STREAM_URL}...")
+            self.stream = MjpegStreamReader(STREAM_URL)
+            self.stream.start()
+        
         # Probar captura
-        print(f"\n📸 Probando /capture...")
+        print(f"\n📸 Probando captura ({CAPTURE_MODE})...")
         frame = self.capture_frame()
         if frame is None:
             print("✗ /capture no funciona")
@@ -85,7 +102,14 @@ class ExamMonitor:
         print("=" * 60 + "\n")
     
     def capture_frame(self):
-        """Capturar frame desde /capture"""
+        """Capturar frame desde /capture o desde el stream MJPEG"""
+        if self.stream is not None:
+            latest = self.stream.wait_for_frame(self.stream_seq, timeout=5)
+            if latest is None:
+                return None
+            jpeg_bytes, _, self.stream_seq = latest
+            return cv2.imdecode(np.frombuffer(jpeg_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        
         try:
             r = requests.get(CAPTURE_URL, timeout=2)
             if r.status_code != 200:
@@ -130,6 +154,7 @@ class ExamMonitor:
         self.exam_started = False
     
     def handle_incident(self, frame, items):
+        """items: arreglo estructurado con las detecciones prohibidas"""
         self.incident_count += 1
         ts = datetime.now()
         
@@ -149,8 +174,8 @@ class ExamMonitor:
         print(f"  ⏰ {ts.strftime('%H:%M:%S')}")
         print(f"  📍 Objetos detectados:")
         for item in items:
-            name = PROHIBITED.get(item['class_id'], item['name'])
-            print(f"     - {name.upper()} (confianza: {item['conf']:.0%})")
+            name = PROHIBITED[int(item['class_id'])]
+            print(f"     - {name.upper()} (confianza: {item['confidence']:.0%})")
         print(f"  💾 Imagen guardada: {filename}")
         print("🚨" * 30 + "\n")
     
@@ -190,20 +215,20 @@ class ExamMonitor:
         
         # Detecciones
         for det in detections:
-            x1, y1, x2, y2 = det['bbox']
+            x1, y1, x2, y2 = (int(v) for v in det['bbox'])
+            class_id = int(det['class_id'])
             
-            if det['prohibited']:
+            if class_id in PROHIBITED:
                 color = (0, 0, 255)
                 thickness = 3
-                name = PROHIBITED.get(det['class_id'], det['name'])
-                label = f"PROHIBIDO: {name.upper()} {det['conf']:.0%}"
+                label = f"PROHIBIDO: {PROHIBITED[class_id].upper()} {det['confidence']:.0%}"
                 # Parpadeo
                 if int(time.time() * 2) % 2 == 0:
                     thickness = 5
             else:
                 color = (0, 255, 0)
                 thickness = 2
-                label = f"{det['name']} {det['conf']:.0%}"
+                label = f"{self.model.names[class_id]} {det['confidence']:.0%}"
             
             cv2.rectangle(frame, (x1, y1), (x2, y2), color, thickness)
             
@@ -213,7 +238,7 @@ class ExamMonitor:
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
         
         # Alerta grande
-        proh = sum(1 for d in detections if d['prohibited'])
+        proh = int(prohibited_mask(detections).sum())
         if proh > 0 and self.exam_started:
             warn = f"⚠️ {proh} OBJETO(S) PROHIBIDO(S) DETECTADO(S) ⚠️"
             (tw, th), _ = cv2.getTextSize(warn, cv2.FONT_HERSHEY_SIMPLEX, 0.8, 3)
@@ -230,6 +255,7 @@ class ExamMonitor:
         fps = 0
         fps_count = 0
         fps_time = time.time()
+        detections = parse_boxes(None, CONFIDENCE)
         
         print("🎬 Iniciando vigilancia...")
         print("\n⚠️  IMPORTANTE: HAZ CLIC EN LA VENTANA 'Modo Examen'")
@@ -243,36 +269,17 @@ class ExamMonitor:
                     time.sleep(0.05)
                     continue
                 
-                # YOLO
-                results = self.model(frame, verbose=False)
-                
-                detections = []
-                self.person_count = 0
-                
-                for result in results:
-                    for box in result.boxes:
-                        conf = float(box.conf[0])
-                        if conf < CONFIDENCE:
-                            continue
-                        
-                        class_id = int(box.cls[0])
-                        class_name = self.model.names[class_id]
-                        x1, y1, x2, y2 = map(int, box.xyxy[0])
-                        
-                        if class_name == 'person':
-                            self.person_count += 1
-                        
-                        detections.append({
-                            'class_id': class_id,
-                            'name': class_name,
-                            'conf': conf,
-                            'bbox': (x1, y1, x2, y2),
-                            'prohibited': class_id in PROHIBITED
-                        })
+                # YOLO (se omite si la escena no cambió: se reusan las detecciones)
+                inferred = self.motion_gate.check(frame)
+                if inferred:
+                    result = self.model(frame, verbose=False, **predict_kwargs())[0]
+                    # Se dibuja todo lo que devuelva el modelo (todas las clases con YOLO_CLASS_FILTER=0)
+                    detections = parse_boxes(result.boxes, CONFIDENCE, classes=None)
+                    self.person_count = count_persons(detections)
                 
                 # Revisar incidentes
-                prohibited = [d for d in detections if d['prohibited']]
-                if prohibited and self.exam_started:
+                prohibited = detections[prohibited_mask(detections)]
+                if len(prohibited) and self.exam_started and inferred:
                     self.handle_incident(frame, prohibited)
                 
                 # Dibujar
@@ -312,6 +319,10 @@ class ExamMonitor:
         finally:
             if self.exam_started:
                 self.end_exam()
+            if self.stream is not None:
+                self.stream.stop()
+            gate = self.motion_gate.stats()
+            print(f"\n📉 YOLO: {gate['inferred']} frames inferidos, {gate['skipped']} omitidos sin movimiento")
             cv2.destroyAllWindows()
             print("\n✓ Sistema cerrado correctamente\n")
 
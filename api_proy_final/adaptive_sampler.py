@@ -0,0 +1,121 @@
+"""
+Muestreo adaptativo de frames
+Sube la frecuencia de captura cuando hubo actividad reciente (personas, objetos
+prohibidos o movimiento), la baja cuando la escena está tranquila y respeta un
+presupuesto global de CPU compartido por todas las sesiones del proceso
+"""
+
+from collections import deque
+import threading
+import time
+
+
+class CpuBudget:
+    """
+    Presupuesto global de tiempo de inferencia.
+
+    fraction es la parte del tiempo de pared que el modelo puede estar ocupado
+    (0.8 = 80 %). Cada llamada al modelo usa todos los núcleos, por eso se mide
+    tiempo de pared de inferencia y no tiempo por núcleo.
+    """
+
+    def __init__(self, fraction=0.8, window=10.0):
+        self.fraction = fraction
+        self.window = window
+        self._busy = deque()
+        self._lock = threading.Lock()
+
+    def record(self, seconds, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._busy.append((now, seconds))
+            self._trim(now)
+
+    def _trim(self, now):
+        while self._busy and now - self._busy[0][0] > self.window:
+            self._busy.popleft()
+
+    def utilization(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._trim(now)
+            return sum(s for _, s in self._busy) / self.window
+
+    def pressure(self, now=None):
+        """> 1 cuando se excede el presupuesto"""
+        if self.fraction <= 0:
+            return 1.0
+        return self.utilization(now) / self.fraction
+
+
+class AdaptiveSampler:
+    """
+    Intervalo entre capturas de una cámara.
+
+    - Actividad reciente (objetos prohibidos o personas en los últimos
+      activity_hold segundos): min_interval
+    - Movimiento alto: base_interval
+    - Escena tranquila: el intervalo crece gradualmente hasta max_interval
+    El resultado se multiplica por la presión del presupuesto de CPU si se excede.
+    """
+
+    def __init__(self, min_interval=0.2, base_interval=0.5, max_interval=2.0,
+                 activity_hold=10.0, motion_high=0.05, backoff=1.25, budget=None):
+        self.min_interval = min_interval
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.activity_hold = activity_hold
+        self.motion_high = motion_high
+        self.backoff = backoff
+        self.budget = budget
+
+        self._lock = threading.Lock()
+        self._last_activity = 0.0
+        self._quiet_interval = base_interval
+        self._interval = base_interval
+        self._level = "normal"
+        self._samples = deque(maxlen=200)
+
+    def observe(self, prohibited=0, persons=0, motion=0.0, now=None):
+        """Registrar lo visto en el último frame"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._samples.append(now)
+            if prohibited or persons:
+                self._last_activity = now
+            if motion >= self.motion_high:
+                self._quiet_interval = self.base_interval
+            else:
+                self._quiet_interval = min(self.max_interval, self._quiet_interval * self.backoff)
+
+    def next_interval(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            if now - self._last_activity <= self.activity_hold:
+                interval, level = self.min_interval, "active"
+            elif self._quiet_interval <= self.base_interval:
+                interval, level = self.base_interval, "motion"
+            else:
+                interval, level = self._quiet_interval, "quiet"
+
+            if self.budget is not None:
+                pressure = self.budget.pressure(now)
+                if pressure > 1.0:
+                    interval *= pressure
+                    level += "+cpu_limited"
+
+            self._interval = interval
+            self._level = level
+            return interval
+
+    def stats(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            recent = [t for t in self._samples if now - t <= 10.0]
+            return {
+                "level": self._level,
+                "interval_seconds": round(self._interval, 3),
+                "target_fps": round(1.0 / self._interval, 2) if self._interval > 0 else None,
+                "effective_fps": round(len(recent) / 10.0, 2),
+                "cpu_utilization": round(self.budget.utilization(now), 3) if self.budget else None,
+            }
@@ -0,0 +1,130 @@
+"""
+Almacenamiento de las grabaciones del micrófono
+Escribe WAV válidos mientras llega el stream (la cabecera se corrige al cerrar)
+y los comprime después a FLAC (sin pérdida) si está instalado soundfile
+"""
+
+import os
+import struct
+import wave
+
+import numpy as np
+
+from transcription import SAMPLE_RATE, SAMPLE_WIDTH
+
+# Representaciones guardadas, de la preferida a la original
+FORMATS = {
+    ".flac": "audio/flac",
+    ".wav": "audio/wav",
+}
+
+
+class WavRecorder:
+    """
+    WAV mono de 16 bits escrito por fragmentos.
+
+    Se escribe en <ruta>.part; close() corrige los tamaños de la cabecera
+    (wave lo hace al cerrar un archivo con seek) y renombra al nombre final,
+    así que nunca queda un .wav a medias con el nombre definitivo.
+    """
+
+    def __init__(self, path, sample_rate=SAMPLE_RATE):
+        self.path = path
+        self.part_path = f"{path}.part"
+        self.data_bytes = 0
+        self._wav = wave.open(self.part_path, "wb")
+        self._wav.setnchannels(1)
+        self._wav.setsampwidth(SAMPLE_WIDTH)
+        self._wav.setframerate(sample_rate)
+
+    def write(self, chunk):
+        self._wav.writeframesraw(chunk)
+        self.data_bytes += len(chunk)
+
+    def close(self):
+        self._wav.close()
+        os.replace(self.part_path, self.path)
+
+    def discard(self):
+        self._wav.close()
+        os.remove(self.part_path)
+
+
+def _data_chunk(path):
+    """(offset, tamaño) del chunk "data" de un WAV, o None si el archivo es PCM crudo"""
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            name, size = struct.unpack("<4sI", chunk)
+            if name == b"data":
+                return f.tell(), size
+            f.seek(size + (size & 1), os.SEEK_CUR)
+
+
+def pcm_memmap(path):
+    """Muestras int16 de una grabación sin cargarla en memoria (WAV o PCM crudo anterior)"""
+    data = _data_chunk(path)
+    offset, size = data if data else (0, os.path.getsize(path))
+    size = min(size, os.path.getsize(path) - offset)
+    return np.memmap(path, dtype=np.int16, mode="r", offset=offset, shape=(size // SAMPLE_WIDTH,))
+
+
+def flac_available():
+    """soundfile (libsndfile) instalado: sin él no se comprime"""
+    try:
+        import soundfile  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def compress_to_flac(wav_path, keep_wav=False, block_frames=SAMPLE_RATE * 10):
+    """
+    Transcodificar a FLAC junto al WAV; devuelve la ruta del FLAC o None si
+    soundfile no está instalado.
+
+    Se verifica el número de muestras antes de borrar el WAV.
+    """
+    try:
+        import soundfile
+    except ImportError:
+        return None
+
+    stem, _ = os.path.splitext(wav_path)
+    flac_path = f"{stem}.flac"
+    part_path = f"{flac_path}.part"
+    pcm = pcm_memmap(wav_path)
+    with soundfile.SoundFile(part_path, "w", samplerate=SAMPLE_RATE, channels=1,
+                             subtype="PCM_16", format="FLAC") as out:
+        for start in range(0, len(pcm), block_frames):
+            out.write(np.asarray(pcm[start:start + block_frames]))
+    del pcm
+
+    if soundfile.info(part_path).frames != len(pcm_memmap(wav_path)):
+        os.remove(part_path)
+        raise ValueError(f"FLAC incompleto para {wav_path}")
+    os.replace(part_path, flac_path)
+    if not keep_wav:
+        os.remove(wav_path)
+    return flac_path
+
+
+def stored_recording(audio_dir, filename):
+    """
+    (nombre guardado, mimetype) de una grabación pedida como rec_x.wav.
+
+    Se prefiere el archivo pedido si existe; si no, la versión comprimida.
+    None si no hay ninguna.
+    """
+    stem, ext = os.path.splitext(filename)
+    if ext not in FORMATS or os.path.basename(filename) != filename:
+        return None
+    for name in [filename] + [stem + e for e in FORMATS if e != ext]:
+        if os.path.isfile(os.path.join(audio_dir, name)):
+            return name, FORMATS[os.path.splitext(name)[1]]
+    return None
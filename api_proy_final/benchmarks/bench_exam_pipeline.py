@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Benchmark de extremo a extremo del servidor de detección de examen
+
+Levanta localmente:
+  - una ESP32-CAM simulada (/capture, /led, /, /stream) que sirve JPEG grabados
+    con latencia y jitter configurables
+  - un backend Node.js simulado (/api/exam-alerts)
+  - un emulador mínimo de Google Cloud Storage (STORAGE_EMULATOR_HOST)
+
+y ejecuta server_exam_detection.py contra ellos, reportando fps, latencias por
+etapa (p50/p95), CPU y memoria RSS. Funciona sin red, así que sirve como
+compuerta de regresión:
+
+    python benchmarks/bench_exam_pipeline.py --duration 30 --cameras 2 --min-fps 5
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_IMAGES = os.path.join(ROOT, "ESP32CAM_ModoExamen", "exam_logs", "images")
+STREAM_BOUNDARY = "123456789000000000000987654321"  # el mismo de app_httpd.cpp
+
+
+# ==================== SERVIDORES SIMULADOS ====================
+
+class Counters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, name, n=1):
+        with self._lock:
+            self.values[name] = self.values.get(name, 0) + n
+
+
+def make_esp32_handler(images, latency, jitter, counters):
+    frames = itertools.cycle(images)
+    lock = threading.Lock()
+
+    def next_frame():
+        with lock:
+            return next(frames)
+
+    def delay():
+        time.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+
+    class Esp32Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, body, content_type):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == "/capture":
+                counters.inc("esp32_capture")
+                delay()
+                self._send(next_frame(), "image/jpeg")
+            elif path == "/led":
+                counters.inc("esp32_led")
+                self._send(b"OK", "text/plain")
+            elif path == "/stream":
+                counters.inc("esp32_stream_connections")
+                self._stream()
+            else:
+                self._send(b"<html>ESP32-CAM simulada</html>", "text/html")
+
+        def _stream(self):
+            self.send_response(200)
+            self.send_header("Content-Type", f"multipart/x-mixed-replace;boundary={STREAM_BOUNDARY}")
+            self.end_headers()
+            try:
+                while True:
+                    delay()
+                    jpg = next_frame()
+                    self.wfile.write(f"\r\n--{STREAM_BOUNDARY}\r\n".encode())
+                    self.wfile.write(f"Content-Type: image/jpeg\r\nContent-Length: {len(jpg)}\r\n\r\n".encode())
+                    self.wfile.write(jpg)
+                    counters.inc("esp32_stream_frames")
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    return Esp32Handler
+
+
+def make_backend_handler(counters):
+    class BackendHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, name):
+            length = int(self.headers.get("Content-Length", 0))
+            self.rfile.read(length)
+            counters.inc(name)
+            counters.inc(f"{name}_bytes", length)
+            body = b'{"status":"ok"}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            self._reply("backend_alerts")
+
+        def do_PATCH(self):
+            self._reply("backend_updates")
+
+        def log_message(self, *args):
+            pass
+
+    return BackendHandler
+
+
+def make_gcs_handler(counters):
+    class GcsHandler(BaseHTTPRequestHandler):
+        """Responde a subidas del cliente JSON de google-cloud-storage"""
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            self.rfile.read(length)
+            counters.inc("gcs_uploads")
+            counters.inc("gcs_bytes", length)
+            body = json.dumps({"name": "object", "bucket": "bench", "size": str(length)}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return GcsHandler
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # El servidor de examen cierra conexiones al detenerse; no es un error del benchmark
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def serve(handler):
+    server = QuietServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"127.0.0.1:{server.server_address[1]}"
+
+
+# ==================== MÉTRICAS DEL PROCESO ====================
+
+def proc_sample(pid):
+    """(segundos de CPU acumulados, RSS en MB) desde /proc (solo Linux)"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        rss = None
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1]) / 1024.0
+        return cpu, rss
+    except (OSError, IndexError, ValueError):
+        return None, None
+
+
+def wait_for_server(url, proc, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"El servidor terminó al arrancar (código {proc.returncode})")
+        try:
+            r = requests.get(f"{url}/ready", timeout=1)
+            if r.status_code == 200:
+                return r.json()
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise SystemExit("El servidor no estuvo listo (/ready) a tiempo")
+
+
+# ==================== BENCHMARK ====================
+
+def run(args):
+    images = []
+    for name in sorted(os.listdir(args.images)):
+        if name.lower().endswith((".jpg", ".jpeg")):
+            with open(os.path.join(args.images, name), "rb") as f:
+                images.append(f.read())
+    if not images:
+        raise SystemExit(f"No hay JPEG en {args.images}")
+
+    counters = Counters()
+    servers = [
+        serve(make_esp32_handler(images, args.latency / 1000.0, args.jitter / 1000.0, counters)),
+        serve(make_backend_handler(counters)),
+        serve(make_gcs_handler(counters)),
+    ]
+    esp32_addr, backend_addr, gcs_addr = (addr for _, addr in servers)
+
+    camera_ids = [f"bench{i}" for i in range(args.cameras)]
+    port = args.port
+    spool = tempfile.mkdtemp(prefix="bench_spool_")
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        ESP32_IP=esp32_addr,
+        ESP32_STREAM_URL=f"http://{esp32_addr}/stream",
+        NODE_BACKEND_URL=f"http://{backend_addr}",
+        STORAGE_EMULATOR_HOST=f"http://{gcs_addr}",
+        GCS_BUCKET="bench",
+        INCIDENT_SPOOL_DIR=spool,
+        EXAM_STATE_DB=os.path.join(spool, "exam_state.db"),
+        CAPTURE_MODE=args.capture_mode,
+        CAPTURE_INTERVAL=str(args.interval),
+        SAMPLE_MIN_INTERVAL=str(args.interval),
+        MOTION_GATE="1" if args.motion_gate else "0",
+        PYTHONUNBUFFERED="1",
+    )
+    env.pop("GOOGLE_CLOUD_CREDENTIALS", None)
+
+    log = open(args.log, "w") if args.log else subprocess.DEVNULL
+    started = time.time()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "server_exam_detection.py")],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    url = f"http://127.0.0.1:{port}"
+
+    try:
+        ready = wait_for_server(url, proc, args.startup_timeout)
+        startup_seconds = time.time() - started
+
+        for cam in camera_ids:
+            requests.post(f"{url}/api/cameras", json={
+                "id": cam, "ip": esp32_addr, "stream_url": f"http://{esp32_addr}/stream"
+            }, timeout=5).raise_for_status()
+            r = requests.post(f"{url}/api/exam/{cam}/start", timeout=30)
+            r.raise_for_status()
+
+        # Descartar el arranque en frío antes de medir
+        time.sleep(args.warmup)
+        before = {cam: requests.get(f"{url}/api/exam/{cam}/status", timeout=5).json() for cam in camera_ids}
+        cpu0, _ = proc_sample(proc.pid)
+        t0 = time.time()
+
+        rss_samples = []
+        while time.time() - t0 < args.duration:
+            _, rss = proc_sample(proc.pid)
+            if rss is not None:
+                rss_samples.append(rss)
+            time.sleep(0.5)
+
+        elapsed = time.time() - t0
+        cpu1, _ = proc_sample(proc.pid)
+        after = {cam: requests.get(f"{url}/api/exam/{cam}/status", timeout=5).json() for cam in camera_ids}
+        inference = requests.get(f"{url}/api/inference/stats", timeout=5).json()
+        dispatcher = requests.get(f"{url}/api/exam/dispatcher", timeout=5).json()
+
+        for cam in camera_ids:
+            requests.post(f"{url}/api/exam/{cam}/stop", timeout=30)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        for server, _ in servers:
+            server.shutdown()
+
+    def processed(status, stage):
+        return status["pipeline"]["stages"][stage]["processed"]
+
+    per_camera = {}
+    total_frames = 0
+    for cam in camera_ids:
+        frames = processed(after[cam], "infer") - processed(before[cam], "infer")
+        total_frames += frames
+        per_camera[cam] = {
+            "fps": round(frames / elapsed, 2),
+            "stages": after[cam]["pipeline"]["stages"],
+            "queues": after[cam]["pipeline"]["queues"],
+            "motion_gate": after[cam].get("motion_gate"),
+            "incidents": after[cam]["incident_count"],
+        }
+
+    report = {
+        "duration_seconds": round(elapsed, 1),
+        "startup_seconds": round(startup_seconds, 2),
+        "startup_phases": ready.get("startup"),
+        "cameras": args.cameras,
+        "capture_mode": args.capture_mode,
+        "fps_total": round(total_frames / elapsed, 2),
+        "fps_per_camera": round(total_frames / elapsed / args.cameras, 2),
+        "cpu_percent": round(100.0 * (cpu1 - cpu0) / elapsed, 1) if cpu0 is not None and cpu1 is not None else None,
+        "rss_mb_max": round(max(rss_samples), 1) if rss_samples else None,
+        "inference": inference,
+        "dispatcher": dispatcher,
+        "stubs": counters.values,
+        "per_camera": per_camera,
+    }
+    return report
+
+
+def print_report(report):
+    print(f"\n{'=' * 60}")
+    print(f"  📊 Benchmark servidor de examen ({report['cameras']} cámara(s), {report['capture_mode']})")
+    print(f"{'=' * 60}")
+    phases = report.get("startup_phases") or {}
+    print(f"  Arranque:        {report['startup_seconds']} s hasta /ready  (import {phases.get('import_seconds')} s, "
+          f"modelo {phases.get('model_load_seconds')} s, warm-up {phases.get('warmup_seconds')} s)")
+    print(f"  fps total:       {report['fps_total']}  ({report['fps_per_camera']} por cámara)")
+    print(f"  CPU:             {report['cpu_percent']} %")
+    print(f"  RSS máx.:        {report['rss_mb_max']} MB")
+    inf = report["inference"]
+    print(f"  Lote medio:      {inf['avg_batch_size']}  (inferencia p50/p95: "
+          f"{inf['batch_infer_ms_p50']}/{inf['batch_infer_ms_p95']} ms)")
+    disp = report["dispatcher"]
+    print(f"  Entregas:        {disp['delivered']} ok, {disp['failed']} fallidas, "
+          f"p50/p95 {disp['deliver_ms_p50']}/{disp['deliver_ms_p95']} ms")
+    for cam, data in report["per_camera"].items():
+        print(f"\n  [{cam}] {data['fps']} fps, {data['incidents']} incidente(s)")
+        for stage, s in data["stages"].items():
+            print(f"     {stage:<9} p50 {s['ms_p50']:>7} ms   p95 {s['ms_p95']:>7} ms   ({s['processed']} frames)")
+    print(f"{'=' * 60}\n")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark de extremo a extremo de server_exam_detection.py")
+    parser.add_argument("--images", default=DEFAULT_IMAGES, help="Carpeta con JPEG grabados")
+    parser.add_argument("--cameras", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=20.0, help="Segundos de medición")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Segundos descartados al inicio")
+    parser.add_argument("--latency", type=float, default=50.0, help="Latencia simulada de la ESP32 (ms)")
+    parser.add_argument("--jitter", type=float, default=20.0, help="Jitter simulado (ms)")
+    parser.add_argument("--capture-mode", choices=["poll", "mjpeg"], default="poll")
+    parser.add_argument("--interval", type=float, default=0.0, help="CAPTURE_INTERVAL (0 = lo más rápido posible)")
+    parser.add_argument("--motion-gate", action="store_true", help="Activar el filtro de movimiento")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--log", help="Archivo para la salida del servidor")
+    parser.add_argument("--json", help="Guardar el reporte completo en JSON")
+    parser.add_argument("--min-fps", type=float, help="Falla si fps por cámara queda por debajo")
+    parser.add_argument("--max-infer-p95-ms", type=float, help="Falla si la etapa de inferencia p95 lo supera")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failures = []
+    if args.min_fps is not None and report["fps_per_camera"] < args.min_fps:
+        failures.append(f"fps por cámara {report['fps_per_camera']} < {args.min_fps}")
+    if args.max_infer_p95_ms is not None:
+        for cam, data in report["per_camera"].items():
+            p95 = data["stages"]["infer"]["ms_p95"]
+            if p95 > args.max_infer_p95_ms:
+                failures.append(f"[{cam}] inferencia p95 {p95} ms > {args.max_infer_p95_ms} ms")
+
+    if failures:
+        print("✗ Regresión detectada:")
+        for failure in failures:
+            print(f"   - {failure}")
+        sys.exit(1)
+    print("✓ Benchmark dentro de los límites")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Comprobación de la transcripción en streaming con una pausa larga a mitad de
+la grabación
+
+Simula la subida del ESP32 en tiempo real (voz, silencio, voz) pasando por el
+VAD igual que server_micro.py, con un LocalRecognizer que falla como Google si
+su stream pasa más de --recognizer-timeout segundos sin audio. Sin red:
+
+    python benchmarks/check_stream_pause.py --pause 12
+
+Los tiempos se pueden comprimir con --speed (ej. 4 = cuatro veces más rápido;
+los timeouts y el umbral de pausa del stream se escalan igual).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from transcription import (  # noqa: E402
+    BYTES_PER_SECOND, SAMPLE_RATE, STREAM_MAX_PAUSE_SECONDS, LocalRecognizer, StreamingTranscription
+)
+from voice_activity import VoiceActivityDetector  # noqa: E402
+
+CHUNK = 4096  # tamaño de lectura de /upload_stream
+
+
+def make_recording(speech, pause, seed=0):
+    """Voz sintética (tono modulado), silencio con ruido de fondo y otra vez voz"""
+    rng = np.random.default_rng(seed)
+
+    def voice(seconds):
+        t = np.arange(int(seconds * SAMPLE_RATE))
+        return np.sin(t * 2 * np.pi * 180 / SAMPLE_RATE) * 3000 * (0.6 + 0.4 * np.sin(t / 800))
+
+    parts = [voice(speech), np.zeros(int(pause * SAMPLE_RATE)), voice(speech)]
+    pcm = np.concatenate(parts) + rng.normal(0, 60, sum(len(p) for p in parts))
+    return pcm.astype(np.int16).tobytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--speech", type=float, default=3.0, help="segundos de voz antes y después de la pausa")
+    parser.add_argument("--pause", type=float, default=12.0, help="segundos de silencio a mitad de la grabación")
+    parser.add_argument("--recognizer-timeout", type=float, default=10.0,
+                        help="segundos sin audio tras los que el stream simulado falla (Google: ~10)")
+    parser.add_argument("--speed", type=float, default=1.0, help="factor de aceleración del tiempo real")
+    args = parser.parse_args()
+
+    audio = make_recording(args.speech, args.pause)
+    recognizer = LocalRecognizer(max_idle=args.recognizer_timeout / args.speed)
+    streaming = StreamingTranscription(recognizer, max_pause_seconds=STREAM_MAX_PAUSE_SECONDS / args.speed)
+    vad = VoiceActivityDetector()
+
+    def on_audio(pieces):
+        for at, chunk in pieces:
+            streaming.feed(chunk, at)
+
+    t0 = time.monotonic()
+    for i in range(0, len(audio), CHUNK):
+        chunk = audio[i:i + CHUNK]
+        on_audio(vad.feed(chunk))
+        # La subida llega al ritmo en que el micrófono graba
+        target = t0 + (i + len(chunk)) / BYTES_PER_SECOND / args.speed
+        time.sleep(max(0.0, target - time.monotonic()))
+    on_audio(vad.flush())
+
+    try:
+        text, timeline = streaming.finish(timeout=30)
+    except Exception as e:
+        print(f"FALLO: {type(e).__name__}: {e}")
+        return 1
+
+    for seg in timeline:
+        print(f"  {seg['start']:7.2f}-{seg['end']:7.2f} s  {seg['text']}")
+    print(f"Texto: {text}")
+    print(f"Streams: {len(timeline)}")
+    if len(timeline) < 2:
+        print("FALLO: la pausa no cerró el stream")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -21,6 +21,7 @@ interface ExamAlert {
 }
 
 interface ExamStatus {
+    camera_id?: string;
     active: boolean;
     start_time?: string;
     elapsed_seconds?: number;
@@ -35,38 +36,70 @@ export function ExamMonitor() {
     const [error, setError] = useState<string | null>(null);
     const [attendanceActive, setAttendanceActive] = useState(false);
 
-    // Polling para obtener estado del examen
+    const fetchAlerts = async () => {
+        try {
+            const response = await fetch(`${API_URL}/api/exam-alerts?limit=20`);
+            const data = await response.json();
+            setAlerts(data);
+        } catch (err) {
+            console.error('Error fetching alerts:', err);
+        }
+    };
+
+    // Estado del examen e incidentes en vivo (SSE) en lugar de polling
     useEffect(() => {
-        const fetchStatus = async () => {
-            try {
-                const response = await fetch(`${API_URL}/api/exam/status`);
-                const data = await response.json();
-                setExamStatus(data);
-            } catch (err) {
-                console.error('Error fetching exam status:', err);
-            }
+        // Cámara de este monitor; hasta conocerla se ignoran los eventos de estado
+        // (el stream trae los de todas las cámaras)
+        let cameraId: string | undefined;
+
+        const loadStatus = () => {
+            fetch(`${API_URL}/api/exam/status`)
+                .then(response => response.json())
+                .then((data: ExamStatus) => {
+                    cameraId = data.camera_id;
+                    setExamStatus(data);
+                })
+                .catch(err => console.error('Error fetching exam status:', err));
         };
+        loadStatus();
 
-        fetchStatus();
-        const interval = setInterval(fetchStatus, 2000); // Cada 2 segundos
+        const events = new EventSource(`${API_URL}/api/exam/events`);
+        events.onopen = () => {
+            // Reintentar si la primera consulta falló
+            if (!cameraId) loadStatus();
+        };
+        events.addEventListener('status', (e) => {
+            const data: ExamStatus = JSON.parse((e as MessageEvent).data);
+            if (cameraId && data.camera_id === cameraId) {
+                setExamStatus(data);
+            }
+        });
+        events.addEventListener('incident', (e) => {
+            const data = JSON.parse((e as MessageEvent).data);
+            if (cameraId && data.camera_id === cameraId) {
+                setExamStatus(prev => ({ ...prev, incident_count: data.incident_number }));
+            }
+            // La alerta llega a la base de datos cuando el servidor la entrega
+            setTimeout(fetchAlerts, 2000);
+        });
 
-        return () => clearInterval(interval);
+        return () => events.close();
     }, []);
 
-    // Obtener alertas
+    // Tiempo transcurrido calculado localmente a partir de start_time
     useEffect(() => {
-        const fetchAlerts = async () => {
-            try {
-                const response = await fetch(`${API_URL}/api/exam-alerts?limit=20`);
-                const data = await response.json();
-                setAlerts(data);
-            } catch (err) {
-                console.error('Error fetching alerts:', err);
-            }
-        };
+        if (!examStatus.active || !examStatus.start_time) return;
+        const started = new Date(examStatus.start_time).getTime();
+        const interval = setInterval(() => {
+            setExamStatus(prev => ({ ...prev, elapsed_seconds: (Date.now() - started) / 1000 }));
+        }, 1000);
+        return () => clearInterval(interval);
+    }, [examStatus.active, examStatus.start_time]);
 
+    // Obtener alertas (respaldo por si se pierde algún evento)
+    useEffect(() => {
         fetchAlerts();
-        const interval = setInterval(fetchAlerts, 5000); // Cada 5 segundos
+        const interval = setInterval(fetchAlerts, 30000); // Cada 30 segundos
 
         return () => clearInterval(interval);
     }, []);
@@ -116,9 +149,16 @@ export function ExamMonitor() {
 
     const takeSnapshot = async () => {
         try {
-            const response = await fetch(`${API_URL}/api/exam/snapshot`);
-            const data = await response.json();
-            setSnapshot(data.image);
+            // JPEG binario: el navegador revalida con If-None-Match y recibe 304 si no cambió
+            const response = await fetch(`${API_URL}/api/exam/snapshot.jpg`, { cache: 'no-cache' });
+            if (!response.ok) {
+                throw new Error('Failed to get snapshot');
+            }
+            const blob = await response.blob();
+            setSnapshot(prev => {
+                if (prev) URL.revokeObjectURL(prev);
+                return URL.createObjectURL(blob);
+            });
         } catch (err) {
             console.error('Error taking snapshot:', err);
         }
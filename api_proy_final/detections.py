@@ -0,0 +1,86 @@
+"""
+Post-procesamiento de resultados de YOLO compartido por el servidor y el script local
+Filtra por confianza y clase con operaciones sobre los tensores completos de
+result.boxes (sin recorrer caja por caja) y devuelve un arreglo estructurado compacto
+"""
+
+import os
+
+import numpy as np
+
+PERSON = 0
+
+PROHIBITED = {
+    67: "Celular/Teléfono",
+    73: "Libro",
+}
+
+# Clases que le interesan al modo examen (persona, celular, libro)
+WATCHED_CLASSES = [PERSON, *PROHIBITED]
+
+# Pedir al modelo solo esas clases (se descartan las demás en el NMS)
+YOLO_CLASS_FILTER = os.getenv("YOLO_CLASS_FILTER", "1") == "1"
+
+DETECTION_DTYPE = np.dtype([
+    ("class_id", np.int16),
+    ("confidence", np.float32),
+    ("bbox", np.int32, (4,)),  # x1, y1, x2, y2 en píxeles de la imagen original
+])
+
+_PROHIBITED_IDS = np.array(list(PROHIBITED), dtype=np.int16)
+
+
+def predict_kwargs():
+    """Argumentos extra para model(...) / make_infer_fn"""
+    return {"classes": WATCHED_CLASSES} if YOLO_CLASS_FILTER else {}
+
+
+def _to_numpy(values):
+    # Tensores de torch (posiblemente en GPU) o arreglos ya en numpy
+    if hasattr(values, "cpu"):
+        values = values.cpu().numpy()
+    return np.asarray(values)
+
+
+def parse_boxes(boxes, confidence, classes=WATCHED_CLASSES, scale=1.0):
+    """
+    Detecciones de un resultado como arreglo estructurado DETECTION_DTYPE.
+
+    classes=None conserva todas las clases; scale lleva las cajas a la
+    resolución original cuando el frame se decodificó reducido.
+    """
+    if boxes is None or len(boxes) == 0:
+        return np.empty(0, dtype=DETECTION_DTYPE)
+
+    conf = _to_numpy(boxes.conf).reshape(-1)
+    cls = _to_numpy(boxes.cls).reshape(-1).astype(np.int16)
+    keep = conf >= confidence
+    if classes is not None:
+        keep &= np.isin(cls, classes)
+
+    out = np.empty(int(keep.sum()), dtype=DETECTION_DTYPE)
+    out["class_id"] = cls[keep]
+    out["confidence"] = conf[keep]
+    out["bbox"] = _to_numpy(boxes.xyxy).reshape(-1, 4)[keep] * scale
+    return out
+
+
+def prohibited_mask(dets):
+    return np.isin(dets["class_id"], _PROHIBITED_IDS)
+
+
+def count_persons(dets):
+    return int(np.count_nonzero(dets["class_id"] == PERSON))
+
+
+def as_dicts(dets, names):
+    """Filas como dicts de tipos nativos (para el tracker y JSON)"""
+    return [
+        {
+            "class_id": int(class_id),
+            "name": names[int(class_id)],
+            "confidence": float(conf),
+            "bbox": tuple(int(v) for v in bbox),
+        }
+        for class_id, conf, bbox in zip(dets["class_id"], dets["confidence"], dets["bbox"])
+    ]
@@ -0,0 +1,181 @@
+"""
+Canal local entre los workers HTTP y el proceso del motor de detección
+El motor (modelo YOLO, pipelines, tracker, entregas) vive en un solo proceso;
+los workers de gunicorn le envían operaciones por multiprocessing.connection y
+reciben los eventos SSE por una suscripción que reparten a sus propios clientes
+"""
+
+from multiprocessing.connection import Client, Listener
+import queue
+import threading
+import time
+
+
+def parse_address(address):
+    """"host:puerto" → tupla para TCP; cualquier otra cadena es un socket Unix"""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        return (host or "127.0.0.1", int(port))
+    return address
+
+
+class EngineUnavailable(Exception):
+    """El proceso del motor no responde"""
+
+
+class RemoteError(Exception):
+    """Una operación falló dentro del motor"""
+
+
+class EngineServer:
+    """
+    Atiende operaciones de los workers en el proceso del motor.
+
+    ops es un dict nombre → función; cada conexión se atiende en su propio
+    hilo. Mensajes:
+      ("call", op, args)          → ("ok", resultado) | ("error", mensaje)
+      ("subscribe", last_id)      → flujo de (event_id, mensaje) o None (heartbeat)
+    """
+
+    def __init__(self, address, authkey, ops, broadcaster):
+        self.address = parse_address(address)
+        self.authkey = authkey
+        self.ops = ops
+        self.broadcaster = broadcaster
+        self.connections = 0
+
+    def serve_forever(self):
+        with Listener(self.address, authkey=self.authkey) as listener:
+            print(f"✓ Motor escuchando en {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    # Cliente con authkey incorrecta o que cerró durante el handshake
+                    print(f"⚠️ Conexión al motor rechazada: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        self.connections += 1
+        try:
+            while True:
+                message = conn.recv()
+                if message[0] == "subscribe":
+                    self._stream_events(conn, message[1])
+                    return
+                _, op, args = message
+                try:
+                    conn.send(("ok", self.ops[op](*args)))
+                except Exception as e:
+                    conn.send(("error", f"{type(e).__name__}: {e}"))
+        except (EOFError, OSError):
+            pass
+        finally:
+            self.connections -= 1
+            conn.close()
+
+    def _stream_events(self, conn, last_event_id):
+        q = self.broadcaster.subscribe(last_event_id)
+        try:
+            while True:
+                conn.send(q.get(timeout=self.broadcaster.heartbeat))
+        finally:
+            self.broadcaster.unsubscribe(q)
+
+
+class EngineClient:
+    """Cliente del motor para un worker HTTP (pool de conexiones reutilizables)"""
+
+    def __init__(self, address, authkey, timeout=60.0, connect_timeout=10.0):
+        self.address = parse_address(address)
+        self.authkey = authkey
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._pool = queue.LifoQueue()
+
+    def _connect(self):
+        # El motor puede estar arrancando: reintentar un momento
+        deadline = time.time() + self.connect_timeout
+        while True:
+            try:
+                return Client(self.address, authkey=self.authkey)
+            except (ConnectionError, FileNotFoundError) as e:
+                if time.time() >= deadline:
+                    raise EngineUnavailable(f"Motor no disponible en {self.address}: {e}")
+                time.sleep(0.2)
+
+    def call(self, op, *args, timeout=None):
+        """Ejecutar una operación en el motor y devolver su resultado"""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            conn.send(("call", op, args))
+            if not conn.poll(timeout or self.timeout):
+                raise EngineUnavailable(f"El motor no respondió a '{op}'")
+            status, result = conn.recv()
+        except (EOFError, OSError, EngineUnavailable):
+            conn.close()
+            # El motor pudo reiniciarse: las demás conexiones del pool también
+            # quedaron muertas, la siguiente llamada abre una nueva
+            self._drain()
+            raise
+        self._pool.put(conn)
+        if status == "error":
+            raise RemoteError(result)
+        return result
+
+    def _drain(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def subscribe(self, last_event_id=None):
+        """Generador de (event_id, mensaje SSE); None = heartbeat"""
+        conn = self._connect()
+        try:
+            conn.send(("subscribe", last_event_id))
+            while True:
+                yield conn.recv()
+        finally:
+            conn.close()
+
+
+class EventRelay:
+    """
+    Reenvía los eventos del motor al EventBroadcaster local de un worker.
+
+    Una sola suscripción por worker, sin importar cuántos dashboards estén
+    conectados a ese worker; al reconectar pide los eventos perdidos.
+    """
+
+    def __init__(self, client, broadcaster, retry_delay=1.0):
+        self.client = client
+        self.broadcaster = broadcaster
+        self.retry_delay = retry_delay
+        self.last_event_id = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                for item in self.client.subscribe(self.last_event_id):
+                    if item is None:
+                        continue
+                    event_id, message = item
+                    self.last_event_id = event_id
+                    self.broadcaster.relay(event_id, message)
+            except Exception as e:
+                print(f"⚠️ Relay de eventos desconectado: {e}")
+            time.sleep(self.retry_delay)
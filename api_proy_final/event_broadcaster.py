@@ -0,0 +1,92 @@
+"""
+Difusión de eventos a dashboards (Server-Sent Events)
+Un productor serializa cada evento una sola vez y lo reparte a todos los
+suscriptores; cada suscriptor tiene su propia cola acotada para que un cliente
+lento no frene a los demás
+"""
+
+from collections import deque
+import itertools
+import json
+import threading
+
+from exam_pipeline import DropOldestQueue
+
+
+class EventBroadcaster:
+    """
+    Fan-out de eventos SSE.
+
+    history guarda los últimos eventos para reenviarlos a un cliente que se
+    reconecta con Last-Event-ID; heartbeat es el intervalo (segundos) de los
+    comentarios que mantienen viva la conexión detrás de proxies.
+    """
+
+    def __init__(self, queue_size=100, history=50, heartbeat=15.0):
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self._ids = itertools.count(1)
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def publish(self, event, data):
+        """Serializar una vez y encolar para todos los suscriptores"""
+        with self._lock:
+            event_id = next(self._ids)
+        message = f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        self.relay(event_id, message)
+        return event_id
+
+    def relay(self, event_id, message):
+        """Repartir un evento ya serializado (ej. recibido de otro proceso)"""
+        item = (event_id, message)
+        with self._lock:
+            self._history.append(item)
+            self.published += 1
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            q.put(item)
+
+    def subscribe(self, last_event_id=None):
+        """Nueva cola de (event_id, mensaje) con los eventos perdidos desde last_event_id"""
+        q = DropOldestQueue(self.queue_size)
+        with self._lock:
+            if last_event_id is not None:
+                for item in self._history:
+                    if item[0] > last_event_id:
+                        q.put(item)
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def stream(self, last_event_id=None, initial=()):
+        """
+        Generador de texto SSE para una respuesta HTTP.
+
+        initial son pares (evento, datos) enviados solo a este cliente al
+        conectarse (ej. el estado actual de las sesiones).
+        """
+        q = self.subscribe(last_event_id)
+        try:
+            yield "retry: 3000\n\n"
+            for event, data in initial:
+                yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+            while True:
+                item = q.get(timeout=self.heartbeat)
+                yield item[1] if item is not None else ": ping\n\n"
+        finally:
+            self.unsubscribe(q)
+
+    def stats(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {
+            "subscribers": len(subscribers),
+            "published": self.published,
+            "dropped": sum(q.dropped for q in subscribers),
+        }
@@ -0,0 +1,258 @@
+"""
+Pipeline de monitoreo por cámara
+captura → decodificación → inferencia → incidentes, cada etapa en su propio hilo
+y conectadas por colas acotadas (se descarta el frame más viejo si una etapa se atrasa;
+los incidentes nunca se descartan)
+"""
+
+from collections import deque
+import threading
+import time
+
+from inference_scheduler import percentile
+
+
+class _StageQueue:
+    """Cola entre etapas; las subclases deciden qué hacer al pasar de maxsize"""
+
+    def __init__(self, maxsize):
+        self.maxsize = max(1, int(maxsize))
+        self._items = deque()
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def get(self, timeout=None):
+        """Devuelve el siguiente elemento o None si se agota el timeout"""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def qsize(self):
+        with self._cond:
+            return len(self._items)
+
+
+class DropOldestQueue(_StageQueue):
+    """Cola acotada: al llenarse descarta el elemento más viejo en lugar de bloquear"""
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+
+class EventQueue(_StageQueue):
+    """
+    Cola sin pérdida para eventos (incidentes): nunca descarta.
+
+    Un evento ya se registró en el tracker cuando llega aquí, así que perderlo
+    sería un incidente perdido; pasar de maxsize solo se cuenta y se avisa.
+    """
+
+    def __init__(self, maxsize, name="eventos"):
+        super().__init__(maxsize)
+        self.name = name
+        self.overflows = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self.overflows += 1
+                if self.overflows == 1 or self.overflows % 100 == 0:
+                    print(f"⚠️ Cola de {self.name} desbordada ({len(self._items) + 1} pendientes, "
+                          f"{self.overflows} desbordes): la etapa no da abasto")
+            self._items.append(item)
+            self._cond.notify()
+
+
+class StageStats:
+    """Contadores de una etapa del pipeline"""
+
+    def __init__(self, window=300):
+        self.processed = 0
+        self.errors = 0
+        self._times = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.processed += 1
+            self._times.append(seconds)
+
+    def error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            times = list(self._times)
+        return {
+            "processed": self.processed,
+            "errors": self.errors,
+            "ms_p50": round(percentile(times, 50) * 1000, 1),
+            "ms_p95": round(percentile(times, 95) * 1000, 1),
+        }
+
+
+class CameraPipeline:
+    """
+    Etapas concurrentes para una cámara.
+
+    capture_fn()              -> bytes JPEG o None
+    decode_fn(raw)            -> frame o None
+    infer_fn(frame)           -> lista de objetos prohibidos (vacía si no hay)
+    incident_fn(frame, items) -> procesa el incidente (LED, subida, backend)
+
+    interval puede ser un número fijo o una función que devuelve los segundos
+    hasta la siguiente captura (muestreo adaptativo).
+
+    stop() espera a las etapas: los incidentes que la inferencia ya generó se
+    procesan antes de que termine la etapa de incidentes (los frames
+    pendientes sí se descartan).
+    """
+
+    STAGES = ("capture", "decode", "infer", "incident")
+
+    def __init__(self, camera_id, capture_fn, decode_fn, infer_fn, incident_fn,
+                 interval=0.5, frame_queue_size=2, incident_queue_size=16):
+        self.camera_id = camera_id
+        self.capture_fn = capture_fn
+        self.decode_fn = decode_fn
+        self.infer_fn = infer_fn
+        self.incident_fn = incident_fn
+        self.interval = interval
+
+        self.raw_queue = DropOldestQueue(frame_queue_size)
+        self.frame_queue = DropOldestQueue(frame_queue_size)
+        self.incident_queue = EventQueue(incident_queue_size, f"incidentes de {camera_id}")
+
+        self.stats_by_stage = {name: StageStats() for name in self.STAGES}
+        self._stop = threading.Event()
+        self._upstream_done = threading.Event()  # la inferencia ya no encolará incidentes
+        self._threads = {}
+
+    def start(self):
+        targets = {
+            "capture": self._capture_stage,
+            "decode": self._decode_stage,
+            "infer": self._infer_stage,
+            "incident": self._incident_stage,
+        }
+        for name in self.STAGES:
+            t = threading.Thread(target=targets[name], name=f"{self.camera_id}-{name}", daemon=True)
+            t.start()
+            self._threads[name] = t
+
+    def stop(self, timeout=10.0):
+        """Detener las etapas y esperarlas (hasta timeout segundos en total)"""
+        self._stop.set()
+        deadline = time.time() + timeout
+
+        def join(name):
+            t = self._threads.get(name)
+            if t is None:
+                return
+            t.join(max(0.0, deadline - time.time()))
+            if t.is_alive():
+                print(f"⚠️ [{self.camera_id}] La etapa {name} no terminó en {timeout:.0f} s")
+
+        # Primero la inferencia (el único productor de incidentes); después la
+        # etapa de incidentes vacía su cola y termina
+        join("infer")
+        self._upstream_done.set()
+        for name in ("incident", "capture", "decode"):
+            join(name)
+
+    @property
+    def running(self):
+        return not self._stop.is_set()
+
+    def _capture_stage(self):
+        stats = self.stats_by_stage["capture"]
+        while not self._stop.is_set():
+            t0 = time.time()
+            raw = self.capture_fn()
+            if raw is None:
+                stats.error()
+                self._stop.wait(0.5)
+                continue
+            stats.record(time.time() - t0)
+            self.raw_queue.put((raw, t0))
+
+            # Respetar intervalo de muestreo sin sumar la latencia de captura
+            interval = self.interval() if callable(self.interval) else self.interval
+            wait = interval - (time.time() - t0)
+            if wait > 0:
+                self._stop.wait(wait)
+
+    def _decode_stage(self):
+        stats = self.stats_by_stage["decode"]
+        while not self._stop.is_set():
+            item = self.raw_queue.get(timeout=0.5)
+            if item is None:
+                continue
+            raw, captured_at = item
+            t0 = time.time()
+            frame = self.decode_fn(raw)
+            if frame is None:
+                stats.error()
+                continue
+            stats.record(time.time() - t0)
+            self.frame_queue.put((frame, captured_at))
+
+    def _infer_stage(self):
+        stats = self.stats_by_stage["infer"]
+        while not self._stop.is_set():
+            item = self.frame_queue.get(timeout=0.5)
+            if item is None:
+                continue
+            frame, captured_at = item
+            t0 = time.time()
+            try:
+                items = self.infer_fn(frame)
+            except Exception as e:
+                print(f"[{self.camera_id}] Error en inferencia: {e}")
+                stats.error()
+                continue
+            stats.record(time.time() - t0)
+            if items:
+                self.incident_queue.put((frame, items))
+
+    def _incident_stage(self):
+        stats = self.stats_by_stage["incident"]
+        while True:
+            item = self.incident_queue.get(timeout=0.5)
+            if item is None:
+                if self._upstream_done.is_set():
+                    return
+                continue
+            frame, items = item
+            t0 = time.time()
+            try:
+                self.incident_fn(frame, items)
+            except Exception as e:
+                print(f"[{self.camera_id}] Error procesando incidente: {e}")
+                stats.error()
+                continue
+            stats.record(time.time() - t0)
+
+    def stats(self):
+        """Estado de cada etapa y de las colas"""
+        return {
+            "stages": {name: s.snapshot() for name, s in self.stats_by_stage.items()},
+            "queues": {
+                "raw": {"depth": self.raw_queue.qsize(), "dropped": self.raw_queue.dropped},
+                "frames": {"depth": self.frame_queue.qsize(), "dropped": self.frame_queue.dropped},
+                "incidents": {
+                    "depth": self.incident_queue.qsize(),
+                    "dropped": self.incident_queue.dropped,
+                    "overflows": self.incident_queue.overflows,
+                },
+            },
+        }
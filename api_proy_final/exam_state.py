@@ -0,0 +1,249 @@
+"""
+Estado compartido del servidor de examen
+SQLite local con el registro de cámaras, el estado de cada sesión y el índice
+de incidentes, para que todos los workers HTTP (gunicorn) vean lo mismo y el
+motor pueda retomar las sesiones activas tras un reinicio
+"""
+
+import base64
+import json
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cameras (
+    id TEXT PRIMARY KEY,
+    ip TEXT NOT NULL,
+    stream_url TEXT
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    camera_id TEXT PRIMARY KEY,
+    active INTEGER NOT NULL DEFAULT 0,
+    start_time TEXT,
+    incident_count INTEGER NOT NULL DEFAULT 0,
+    status TEXT,
+    engine_pid INTEGER,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+INCIDENT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS incidents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    incident_key TEXT NOT NULL UNIQUE,
+    session_id TEXT NOT NULL,
+    camera_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    incident_number INTEGER,
+    classes TEXT NOT NULL,
+    max_confidence REAL NOT NULL,
+    detections TEXT NOT NULL,
+    severity TEXT,
+    image_ref TEXT,
+    image_url TEXT,
+    duration_seconds REAL NOT NULL DEFAULT 0,
+    last_seen REAL
+);
+CREATE INDEX IF NOT EXISTS idx_incidents_session ON incidents (session_id, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_incidents_camera ON incidents (camera_id, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_incidents_time ON incidents (timestamp, id);
+"""
+
+
+class _SqliteStore:
+    """
+    Conexión SQLite por hilo sobre un archivo compartido.
+
+    WAL permite que los workers lean mientras el motor escribe.
+    """
+
+    schema = ""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(self.schema)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+class ExamStateStore(_SqliteStore):
+    """Tablas cameras y sessions"""
+
+    schema = SCHEMA
+
+    # ---------- Cámaras ----------
+
+    def save_camera(self, camera_id, ip, stream_url=None):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO cameras (id, ip, stream_url) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET ip = excluded.ip, stream_url = excluded.stream_url",
+                (camera_id, ip, stream_url)
+            )
+
+    def remove_camera(self, camera_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cameras WHERE id = ?", (camera_id,))
+            conn.execute("DELETE FROM sessions WHERE camera_id = ?", (camera_id,))
+
+    def cameras(self):
+        rows = self._connect().execute("SELECT id, ip, stream_url FROM cameras ORDER BY id").fetchall()
+        return [dict(row) for row in rows]
+
+    def has_camera(self, camera_id):
+        return self._connect().execute("SELECT 1 FROM cameras WHERE id = ?", (camera_id,)).fetchone() is not None
+
+    # ---------- Sesiones ----------
+
+    def save_session(self, status, pid=None):
+        """Guardar el estado serializado de una sesión (ver session_status)"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO sessions (camera_id, active, start_time, incident_count, status, engine_pid, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(camera_id) DO UPDATE SET active = excluded.active, start_time = excluded.start_time, "
+                "incident_count = excluded.incident_count, status = excluded.status, "
+                "engine_pid = excluded.engine_pid, updated_at = excluded.updated_at",
+                (
+                    status["camera_id"],
+                    1 if status.get("active") else 0,
+                    status.get("start_time"),
+                    status.get("incident_count", 0),
+                    json.dumps(status, default=str),
+                    pid,
+                    time.time(),
+                )
+            )
+
+    def session(self, camera_id):
+        """Último estado guardado de una sesión (None si no hay)"""
+        row = self._connect().execute(
+            "SELECT status, updated_at FROM sessions WHERE camera_id = ?", (camera_id,)
+        ).fetchone()
+        if row is None or row["status"] is None:
+            return None
+        status = json.loads(row["status"])
+        status["state_age_seconds"] = round(time.time() - row["updated_at"], 2)
+        return status
+
+    def active_sessions(self):
+        rows = self._connect().execute(
+            "SELECT camera_id, start_time, incident_count FROM sessions WHERE active = 1"
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+
+def encode_cursor(timestamp, row_id):
+    return base64.urlsafe_b64encode(f"{timestamp!r}:{row_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(timestamp, id) de un cursor opaco; ValueError si es inválido"""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    timestamp, _, row_id = base64.urlsafe_b64decode(padded.encode()).decode().partition(":")
+    return float(timestamp), int(row_id)
+
+
+class IncidentStore(_SqliteStore):
+    """
+    Índice persistente de incidentes con paginación por cursor (keyset).
+
+    Las páginas van del más reciente al más antiguo; el cursor es la posición
+    (timestamp, id) del último elemento devuelto, así que pedir la página N no
+    recorre las anteriores.
+    """
+
+    schema = INCIDENT_SCHEMA
+
+    def add(self, incident_key, session_id, camera_id, timestamp, incident_number,
+            detections, severity=None, image_ref=None):
+        """detections: lista de dicts con class_id, object, confidence, bbox"""
+        classes = "," + ",".join(sorted({str(d["class_id"]) for d in detections})) + ","
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO incidents (incident_key, session_id, camera_id, timestamp, "
+                "incident_number, classes, max_confidence, detections, severity, image_ref, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    incident_key, session_id, camera_id, timestamp, incident_number, classes,
+                    max((d["confidence"] for d in detections), default=0.0),
+                    json.dumps(detections), severity, image_ref, timestamp,
+                )
+            )
+
+    def set_image_url(self, incident_key, image_url):
+        with self._connect() as conn:
+            conn.execute("UPDATE incidents SET image_url = ? WHERE incident_key = ?", (image_url, incident_key))
+
+    def update_duration(self, incident_key, duration_seconds, last_seen):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE incidents SET duration_seconds = ?, last_seen = ? WHERE incident_key = ?",
+                (duration_seconds, last_seen, incident_key)
+            )
+
+    @staticmethod
+    def _row(row):
+        item = dict(row)
+        item["classes"] = [int(c) for c in item["classes"].strip(",").split(",") if c]
+        item["detections"] = json.loads(item["detections"])
+        return item
+
+    def get(self, incident_key):
+        row = self._connect().execute(
+            "SELECT * FROM incidents WHERE incident_key = ?", (incident_key,)
+        ).fetchone()
+        return self._row(row) if row else None
+
+    def query(self, session_id=None, camera_id=None, class_id=None, min_confidence=None,
+              since=None, until=None, cursor=None, limit=50):
+        """Una página de incidentes; devuelve (items, next_cursor)"""
+        where, params = [], []
+        if session_id:
+            where.append("session_id = ?")
+            params.append(session_id)
+        if camera_id:
+            where.append("camera_id = ?")
+            params.append(camera_id)
+        if class_id is not None:
+            where.append("classes LIKE ?")
+            params.append(f"%,{int(class_id)},%")
+        if min_confidence is not None:
+            where.append("max_confidence >= ?")
+            params.append(min_confidence)
+        if since is not None:
+            where.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("timestamp < ?")
+            params.append(until)
+        if cursor:
+            where.append("(timestamp, id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+
+        sql = "SELECT * FROM incidents"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+        # Una fila extra para saber si hay otra página
+        params.append(limit + 1)
+
+        rows = self._connect().execute(sql, params).fetchall()
+        items = [self._row(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor(last["timestamp"], last["id"])
+        return items, next_cursor
@@ -0,0 +1,57 @@
+// ============================================
+// PROXY DE EVENTOS EN VIVO (SSE) Y SNAPSHOT JPEG DEL SERVIDOR DE EXAMEN
+// Compartido por server.js y server_exam_endpoints.js:
+//   require('./exam_stream_proxy')(app, PYTHON_SERVER);
+// ============================================
+
+const axios = require('axios');
+
+module.exports = function registerExamStreamProxy(app, pythonServer) {
+    // Eventos en vivo del servidor de detección (Server-Sent Events)
+    app.get('/api/exam/events', async (req, res) => {
+        try {
+            const upstream = await axios.get(`${pythonServer}/api/exam/events`, {
+                headers: req.headers['last-event-id'] ? { 'Last-Event-ID': req.headers['last-event-id'] } : {},
+                responseType: 'stream',
+                timeout: 0
+            });
+            res.set({
+                'Content-Type': 'text/event-stream',
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'
+            });
+            res.flushHeaders();
+            upstream.data.pipe(res);
+            req.on('close', () => upstream.data.destroy());
+        } catch (error) {
+            console.error('Error conectando a eventos del examen:', error.message);
+            // 503 = el servidor Python ya tiene el máximo de dashboards: el navegador reintenta
+            if (error.response?.status === 503) {
+                res.set('Retry-After', error.response.headers['retry-after'] || '5');
+                return res.status(503).json({ error: 'Too many event subscribers' });
+            }
+            res.status(502).json({ error: 'Failed to connect to exam events', details: error.message });
+        }
+    });
+
+    // Último frame como JPEG (el servidor Python lo sirve desde memoria con ETag)
+    app.get('/api/exam/snapshot.jpg', async (req, res) => {
+        try {
+            const response = await axios.get(`${pythonServer}/api/exam/snapshot.jpg`, {
+                params: req.query,
+                headers: req.headers['if-none-match'] ? { 'If-None-Match': req.headers['if-none-match'] } : {},
+                responseType: 'arraybuffer',
+                validateStatus: (status) => status === 200 || status === 304,
+                timeout: 60000
+            });
+            ['etag', 'cache-control', 'x-frame-timestamp'].forEach((name) => {
+                if (response.headers[name]) res.set(name, response.headers[name]);
+            });
+            if (response.status === 304) return res.status(304).end();
+            res.type('image/jpeg').send(Buffer.from(response.data));
+        } catch (error) {
+            console.error('Error obteniendo snapshot:', error.message);
+            res.status(500).json({ error: 'Failed to get snapshot', details: error.message });
+        }
+    });
+};
@@ -0,0 +1,102 @@
+"""
+Frame de cámara
+Conserva los bytes JPEG originales de la ESP32-CAM y decodifica bajo demanda,
+directamente a escala reducida cuando la resolución supera la entrada del modelo
+"""
+
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# Factores de reducción que libjpeg decodifica sin costo extra (escala DCT)
+REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# Marcadores SOF (inicio de frame) con alto y ancho; excluye DHT (C4), JPG (C8) y DAC (CC)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_size(data):
+    """(ancho, alto) leídos de la cabecera SOF del JPEG, o None si no se encuentra"""
+    i = 2
+    n = len(data)
+    if n < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    while i + 4 <= n:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            # Relleno entre marcadores
+            i += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        length = (data[i + 2] << 8) | data[i + 3]
+        if marker in _SOF_MARKERS:
+            if i + 9 > n:
+                return None
+            height = (data[i + 5] << 8) | data[i + 6]
+            width = (data[i + 7] << 8) | data[i + 8]
+            return width, height
+        i += 2 + length
+    return None
+
+
+def reduction_for(size, target):
+    """Mayor factor 1/2/4/8 que deja el lado largo en al menos target píxeles"""
+    if size is None or not target:
+        return 1
+    longest = max(size)
+    factor = 1
+    for candidate in (2, 4, 8):
+        if longest / candidate >= target:
+            factor = candidate
+    return factor
+
+
+def decode_jpeg(data, factor=1):
+    """Decodificar JPEG a BGR, opcionalmente a 1/factor del tamaño"""
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), REDUCED_FLAGS[factor])
+
+
+class Frame:
+    """
+    Frame capturado: bytes JPEG originales + arreglo BGR decodificado al usarse.
+
+    target es el lado de entrada del modelo (ej. 640): si la cámara entrega una
+    resolución mayor se decodifica directamente reducida. scale convierte
+    coordenadas del arreglo decodificado a la imagen original.
+    """
+
+    __slots__ = ("jpeg", "captured_at", "size", "factor", "_image", "_decoded", "_lock")
+
+    def __init__(self, jpeg, captured_at=None, target=None):
+        self.jpeg = jpeg
+        self.captured_at = time.time() if captured_at is None else captured_at
+        self.size = jpeg_size(jpeg)
+        self.factor = reduction_for(self.size, target)
+        self._image = None
+        self._decoded = False
+        self._lock = threading.Lock()
+
+    @property
+    def image(self):
+        """Arreglo BGR (None si el JPEG está corrupto)"""
+        if not self._decoded:
+            with self._lock:
+                if not self._decoded:
+                    self._image = decode_jpeg(self.jpeg, self.factor)
+                    self._decoded = True
+        return self._image
+
+    @property
+    def scale(self):
+        return float(self.factor)
@@ -0,0 +1,214 @@
+"""
+Ingesta MJPEG desde la ESP32-CAM
+Mantiene una sola conexión al endpoint /stream (multipart/x-mixed-replace),
+separa los JPEG de forma incremental y guarda siempre el último frame
+"""
+
+import threading
+import time
+
+import requests
+
+
+def stream_url_for(base_url):
+    """
+    URL del stream MJPEG de una ESP32-CAM.
+
+    app_httpd.cpp levanta el servidor de stream en el puerto del servidor
+    principal + 1 (80 → 81). Con túneles (ngrok) no se puede deducir el puerto,
+    así que se usa <base>/stream y se puede sobreescribir explícitamente.
+    """
+    scheme, _, rest = base_url.partition("://")
+    host, _, path = rest.partition("/")
+    if scheme == "https":
+        return f"{base_url}/stream"
+    name, _, port = host.partition(":")
+    stream_port = int(port) + 1 if port else 81
+    return f"{scheme}://{name}:{stream_port}/stream"
+
+
+class MjpegParser:
+    """Parser incremental de multipart MJPEG: feed(bytes) → lista de JPEG completos"""
+
+    SOI = b"\xff\xd8"
+    EOI = b"\xff\xd9"
+
+    def __init__(self, boundary=None, max_buffer=4 * 1024 * 1024):
+        self.boundary = b"--" + boundary.encode() if boundary else None
+        self.max_buffer = max_buffer
+        self._buf = bytearray()
+        self._expected = None
+
+    def feed(self, data):
+        self._buf += data
+        frames = []
+        while True:
+            frame = self._next_frame()
+            if frame is None:
+                break
+            frames.append(frame)
+
+        # Evitar crecimiento sin límite si el stream llega corrupto
+        if len(self._buf) > self.max_buffer:
+            self._buf.clear()
+            self._expected = None
+        return frames
+
+    def _next_frame(self):
+        # Cuerpo con Content-Length conocido (caso normal de app_httpd.cpp)
+        if self._expected is not None:
+            if len(self._buf) < self._expected:
+                return None
+            frame = bytes(self._buf[:self._expected])
+            del self._buf[:self._expected]
+            self._expected = None
+            return frame
+
+        if self.boundary:
+            start = self._buf.find(self.boundary)
+            if start < 0:
+                return None
+            header_end = self._buf.find(b"\r\n\r\n", start)
+            if header_end < 0:
+                return None
+            headers = bytes(self._buf[start + len(self.boundary):header_end]).decode("latin-1")
+            del self._buf[:header_end + 4]
+
+            for line in headers.split("\r\n"):
+                name, _, value = line.partition(":")
+                if name.strip().lower() == "content-length":
+                    try:
+                        self._expected = int(value.strip())
+                    except ValueError:
+                        pass
+            if self._expected is not None:
+                return self._next_frame()
+
+        # Sin Content-Length: delimitar por marcadores SOI/EOI del JPEG
+        start = self._buf.find(self.SOI)
+        if start < 0:
+            return None
+        end = self._buf.find(self.EOI, start + 2)
+        if end < 0:
+            return None
+        frame = bytes(self._buf[start:end + 2])
+        del self._buf[:end + 2]
+        return frame
+
+
+class MjpegStreamReader:
+    """
+    Hilo que lee el stream MJPEG y publica el último frame.
+
+    Se reconecta automáticamente con espera exponencial si la conexión se cae.
+    """
+
+    def __init__(self, url, connect_timeout=5, read_timeout=10, chunk_size=8192,
+                 reconnect_delay=1.0, max_reconnect_delay=10.0, session=None):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.chunk_size = chunk_size
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.session = session or requests
+
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_time = None
+        self._seq = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.connected = False
+        self.reconnects = 0
+        self.bytes_received = 0
+        self.last_error = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def latest(self):
+        """Último frame: (jpeg_bytes, timestamp, seq) o None"""
+        with self._cond:
+            if self._frame is None:
+                return None
+            return self._frame, self._frame_time, self._seq
+
+    def wait_for_frame(self, after_seq=0, timeout=None):
+        """Esperar un frame más nuevo que after_seq; devuelve (jpeg, ts, seq) o None"""
+        deadline = time.time() + timeout if timeout is not None else None
+        with self._cond:
+            while self._seq <= after_seq and not self._stop.is_set():
+                remaining = deadline - time.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            if self._frame is None or self._seq <= after_seq:
+                return None
+            return self._frame, self._frame_time, self._seq
+
+    def _publish(self, frame):
+        with self._cond:
+            self._frame = frame
+            self._frame_time = time.time()
+            self._seq += 1
+            self._cond.notify_all()
+
+    def _run(self):
+        delay = self.reconnect_delay
+        while not self._stop.is_set():
+            try:
+                with self.session.get(self.url, stream=True, timeout=self.timeout) as r:
+                    if r.status_code != 200:
+                        raise IOError(f"HTTP {r.status_code}")
+
+                    content_type = r.headers.get("Content-Type", "")
+                    boundary = None
+                    if "boundary=" in content_type:
+                        boundary = content_type.split("boundary=", 1)[1].split(";")[0].strip().strip('"')
+                    parser = MjpegParser(boundary)
+
+                    self.connected = True
+                    delay = self.reconnect_delay
+                    print(f"✓ Stream MJPEG conectado: {self.url}")
+
+                    for chunk in r.iter_content(chunk_size=self.chunk_size):
+                        if self._stop.is_set():
+                            break
+                        if not chunk:
+                            continue
+                        self.bytes_received += len(chunk)
+                        for frame in parser.feed(chunk):
+                            self._publish(frame)
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"⚠️ Stream MJPEG desconectado ({self.url}): {e}")
+
+            self.connected = False
+            if self._stop.is_set():
+                break
+            self.reconnects += 1
+            self._stop.wait(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def stats(self):
+        with self._cond:
+            age = time.time() - self._frame_time if self._frame_time else None
+            return {
+                "url": self.url,
+                "connected": self.connected,
+                "frames": self._seq,
+                "bytes_received": self.bytes_received,
+                "reconnects": self.reconnects,
+                "last_frame_age_seconds": round(age, 3) if age is not None else None,
+                "last_error": self.last_error,
+            }
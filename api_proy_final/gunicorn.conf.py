@@ -0,0 +1,90 @@
+"""
+Configuración de gunicorn para server_exam_detection.py
+
+    gunicorn -c gunicorn.conf.py server_exam_detection:app
+
+El proceso maestro arranca un único motor de detección (modelo YOLO, pipelines,
+entregas) y los workers HTTP solo atienden peticiones: se pueden agregar
+workers sin cargar el modelo otra vez ni repartir el estado del examen. Si el
+motor termina, un hilo del maestro lo vuelve a arrancar (con espera creciente
+si falla al arrancar); las sesiones activas se retoman desde EXAM_STATE_DB.
+"""
+
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+# Hilos por worker: cada dashboard mantiene abierta una conexión SSE, así que
+# se reservan GUNICORN_RESERVED_THREADS para las demás rutas (start/stop,
+# status, /ready, /health); pasado el límite /api/exam/events responde 503
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "64"))
+reserved_threads = int(os.getenv("GUNICORN_RESERVED_THREADS", "16"))
+timeout = 120
+
+_engine = None
+_engine_lock = threading.Lock()
+_stopping = threading.Event()
+
+# Espera antes de reiniciar el motor: se duplica si muere poco después de
+# arrancar y vuelve al mínimo cuando llega a correr ENGINE_STABLE_SECONDS
+ENGINE_RESTART_MIN_DELAY = 1.0
+ENGINE_RESTART_MAX_DELAY = 30.0
+ENGINE_STABLE_SECONDS = 60.0
+
+
+def _start_engine(server):
+    global _engine
+    here = os.path.dirname(os.path.abspath(__file__))
+    with _engine_lock:
+        _engine = subprocess.Popen(
+            [sys.executable, os.path.join(here, "server_exam_detection.py"), "--engine"],
+            cwd=here,
+            env=dict(os.environ, EXAM_ENGINE="engine")
+        )
+    server.log.info(f"Motor de detección iniciado (pid {_engine.pid})")
+
+
+def _watch_engine(server):
+    """Reiniciar el motor cada vez que termine, hasta que gunicorn se detenga"""
+    delay = ENGINE_RESTART_MIN_DELAY
+    while not _stopping.is_set():
+        started = time.time()
+        code = _engine.wait()
+        if _stopping.is_set():
+            return
+        if time.time() - started >= ENGINE_STABLE_SECONDS:
+            delay = ENGINE_RESTART_MIN_DELAY
+        server.log.error(f"El motor de detección terminó (código {code}); reinicio en {delay:.0f} s")
+        if _stopping.wait(delay):
+            return
+        _start_engine(server)
+        delay = min(ENGINE_RESTART_MAX_DELAY, delay * 2)
+
+
+def on_starting(server):
+    # Los workers heredan este entorno al hacer fork
+    if not os.getenv("EXAM_ENGINE_AUTHKEY"):
+        os.environ["EXAM_ENGINE_AUTHKEY"] = secrets.token_hex(16)
+    os.environ["EXAM_ENGINE"] = "remote"
+    os.environ.setdefault("EVENTS_MAX_CLIENTS", str(max(1, threads - reserved_threads)))
+
+    _start_engine(server)
+    threading.Thread(target=_watch_engine, args=(server,), name="engine-watchdog", daemon=True).start()
+
+
+def on_exit(server):
+    _stopping.set()
+    with _engine_lock:
+        engine = _engine
+    if engine is not None and engine.poll() is None:
+        engine.terminate()
+        try:
+            engine.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            engine.kill()
@@ -0,0 +1,129 @@
+"""
+Cliente HTTP compartido con pools de conexiones por host
+Reutiliza conexiones keep-alive (y el handshake TLS) hacia la ESP32-CAM y el backend Node.js
+"""
+
+from urllib.parse import urlsplit
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+class CountingAdapter(HTTPAdapter):
+    """HTTPAdapter que cuenta conexiones TCP/TLS realmente abiertas (handshakes)"""
+
+    def __init__(self, *args, **kwargs):
+        self.connects = 0
+        self._connects_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def _count_connect(self):
+        with self._connects_lock:
+            self.connects += 1
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        adapter = self
+
+        class CountingHTTPConnection(HTTPConnection):
+            def connect(self):
+                super().connect()
+                adapter._count_connect()
+
+        class CountingHTTPSConnection(HTTPSConnection):
+            def connect(self):
+                super().connect()
+                adapter._count_connect()
+
+        class CountingHTTPConnectionPool(HTTPConnectionPool):
+            ConnectionCls = CountingHTTPConnection
+
+        class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+            ConnectionCls = CountingHTTPSConnection
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": CountingHTTPConnectionPool,
+            "https": CountingHTTPSConnectionPool,
+        }
+
+
+class PooledHttpClient:
+    """Una requests.Session por host (esquema + host + puerto) con su propio pool"""
+
+    def __init__(self, pool_maxsize=8, connect_timeout=3.05, read_timeout=10):
+        self.pool_maxsize = pool_maxsize
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._sessions = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _host_key(url):
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def session_for(self, url):
+        """Sesión keep-alive asociada al host de la URL"""
+        key = self._host_key(url)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = CountingAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[key] = session
+                self._counters[key] = {"requests": 0, "errors": 0}
+            return session
+
+    def request(self, method, url, connect_timeout=None, read_timeout=None, **kwargs):
+        """Petición con timeouts separados de conexión y lectura"""
+        session = self.session_for(url)
+        key = self._host_key(url)
+        kwargs.setdefault("timeout", (
+            connect_timeout if connect_timeout is not None else self.connect_timeout,
+            read_timeout if read_timeout is not None else self.read_timeout,
+        ))
+        try:
+            response = session.request(method, url, **kwargs)
+        except Exception:
+            with self._lock:
+                self._counters[key]["errors"] += 1
+            raise
+        with self._lock:
+            self._counters[key]["requests"] += 1
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self):
+        """Peticiones, conexiones nuevas (handshakes) y reutilizadas por host"""
+        result = {}
+        with self._lock:
+            items = list(self._sessions.items())
+            counters = {k: dict(v) for k, v in self._counters.items()}
+
+        for key, session in items:
+            entry = counters.get(key, {"requests": 0, "errors": 0})
+            new_connections = sum(
+                adapter.connects for adapter in set(session.adapters.values())
+                if isinstance(adapter, CountingAdapter)
+            )
+            total = entry["requests"] + entry["errors"]
+            entry["new_connections"] = new_connections
+            entry["reused_connections"] = max(0, total - new_connections)
+            entry["reuse_ratio"] = round(entry["reused_connections"] / total, 3) if total else 0.0
+            result[key] = entry
+        return result
+
+
+# Instancia compartida por todo el proceso
+http_pool = PooledHttpClient()
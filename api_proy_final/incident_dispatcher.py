@@ -0,0 +1,236 @@
+"""
+Despachador asíncrono de incidentes
+Persiste cada incidente en un directorio local (spool) y lo entrega en segundo plano
+(subida de imagen + aviso al backend) con reintentos y espera exponencial
+"""
+
+from collections import deque
+import heapq
+import json
+import os
+import random
+import threading
+import time
+import uuid
+
+from inference_scheduler import percentile
+
+
+def backoff_delay(attempts, base_delay, max_delay):
+    """Espera exponencial (con ±20 % de jitter) antes del reintento tras attempts fallos"""
+    delay = min(max_delay, base_delay * (2 ** (attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class IncidentDispatcher:
+    """
+    Cola de incidentes pendientes respaldada en disco.
+
+    deliver_fn(job) realiza la entrega y lanza una excepción si falla. Puede
+    modificar job["state"] (ej. guardar la URL de la imagen ya subida); ese
+    estado se persiste entre reintentos para no repetir pasos ya completados.
+    """
+
+    def __init__(self, spool_dir, deliver_fn, workers=2, max_retries=8,
+                 base_delay=2.0, max_delay=300.0):
+        self.spool_dir = spool_dir
+        self.failed_dir = os.path.join(spool_dir, "failed")
+        self.deliver_fn = deliver_fn
+        self.workers = max(1, int(workers))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._heap = []
+        self._jobs = {}
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+
+        # Contadores
+        self.in_flight = 0
+        self.delivered = 0
+        self.failed = 0
+        self.retries = 0
+        self.last_delivery_lag = None
+        self._deliver_times = deque(maxlen=300)
+
+        os.makedirs(self.failed_dir, exist_ok=True)
+
+    # ---------- Persistencia ----------
+
+    def _job_path(self, job_id):
+        return os.path.join(self.spool_dir, f"{job_id}.json")
+
+    def _image_path(self, job_id):
+        return os.path.join(self.spool_dir, f"{job_id}.jpg")
+
+    def _write_atomic(self, path, data):
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _persist(self, job):
+        self._write_atomic(self._job_path(job["id"]), json.dumps(job).encode("utf-8"))
+
+    def _remove(self, job_id):
+        for path in (self._job_path(job_id), self._image_path(job_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _move_to_failed(self, job_id):
+        for path in (self._job_path(job_id), self._image_path(job_id)):
+            if os.path.exists(path):
+                os.replace(path, os.path.join(self.failed_dir, os.path.basename(path)))
+
+    # ---------- Cola ----------
+
+    def _schedule(self, job, not_before):
+        with self._cond:
+            self._seq += 1
+            self._jobs[job["id"]] = job
+            heapq.heappush(self._heap, (not_before, self._seq, job["id"]))
+            self._cond.notify()
+
+    def submit(self, incident, image_bytes=None, filename=None, kind="incident"):
+        """Guardar incidente en el spool y encolarlo; devuelve el id del trabajo"""
+        job_id = f"{int(time.time() * 1000)}_{uuid.uuid4().hex[:8]}"
+        job = {
+            "id": job_id,
+            "kind": kind,
+            "incident": incident,
+            "filename": filename,
+            "has_image": image_bytes is not None,
+            "created_at": time.time(),
+            "attempts": 0,
+            "last_error": None,
+            "state": {},
+        }
+        if image_bytes is not None:
+            self._write_atomic(self._image_path(job_id), image_bytes)
+        self._persist(job)
+        self._schedule(job, time.time())
+        return job_id
+
+    def read_image(self, job):
+        """Bytes de la imagen del incidente (o None)"""
+        if not job.get("has_image"):
+            return None
+        with open(self._image_path(job["id"]), "rb") as f:
+            return f.read()
+
+    def load_pending(self):
+        """Recuperar incidentes pendientes de una ejecución anterior"""
+        loaded = 0
+        for name in sorted(os.listdir(self.spool_dir)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.spool_dir, name), "rb") as f:
+                    job = json.loads(f.read())
+            except Exception as e:
+                print(f"⚠️ Spool corrupto ({name}): {e}")
+                continue
+            if job["id"] in self._jobs:
+                continue
+            self._schedule(job, time.time())
+            loaded += 1
+        return loaded
+
+    def start(self):
+        loaded = self.load_pending()
+        if loaded:
+            print(f"📬 {loaded} incidente(s) pendiente(s) recuperado(s) del spool")
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"incident-dispatcher-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def _next_job(self):
+        with self._cond:
+            while not self._stop.is_set():
+                if self._heap:
+                    not_before, _, job_id = self._heap[0]
+                    wait = not_before - time.time()
+                    if wait <= 0:
+                        heapq.heappop(self._heap)
+                        self.in_flight += 1
+                        return self._jobs[job_id]
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait(1.0)
+            return None
+
+    def _worker(self):
+        while not self._stop.is_set():
+            job = self._next_job()
+            if job is None:
+                continue
+
+            t0 = time.time()
+            try:
+                self.deliver_fn(job)
+            except Exception as e:
+                self._on_failure(job, e)
+                continue
+            finally:
+                with self._cond:
+                    self.in_flight -= 1
+
+            self._remove(job["id"])
+            with self._cond:
+                self._jobs.pop(job["id"], None)
+                self.delivered += 1
+                self.last_delivery_lag = time.time() - job["created_at"]
+                self._deliver_times.append(time.time() - t0)
+
+    def _on_failure(self, job, error):
+        job["attempts"] += 1
+        job["last_error"] = str(error)
+
+        if job["attempts"] > self.max_retries:
+            print(f"✗ Incidente {job['id']} descartado tras {job['attempts']} intentos: {error}")
+            self._persist(job)
+            self._move_to_failed(job["id"])
+            with self._cond:
+                self._jobs.pop(job["id"], None)
+                self.failed += 1
+            return
+
+        delay = backoff_delay(job["attempts"], self.base_delay, self.max_delay)
+        print(f"⚠️ Entrega de incidente {job['id']} falló (intento {job['attempts']}): {error}. Reintento en {delay:.1f}s")
+        self._persist(job)
+        with self._cond:
+            self.retries += 1
+        self._schedule(job, time.time() + delay)
+
+    def stats(self):
+        """Profundidad de la cola, retraso y contadores de entrega"""
+        with self._cond:
+            now = time.time()
+            oldest = min((job["created_at"] for job in self._jobs.values()), default=None)
+            return {
+                "queue_depth": len(self._heap),
+                "in_flight": self.in_flight,
+                "pending": len(self._jobs),
+                "oldest_pending_age_seconds": round(now - oldest, 1) if oldest else 0.0,
+                "last_delivery_lag_seconds": round(self.last_delivery_lag, 3) if self.last_delivery_lag is not None else None,
+                "delivered": self.delivered,
+                "failed": self.failed,
+                "retries": self.retries,
+                "deliver_ms_p50": round(percentile(self._deliver_times, 50) * 1000, 1),
+                "deliver_ms_p95": round(percentile(self._deliver_times, 95) * 1000, 1),
+                "workers": self.workers,
+                "spool_dir": self.spool_dir,
+            }
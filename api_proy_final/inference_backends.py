@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Backends de inferencia para YOLO
+Permite usar el modelo exportado a ONNX Runtime u OpenVINO (incluida una variante
+INT8) sin cambiar la lógica de detección: todos devuelven resultados de ultralytics.
+
+Uso:
+    python inference_backends.py export --backend openvino-int8
+    python inference_backends.py compare --images exam_logs/images --backends torch,onnx,openvino,openvino-int8
+"""
+
+import argparse
+import os
+import time
+
+# Backend seleccionado por variable de entorno
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch").lower()
+YOLO_WEIGHTS = os.getenv("YOLO_WEIGHTS", "yolov8n.pt")
+IMGSZ = int(os.getenv("YOLO_IMGSZ", "640"))
+
+# suffix: nombre del artefacto exportado a partir de los pesos .pt
+# export: argumentos para YOLO.export()
+# batch: si el modelo acepta lotes de tamaño variable
+BACKENDS = {
+    "torch": {"suffix": None, "export": None, "batch": True},
+    "onnx": {"suffix": ".onnx", "export": {"format": "onnx", "dynamic": True, "simplify": True}, "batch": True},
+    "openvino": {"suffix": "_openvino_model", "export": {"format": "openvino", "dynamic": True}, "batch": True},
+    "openvino-int8": {"suffix": "_int8_openvino_model", "export": {"format": "openvino", "int8": True}, "batch": False},
+}
+
+
+def model_path(backend=INFERENCE_BACKEND, weights=YOLO_WEIGHTS):
+    """Ruta del modelo para un backend (los pesos .pt para torch)"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend desconocido: {backend} (opciones: {', '.join(BACKENDS)})")
+    suffix = BACKENDS[backend]["suffix"]
+    if suffix is None:
+        return weights
+    stem, _ = os.path.splitext(weights)
+    return f"{stem}{suffix}"
+
+
+def export_model(backend, weights=YOLO_WEIGHTS, imgsz=IMGSZ, data=None):
+    """Exportar los pesos .pt al formato del backend; devuelve la ruta generada"""
+    from ultralytics import YOLO
+
+    spec = BACKENDS[backend]
+    if spec["export"] is None:
+        return weights
+
+    kwargs = dict(spec["export"], imgsz=imgsz)
+    if data and kwargs.get("int8"):
+        # Imágenes de calibración para la cuantización INT8
+        kwargs["data"] = data
+
+    print(f"📦 Exportando {weights} → {backend}...")
+    exported = YOLO(weights).export(**kwargs)
+    print(f"✓ Modelo exportado: {exported}")
+    return str(exported)
+
+
+def load_model(backend=INFERENCE_BACKEND, weights=YOLO_WEIGHTS, auto_export=False):
+    """Cargar YOLO con el backend indicado"""
+    from ultralytics import YOLO
+
+    path = model_path(backend, weights)
+    if backend != "torch" and not os.path.exists(path):
+        if not auto_export:
+            raise FileNotFoundError(
+                f"No existe {path}. Ejecuta: python inference_backends.py export --backend {backend}"
+            )
+        path = export_model(backend, weights)
+
+    return YOLO(path, task="detect")
+
+
+def make_infer_fn(model, backend=INFERENCE_BACKEND, **predict_kwargs):
+    """Función lista para el planificador: lista de frames → lista de resultados"""
+    predict_kwargs.setdefault("verbose", False)
+    if BACKENDS[backend]["batch"]:
+        return lambda frames: model(frames, **predict_kwargs)
+    # Modelos con forma fija (batch=1): un frame por llamada
+    return lambda frames: [model(frame, **predict_kwargs)[0] for frame in frames]
+
+
+# ==================== COMPARACIÓN ====================
+
+def _box_iou(a, b):
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _detections(result, conf):
+    out = []
+    for box in result.boxes:
+        if float(box.conf[0]) >= conf:
+            out.append((int(box.cls[0]), [float(v) for v in box.xyxy[0]]))
+    return out
+
+
+def _agreement(reference, candidate, iou_threshold=0.5):
+    """Precisión y recall de candidate respecto a reference (misma clase, IoU >= umbral)"""
+    matched = 0
+    used = set()
+    for cls_c, box_c in candidate:
+        for i, (cls_r, box_r) in enumerate(reference):
+            if i not in used and cls_c == cls_r and _box_iou(box_c, box_r) >= iou_threshold:
+                used.add(i)
+                matched += 1
+                break
+    precision = matched / len(candidate) if candidate else 1.0
+    recall = matched / len(reference) if reference else 1.0
+    return precision, recall
+
+
+def compare(images_dir, backends, weights=YOLO_WEIGHTS, conf=0.45, warmup=2):
+    """Latencia y concordancia (vs. torch) de cada backend sobre un set local de imágenes"""
+    import cv2
+
+    files = sorted(
+        os.path.join(images_dir, name) for name in os.listdir(images_dir)
+        if name.lower().endswith((".jpg", ".jpeg", ".png"))
+    )
+    images = [img for img in (cv2.imread(f) for f in files) if img is not None]
+    if not images:
+        raise SystemExit(f"No hay imágenes en {images_dir}")
+
+    reference = None
+    report = {}
+    for backend in ["torch"] + [b for b in backends if b != "torch"]:
+        try:
+            model = load_model(backend, weights)
+        except Exception as e:
+            print(f"✗ {backend}: {e}")
+            continue
+
+        for img in images[:warmup]:
+            model(img, verbose=False)
+
+        times = []
+        outputs = []
+        for img in images:
+            t0 = time.perf_counter()
+            result = model(img, verbose=False)[0]
+            times.append(time.perf_counter() - t0)
+            outputs.append(_detections(result, conf))
+
+        if reference is None:
+            reference = outputs
+
+        scores = [_agreement(ref, out) for ref, out in zip(reference, outputs)]
+        times.sort()
+        report[backend] = {
+            "images": len(images),
+            "ms_mean": 1000 * sum(times) / len(times),
+            "ms_p95": 1000 * times[min(len(times) - 1, int(0.95 * len(times)))],
+            "fps": len(times) / sum(times),
+            "precision_vs_torch": sum(p for p, _ in scores) / len(scores),
+            "recall_vs_torch": sum(r for _, r in scores) / len(scores),
+        }
+
+    print(f"\n{'backend':<16}{'ms media':>10}{'ms p95':>10}{'fps':>8}{'prec.':>8}{'recall':>8}")
+    for backend, r in report.items():
+        print(f"{backend:<16}{r['ms_mean']:>10.1f}{r['ms_p95']:>10.1f}{r['fps']:>8.1f}"
+              f"{r['precision_vs_torch']:>8.2f}{r['recall_vs_torch']:>8.2f}")
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Exportar y comparar backends de inferencia YOLO")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="Exportar el modelo a un backend")
+    p_export.add_argument("--backend", required=True, choices=[b for b in BACKENDS if b != "torch"])
+    p_export.add_argument("--weights", default=YOLO_WEIGHTS)
+    p_export.add_argument("--imgsz", type=int, default=IMGSZ)
+    p_export.add_argument("--data", help="Dataset YAML de calibración para INT8")
+
+    p_compare = sub.add_parser("compare", help="Comparar velocidad y precisión sobre imágenes locales")
+    p_compare.add_argument("--images", required=True)
+    p_compare.add_argument("--backends", default=",".join(BACKENDS))
+    p_compare.add_argument("--weights", default=YOLO_WEIGHTS)
+    p_compare.add_argument("--conf", type=float, default=0.45)
+
+    args = parser.parse_args()
+    if args.command == "export":
+        export_model(args.backend, args.weights, args.imgsz, args.data)
+    else:
+        compare(args.images, [b.strip() for b in args.backends.split(",") if b.strip()], args.weights, args.conf)
@@ -0,0 +1,156 @@
+"""
+Planificador de inferencia por lotes
+Junta frames de todas las cámaras activas y ejecuta una sola llamada a YOLO
+"""
+
+from collections import deque
+from concurrent.futures import Future
+import queue
+import threading
+import time
+
+
+def percentile(values, pct):
+    """Percentil simple (sin numpy) sobre una lista de valores"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+class InferenceScheduler:
+    """
+    Agrupa frames en lotes limitados por tamaño máximo y tiempo máximo de espera.
+
+    infer_fn recibe una lista de frames y devuelve una lista de resultados
+    en el mismo orden (ej. lambda frames: model(frames, verbose=False)).
+    on_batch(segundos, n_frames), si se indica, se llama tras cada lote.
+    """
+
+    def __init__(self, infer_fn, max_batch=4, max_wait=0.05, window=500, on_batch=None):
+        self.infer_fn = infer_fn
+        self.on_batch = on_batch
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait))
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+        # Contadores
+        self.batches = 0
+        self.frames = 0
+        self.errors = 0
+        self._started_at = time.time()
+        self._batch_sizes = deque(maxlen=window)
+        self._wait_times = deque(maxlen=window)
+        self._infer_times = deque(maxlen=window)
+        self._latencies = deque(maxlen=window)
+        self._done_times = deque(maxlen=window)
+        self._sources = {}
+
+    def start(self):
+        """Iniciar hilo del planificador"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detener hilo del planificador"""
+        self._stop.set()
+
+    def submit(self, frame, source=None):
+        """Encolar un frame; devuelve un Future con su resultado"""
+        future = Future()
+        self._queue.put((frame, source, time.time(), future))
+        return future
+
+    def infer(self, frame, source=None, timeout=None):
+        """Encolar un frame y esperar su resultado"""
+        return self.submit(frame, source).result(timeout=timeout)
+
+    def _collect_batch(self):
+        """Esperar el primer frame y completar el lote hasta max_batch o max_wait"""
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.time()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            frames = [item[0] for item in batch]
+            t0 = time.time()
+            try:
+                results = list(self.infer_fn(frames))
+                if len(results) != len(frames):
+                    raise RuntimeError(f"infer_fn devolvió {len(results)} resultados para {len(frames)} frames")
+            except Exception as e:
+                print(f"Error en inferencia por lotes: {e}")
+                with self._lock:
+                    self.errors += 1
+                for item in batch:
+                    item[3].set_exception(e)
+                continue
+            t1 = time.time()
+
+            with self._lock:
+                self.batches += 1
+                self.frames += len(batch)
+                self._batch_sizes.append(len(batch))
+                self._infer_times.append(t1 - t0)
+                for _, source, enqueued, _ in batch:
+                    self._wait_times.append(t0 - enqueued)
+                    self._latencies.append(t1 - enqueued)
+                    self._done_times.append(t1)
+                    self._sources[source] = self._sources.get(source, 0) + 1
+
+            if self.on_batch is not None:
+                self.on_batch(t1 - t0, len(batch))
+
+            for item, result in zip(batch, results):
+                item[3].set_result(result)
+
+    def stats(self):
+        """Contadores de throughput y latencia para ajustar lote vs. latencia"""
+        with self._lock:
+            done = list(self._done_times)
+            now = time.time()
+            recent = [t for t in done if now - t <= 10]
+            return {
+                "max_batch": self.max_batch,
+                "max_wait_ms": round(self.max_wait * 1000, 1),
+                "batches": self.batches,
+                "frames": self.frames,
+                "errors": self.errors,
+                "queue_depth": self._queue.qsize(),
+                "avg_batch_size": round(sum(self._batch_sizes) / len(self._batch_sizes), 2) if self._batch_sizes else 0,
+                "throughput_fps": round(len(recent) / 10.0, 2),
+                "wait_ms_p50": round(percentile(self._wait_times, 50) * 1000, 1),
+                "wait_ms_p95": round(percentile(self._wait_times, 95) * 1000, 1),
+                "batch_infer_ms_p50": round(percentile(self._infer_times, 50) * 1000, 1),
+                "batch_infer_ms_p95": round(percentile(self._infer_times, 95) * 1000, 1),
+                "latency_ms_p50": round(percentile(self._latencies, 50) * 1000, 1),
+                "latency_ms_p95": round(percentile(self._latencies, 95) * 1000, 1),
+                "frames_by_source": {str(k): v for k, v in self._sources.items()},
+                "uptime_seconds": round(now - self._started_at, 1),
+            }
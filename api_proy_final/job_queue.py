@@ -0,0 +1,256 @@
+"""
+Cola de trabajos en segundo plano con estado consultable
+Cada trabajo es un JSON en un directorio local (escrito de forma atómica), así
+que cualquier proceso puede responder por su estado; un pool fijo de workers
+los procesa y los pendientes se retoman tras un reinicio
+"""
+
+from collections import deque
+import fcntl
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+from incident_dispatcher import backoff_delay
+from inference_scheduler import percentile
+
+FINISHED = ("done", "failed")
+
+
+class RetryJob(Exception):
+    """Lanzada por process_fn para reintentar el trabajo más tarde (con espera exponencial)"""
+
+
+class JobQueue:
+    """
+    process_fn(job, update, context) procesa un trabajo; update(**campos)
+    guarda avance (ej. stage, progress) en el JSON del trabajo y se puede
+    llamar desde varios hilos. context es un objeto en memoria pasado a
+    submit() (None si el trabajo se retomó tras un reinicio). Si process_fn
+    lanza una excepción el trabajo queda en "failed" con el error; si lanza
+    RetryJob se vuelve a encolar tras una espera (hasta max_retries veces),
+    así que process_fn debe saltarse los pasos que ya guardó en el trabajo.
+
+    Varios procesos (workers de gunicorn) pueden compartir jobs_dir: cada
+    trabajo se reclama con un flock sobre <id>.lock mientras se procesa, y al
+    retomar pendientes se omiten los que otro proceso vivo tiene reclamados
+    (el lock se libera solo si ese proceso muere).
+
+    Los trabajos terminados se borran después de keep_seconds.
+    """
+
+    def __init__(self, jobs_dir, process_fn, workers=2, keep_seconds=86400.0,
+                 max_retries=8, base_delay=2.0, max_delay=300.0):
+        self.jobs_dir = jobs_dir
+        self.process_fn = process_fn
+        self.workers = max(1, int(workers))
+        self.keep_seconds = keep_seconds
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._threads = []
+        self._claims = {}  # job_id -> descriptor del lock
+
+        # Contadores
+        self.submitted = 0
+        self.running = 0
+        self.waiting_retry = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self._wait_times = deque(maxlen=300)
+        self._run_times = deque(maxlen=300)
+
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    # ---------- Persistencia ----------
+
+    def _path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _persist(self, job):
+        path = self._path(job["id"])
+        tmp = f"{path}.tmp"
+        with self._write_lock:
+            with open(tmp, "w") as f:
+                json.dump(job, f)
+            os.replace(tmp, path)
+
+    def get(self, job_id):
+        """Estado de un trabajo (de cualquier proceso) o None"""
+        if not job_id.replace("_", "").isalnum():
+            return None
+        try:
+            with open(self._path(job_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _claim(self, job_id):
+        """Reclamar el trabajo para este proceso; False si otro proceso lo tiene"""
+        fd = os.open(os.path.join(self.jobs_dir, f"{job_id}.lock"), os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        with self._lock:
+            self._claims[job_id] = fd
+        return True
+
+    def _release(self, job_id):
+        with self._lock:
+            fd = self._claims.pop(job_id, None)
+        if fd is None:
+            return
+        try:
+            os.remove(os.path.join(self.jobs_dir, f"{job_id}.lock"))
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+
+    # ---------- Cola ----------
+
+    def submit(self, context=None, **fields):
+        """Guardar un trabajo nuevo y encolarlo; devuelve el trabajo"""
+        now = time.time()
+        job = dict(
+            fields,
+            id=f"{int(now * 1000)}_{uuid.uuid4().hex[:8]}",
+            status="queued",
+            created_at=now,
+            updated_at=now,
+            attempts=0,
+            error=None,
+        )
+        self._claim(job["id"])
+        self._persist(job)
+        with self._lock:
+            self.submitted += 1
+        self._queue.put((job, context))
+        return job
+
+    def load_pending(self):
+        """Reencolar trabajos sin terminar (y sin dueño) de una ejecución anterior y limpiar los viejos"""
+        loaded = 0
+        now = time.time()
+        for name in sorted(os.listdir(self.jobs_dir)):
+            if not name.endswith(".json"):
+                continue
+            job_id = name[:-len(".json")]
+            job = self.get(job_id)
+            if job is None:
+                continue
+            if job["status"] in FINISHED:
+                if now - job["updated_at"] > self.keep_seconds:
+                    os.remove(self._path(job_id))
+                continue
+            if job_id in self._claims or not self._claim(job_id):
+                continue
+            # Releer: el dueño anterior pudo terminarlo antes de soltar el lock
+            job = self.get(job_id)
+            if job is None or job["status"] in FINISHED:
+                self._release(job_id)
+                continue
+            delay = max(0.0, job.get("retry_at", now) - now)
+            job["status"] = "queued"
+            self._persist(job)
+            self._enqueue_later(job, delay)
+            loaded += 1
+        return loaded
+
+    def _enqueue_later(self, job, delay):
+        if delay <= 0:
+            self._queue.put((job, None))
+            return
+        with self._lock:
+            self.waiting_retry += 1
+
+        def enqueue():
+            with self._lock:
+                self.waiting_retry -= 1
+            self._queue.put((job, None))
+
+        timer = threading.Timer(delay, enqueue)
+        timer.daemon = True
+        timer.start()
+
+    def start(self):
+        loaded = self.load_pending()
+        if loaded:
+            print(f"📬 {loaded} trabajo(s) pendiente(s) recuperado(s)")
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _worker(self):
+        while True:
+            job, context = self._queue.get()
+            started = time.time()
+            with self._lock:
+                self.running += 1
+                self._wait_times.append(started - job.get("retry_at", job["created_at"]))
+
+            def update(**fields):
+                with self._write_lock:
+                    job.update(fields, updated_at=time.time())
+                self._persist(job)
+
+            outcome = "done"
+            try:
+                update(status="running", started_at=started)
+                self.process_fn(job, update, context)
+                update(status="done", finished_at=time.time())
+            except RetryJob as e:
+                attempts = job.get("attempts", 0) + 1
+                if attempts > self.max_retries:
+                    print(f"✗ Trabajo {job['id']} descartado tras {attempts} intentos: {e}")
+                    update(status="failed", attempts=attempts, error=str(e), finished_at=time.time())
+                    outcome = "failed"
+                else:
+                    delay = backoff_delay(attempts, self.base_delay, self.max_delay)
+                    print(f"⚠️ Trabajo {job['id']} falló (intento {attempts}): {e}. Reintento en {delay:.1f}s")
+                    update(status="retrying", attempts=attempts, error=str(e), retry_at=time.time() + delay)
+                    outcome = "retry"
+                    self._enqueue_later(job, delay)
+            except Exception as e:
+                print(f"✗ Trabajo {job['id']} falló: {e}")
+                update(status="failed", error=f"{type(e).__name__}: {e}", finished_at=time.time())
+                outcome = "failed"
+
+            if outcome != "retry":
+                self._release(job["id"])
+            with self._lock:
+                self.running -= 1
+                if outcome == "done":
+                    self.completed += 1
+                elif outcome == "failed":
+                    self.failed += 1
+                else:
+                    self.retries += 1
+                self._run_times.append(time.time() - started)
+
+    def stats(self):
+        with self._lock:
+            wait_times = list(self._wait_times)
+            run_times = list(self._run_times)
+            return {
+                "workers": self.workers,
+                "queued": self._queue.qsize(),
+                "running": self.running,
+                "waiting_retry": self.waiting_retry,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "retries": self.retries,
+                "wait_p95_seconds": round(percentile(wait_times, 95), 3) if wait_times else None,
+                "run_p95_seconds": round(percentile(run_times, 95), 3) if run_times else None,
+            }
@@ -0,0 +1,81 @@
+"""
+Filtro de movimiento previo a YOLO
+Compara una versión reducida en escala de grises del frame contra el último frame
+inferido y solo deja pasar a inferencia cuando hubo cambios (o cada cierto tiempo)
+"""
+
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    threshold:      fracción de píxeles que deben cambiar para inferir (0-1)
+    pixel_delta:    diferencia mínima de gris (0-255) para contar un píxel como cambiado
+    size:           resolución reducida usada para comparar (ancho, alto)
+    force_interval: segundos máximos sin inferir aunque la escena no cambie
+    """
+
+    def __init__(self, threshold=0.01, pixel_delta=25, size=(64, 48), force_interval=5.0):
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.size = size
+        self.force_interval = force_interval
+
+        self._reference = None
+        self._last_inference = 0.0
+        self._lock = threading.Lock()
+
+        self.inferred = 0
+        self.skipped = 0
+        self.forced = 0
+        self.last_score = 0.0
+
+    def _small_gray(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small
+
+    def check(self, frame, now=None):
+        """True si el frame debe pasar a inferencia"""
+        now = time.time() if now is None else now
+        small = self._small_gray(frame)
+
+        with self._lock:
+            if self._reference is None:
+                score = 1.0
+            else:
+                diff = cv2.absdiff(small, self._reference)
+                score = float(np.count_nonzero(diff > self.pixel_delta)) / diff.size
+            self.last_score = score
+
+            changed = score >= self.threshold
+            forced = not changed and now - self._last_inference >= self.force_interval
+
+            if changed or forced:
+                # La referencia es el último frame inferido: cambios lentos se acumulan
+                self._reference = small
+                self._last_inference = now
+                self.inferred += 1
+                if forced:
+                    self.forced += 1
+                return True
+
+            self.skipped += 1
+            return False
+
+    def stats(self):
+        with self._lock:
+            total = self.inferred + self.skipped
+            return {
+                "inferred": self.inferred,
+                "skipped": self.skipped,
+                "forced": self.forced,
+                "skip_ratio": round(self.skipped / total, 3) if total else 0.0,
+                "last_motion_score": round(self.last_score, 4),
+                "threshold": self.threshold,
+            }
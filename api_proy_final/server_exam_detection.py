@@ -4,209 +4,684 @@ Servidor de Detección de Examen - API REST
 Para desplegar en Render.com
 """
 
-from flask import Flask, request, jsonify
+import time
+IMPORT_STARTED = time.perf_counter()  # costo de importar el módulo (arranque en frío)
+
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
+from werkzeug.http import parse_etags, unquote_etag
 import cv2
 import numpy as np
-from ultralytics import YOLO
 from datetime import datetime
 import os
-import time
-import requests
+import sys
 import threading
-from google.cloud import storage
 import tempfile
+from contextlib import contextmanager
 import base64
+import uuid
+import requests
+
+from inference_scheduler import InferenceScheduler
+from exam_pipeline import CameraPipeline
+from frame_source import MjpegStreamReader, stream_url_for
+from http_client import http_pool
+from incident_dispatcher import IncidentDispatcher
+from tracker import IoUTracker, centroid_distance, iou
+from motion_gate import MotionGate
+from inference_backends import IMGSZ, INFERENCE_BACKEND, load_model, make_infer_fn
+from frame import REDUCED_FLAGS, Frame, decode_jpeg
+from detections import PROHIBITED, as_dicts, count_persons, parse_boxes, predict_kwargs, prohibited_mask
+from adaptive_sampler import AdaptiveSampler, CpuBudget
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Registry
+from event_broadcaster import EventBroadcaster
+from exam_state import ExamStateStore, IncidentStore
+from engine_ipc import EngineClient, EngineServer, EngineUnavailable, EventRelay, RemoteError
 
 app = Flask(__name__)
 CORS(app)
 
 # CONFIGURACIÓN
+
+# Arquitectura del proceso:
+#   local  - todo en este proceso (python server_exam_detection.py)
+#   engine - proceso dedicado con el modelo y los pipelines (python server_exam_detection.py --engine)
+#   remote - worker HTTP de gunicorn que delega en el motor (ver gunicorn.conf.py)
+EXAM_ENGINE = os.getenv("EXAM_ENGINE", "local").lower()
+EXAM_ENGINE_ADDRESS = os.getenv("EXAM_ENGINE_ADDRESS", "127.0.0.1:5101")
+# Clave del canal motor ↔ workers: por él viajan pickles, así que quien la
+# conozca puede ejecutar código en el motor. Sin valor por defecto
+# (gunicorn.conf.py genera una al arrancar)
+EXAM_ENGINE_AUTHKEY = os.getenv("EXAM_ENGINE_AUTHKEY", "").encode()
+if (EXAM_ENGINE != "local" or "--engine" in sys.argv) and not EXAM_ENGINE_AUTHKEY:
+    sys.exit("✗ EXAM_ENGINE_AUTHKEY no está definida: el canal con el motor necesita una clave secreta")
+
+# Rutas relativas respecto a este archivo: el motor (que gunicorn arranca en
+# este directorio) y los workers deben abrir los mismos archivos
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Estado compartido entre procesos (cámaras, sesiones e índice de incidentes)
+EXAM_STATE_DB = os.path.join(BASE_DIR, os.getenv("EXAM_STATE_DB", "exam_state.db"))
+STATE_SYNC_INTERVAL = float(os.getenv("STATE_SYNC_INTERVAL", "1"))
+
+# Paginación de /api/exam/incidents
+INCIDENTS_PAGE_SIZE = int(os.getenv("INCIDENTS_PAGE_SIZE", "50"))
+INCIDENTS_MAX_PAGE_SIZE = int(os.getenv("INCIDENTS_MAX_PAGE_SIZE", "500"))
+
 ESP32_IP = os.getenv("ESP32_IP", "192.168.0.139")
 
-# Determinar URL base correcta
-if ESP32_IP.startswith("http://") or ESP32_IP.startswith("https://"):
-    BASE_ESP32_URL = ESP32_IP
-else:
-    BASE_ESP32_URL = f"http://{ESP32_IP}"
+# Registro de cámaras: "aula1=192.168.0.139,aula2=https://xxxx.ngrok.io"
+# Si no se define, se usa una sola cámara "default" con ESP32_IP
+ESP32_CAMERAS = os.getenv("ESP32_CAMERAS", "")
+DEFAULT_CAMERA = os.getenv("DEFAULT_CAMERA_ID", "default")
 
-CAPTURE_URL = f"{BASE_ESP32_URL}/capture"
 CONFIDENCE = float(os.getenv("CONFIDENCE", "0.45"))
 NODE_BACKEND = os.getenv("NODE_BACKEND_URL", "https://api-tresa.onrender.com")
 
 # Google Cloud Storage
 GCS_BUCKET = os.getenv("GCS_BUCKET", "exam-monitoring-tresa")
 
-PROHIBITED = {
-    67: "Celular/Teléfono",
-    73: "Libro",
-}
+# Entrega de incidentes en segundo plano (spool en disco + reintentos)
+INCIDENT_SPOOL_DIR = os.path.join(BASE_DIR, os.getenv("INCIDENT_SPOOL_DIR", "incident_spool"))
+DISPATCH_WORKERS = int(os.getenv("DISPATCH_WORKERS", "2"))
+DISPATCH_MAX_RETRIES = int(os.getenv("DISPATCH_MAX_RETRIES", "8"))
 
-# Estado global
-exam_state = {
-    "active": False,
-    "start_time": None,
-    "incident_count": 0,
-    "monitoring_thread": None,
-    "stop_monitoring": False
-}
+# Backend de inferencia: torch | onnx | openvino | openvino-int8
+INFERENCE_AUTO_EXPORT = os.getenv("INFERENCE_AUTO_EXPORT", "0") == "1"
+
+# Inferencia por lotes entre cámaras
+INFER_MAX_BATCH = int(os.getenv("INFER_MAX_BATCH", "4"))
+INFER_MAX_WAIT_MS = float(os.getenv("INFER_MAX_WAIT_MS", "50"))
+
+# Intervalo entre capturas de una cámara (segundos): base, mínimo con actividad
+# y máximo con la escena tranquila
+CAPTURE_INTERVAL = float(os.getenv("CAPTURE_INTERVAL", "0.5"))
+SAMPLE_MIN_INTERVAL = float(os.getenv("SAMPLE_MIN_INTERVAL", "0.2"))
+SAMPLE_MAX_INTERVAL = float(os.getenv("SAMPLE_MAX_INTERVAL", "2.0"))
+ACTIVITY_HOLD = float(os.getenv("ACTIVITY_HOLD", "10"))
+
+# Fracción del tiempo que el modelo puede estar ocupado (todas las cámaras)
+CPU_BUDGET = float(os.getenv("CPU_BUDGET", "0.8"))
+
+# Modo de ingesta: "poll" (una petición a /capture por frame) o "mjpeg" (stream continuo)
+CAPTURE_MODE = os.getenv("CAPTURE_MODE", "poll").lower()
+ESP32_STREAM_URL = os.getenv("ESP32_STREAM_URL")
+
+# Timeouts HTTP (segundos): conexión y lectura por separado
+ESP32_CONNECT_TIMEOUT = float(os.getenv("ESP32_CONNECT_TIMEOUT", "3"))
+ESP32_READ_TIMEOUT = float(os.getenv("ESP32_READ_TIMEOUT", "30"))
+BACKEND_CONNECT_TIMEOUT = float(os.getenv("BACKEND_CONNECT_TIMEOUT", "5"))
+BACKEND_READ_TIMEOUT = float(os.getenv("BACKEND_READ_TIMEOUT", "5"))
+
+# Seguimiento de objetos: un incidente por objeto, no por frame
+TRACK_IOU = float(os.getenv("TRACK_IOU", "0.3"))
+TRACK_MAX_IDLE = float(os.getenv("TRACK_MAX_IDLE", "5"))
+TRACK_MIN_HITS = int(os.getenv("TRACK_MIN_HITS", "2"))
+INCIDENT_COOLDOWN = float(os.getenv("INCIDENT_COOLDOWN", "60"))
+INCIDENT_UPDATE_INTERVAL = float(os.getenv("INCIDENT_UPDATE_INTERVAL", "30"))
+
+# Filtro de movimiento: no correr YOLO si la escena no cambió
+MOTION_GATE = os.getenv("MOTION_GATE", "1") == "1"
+MOTION_THRESHOLD = float(os.getenv("MOTION_THRESHOLD", "0.01"))
+MOTION_PIXEL_DELTA = int(os.getenv("MOTION_PIXEL_DELTA", "25"))
+MOTION_FORCE_INTERVAL = float(os.getenv("MOTION_FORCE_INTERVAL", "5"))
+
+# Snapshot para el dashboard: sin examen activo, reutilizar la última captura
+# durante este tiempo antes de volver a pedirle un frame a la cámara
+SNAPSHOT_MAX_AGE = float(os.getenv("SNAPSHOT_MAX_AGE", "2"))
+
+# Arranque: el modelo se carga en segundo plano y se calienta con una inferencia
+# antes de marcar el motor como listo (/ready)
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
+
+# Eventos SSE para dashboards: como máximo un resumen de detecciones por cámara
+# cada EVENTS_DETECTION_INTERVAL segundos
+EVENTS_DETECTION_INTERVAL = float(os.getenv("EVENTS_DETECTION_INTERVAL", "1"))
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+# Conexiones SSE por proceso HTTP (0 = sin límite); con gunicorn cada una ocupa
+# un hilo y gunicorn.conf.py deja hilos libres para las demás rutas
+EVENTS_MAX_CLIENTS = int(os.getenv("EVENTS_MAX_CLIENTS", "0"))
+
+def build_base_url(ip):
+    """Determinar URL base correcta de una ESP32-CAM"""
+    if ip.startswith("http://") or ip.startswith("https://"):
+        return ip.rstrip("/")
+    return f"http://{ip}"
+
+
+# ==================== MÉTRICAS ====================
+
+metrics = Registry()
+STAGE_SECONDS = metrics.histogram(
+    "exam_stage_seconds", "Latencia por etapa del pipeline de una cámara", ("camera", "stage"))
+FRAMES = metrics.counter(
+    "exam_frames_total", "Frames por resultado (inferred, static, warming_up)", ("camera", "result"))
+FRAMES_DROPPED = metrics.counter(
+    "exam_frames_dropped_total", "Frames descartados por colas llenas", ("camera", "queue"))
+INCIDENT_QUEUE_OVERFLOWS = metrics.counter(
+    "exam_incident_queue_overflows_total", "Incidentes encolados con la cola de incidentes sobre su límite (no se descartan)", ("camera",))
+INCIDENTS = metrics.counter(
+    "exam_incidents_total", "Incidentes nuevos detectados", ("camera",))
+ESP32_ERRORS = metrics.counter(
+    "exam_esp32_errors_total", "Errores al leer la ESP32-CAM", ("camera", "kind"))
+STREAM_RECONNECTS = metrics.counter(
+    "exam_stream_reconnects_total", "Reconexiones del stream MJPEG", ("camera",))
+BATCH_SECONDS = metrics.histogram(
+    "exam_inference_batch_seconds", "Duración de cada llamada al modelo (lote completo)")
+BATCH_SIZE = metrics.histogram(
+    "exam_inference_batch_size", "Frames por lote de inferencia", buckets=(1, 2, 3, 4, 6, 8, 16))
+DELIVERY_SECONDS = metrics.histogram(
+    "exam_delivery_seconds", "Latencia de entrega de incidentes por cámara y paso", ("camera", "step"))
+DELIVERY_ERRORS = metrics.counter(
+    "exam_delivery_errors_total", "Errores de entrega de incidentes por cámara y paso", ("camera", "step"))
+DISPATCH_PENDING = metrics.gauge(
+    "exam_dispatch_pending", "Incidentes pendientes en el spool")
+ACTIVE_SESSIONS = metrics.gauge(
+    "exam_active_sessions", "Sesiones de examen activas")
+EVENT_SUBSCRIBERS = metrics.gauge(
+    "exam_event_subscribers", "Dashboards conectados a /api/exam/events")
+STARTUP_SECONDS = metrics.gauge(
+    "exam_startup_seconds", "Duración de cada fase del arranque del motor", ("phase",))
+
+
+@contextmanager
+def timed_step(camera_id, step):
+    """Medir un paso de entrega y contar sus errores"""
+    try:
+        with DELIVERY_SECONDS.labels(camera_id, step).time():
+            yield
+    except Exception:
+        DELIVERY_ERRORS.labels(camera_id, step).inc()
+        raise
+
+
+# Totales por sesión (colas, reconexiones) ya exportados a los contadores:
+# (id de la sesión, serie) -> valor
+_exported_totals = {}
+_exported_lock = threading.Lock()
+
+
+def export_total(counter, session, total, *labels):
+    """Sumar a un contador lo que creció un total acumulado de la sesión desde el último scrape"""
+    key = (id(session), counter.name, labels)
+    with _exported_lock:
+        previous = _exported_totals.get(key, 0)
+        # Un total menor es otra sesión que reutilizó el mismo id
+        counter.labels(*labels).inc(total - previous if total >= previous else total)
+        _exported_totals[key] = total
+
+
+def on_inference_batch(seconds, n):
+    cpu_budget.record(seconds)
+    BATCH_SECONDS.observe(seconds)
+    BATCH_SIZE.observe(n)
+
+
+# Un solo productor de eventos para todos los dashboards conectados
+broadcaster = EventBroadcaster(heartbeat=EVENTS_HEARTBEAT)
+events_slots = threading.BoundedSemaphore(EVENTS_MAX_CLIENTS) if EVENTS_MAX_CLIENTS > 0 else None
+events_slots_lock = threading.Lock()
+events_rejected = 0
+
+# Presupuesto de CPU compartido por todas las sesiones
+cpu_budget = CpuBudget(CPU_BUDGET)
+
+# Estado compartido por todos los procesos
+state_store = ExamStateStore(EXAM_STATE_DB)
+state_lock = threading.Lock()  # ordena las escrituras de estado frente a start/stop
 
-# Cargar YOLO al iniciar
-print("📦 Cargando YOLO...")
-model = YOLO('yolov8n.pt')
-print("✓ YOLO cargado")
+# Índice de incidentes (mismo archivo SQLite; el motor escribe, los workers consultan)
+incident_store = IncidentStore(EXAM_STATE_DB)
 
-# Configurar Google Cloud Storage
+# Registro de cámaras del motor {camera_id: {...}}
+cameras = {}
+
+# Sesiones de examen por cámara {camera_id: {...}}
+exam_sessions = {}
+sessions_lock = threading.Lock()
+
+
+def register_camera(camera_id, ip, stream_url=None):
+    """Registrar (o actualizar) una cámara en el registro y en el estado compartido"""
+    state_store.save_camera(camera_id, ip, stream_url)
+    base_url = build_base_url(ip)
+    cameras[camera_id] = {
+        "id": camera_id,
+        "ip": ip,
+        "base_url": base_url,
+        "capture_url": f"{base_url}/capture",
+        "stream_url": stream_url or stream_url_for(base_url),
+    }
+    return cameras[camera_id]
+
+
+def new_session(camera_id):
+    """Crear estado de sesión vacío para una cámara"""
+    return {
+        "camera_id": camera_id,
+        "active": False,
+        "start_time": None,
+        "session_id": None,  # identificador estable (sobrevive a reinicios del motor)
+        "incident_count": 0,
+        "pipeline": None,
+        "stream": None,
+        "tracker": IoUTracker(TRACK_IOU, max_idle=TRACK_MAX_IDLE),
+        "tracker_lock": threading.Lock(),
+        "recent_incidents": [],  # tracks terminados con incidente (para cooldown por ubicación)
+        "suppressed_detections": 0,
+        "motion_gate": MotionGate(
+            MOTION_THRESHOLD,
+            pixel_delta=MOTION_PIXEL_DELTA,
+            force_interval=MOTION_FORCE_INTERVAL
+        ) if MOTION_GATE else None,
+        "last_items": [],
+        "last_persons": 0,
+        "latest_jpeg": None,  # último JPEG capturado (para /snapshot)
+        "snapshot_lock": threading.Lock(),  # una sola captura a la vez para /snapshot
+        "last_event_at": 0.0,  # último resumen de detecciones publicado
+        "frame_seq": 0,
+        "sampler": AdaptiveSampler(
+            min_interval=min(SAMPLE_MIN_INTERVAL, CAPTURE_INTERVAL),
+            base_interval=CAPTURE_INTERVAL,
+            max_interval=max(SAMPLE_MAX_INTERVAL, CAPTURE_INTERVAL),
+            activity_hold=ACTIVITY_HOLD,
+            budget=cpu_budget
+        )
+    }
+
+
+def get_session(camera_id):
+    """Obtener (o crear) el estado de sesión de una cámara"""
+    with sessions_lock:
+        if camera_id not in exam_sessions:
+            exam_sessions[camera_id] = new_session(camera_id)
+        return exam_sessions[camera_id]
+
+
+# Recursos del motor (se crean en init_engine, solo en el proceso que corre los pipelines)
+model = None
+scheduler = None
 storage_client = None
 bucket = None
+dispatcher = None
 
-try:
-    if "GOOGLE_CLOUD_CREDENTIALS" in os.environ:
-        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.json') as temp:
-            temp.write(os.environ["GOOGLE_CLOUD_CREDENTIALS"])
-            temp_path = temp.name
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = temp_path
-        storage_client = storage.Client()
-        bucket = storage_client.bucket(GCS_BUCKET)
-        print(f"✓ Google Cloud Storage conectado: {GCS_BUCKET}")
-except Exception as e:
-    print(f"⚠️ GCS no disponible: {e}")
+# Modelo cargado y calentado; hasta entonces los pipelines capturan pero no infieren
+engine_ready = threading.Event()
+startup = {
+    "import_seconds": None,
+    "model_load_seconds": None,
+    "warmup_seconds": None,
+    "ready_after_seconds": None,
+    "error": None,
+}
 
 
-def capture_frame():
-    """Capturar frame desde ESP32-CAM"""
+def init_gcs():
+    """Configurar Google Cloud Storage (sin GCS las imágenes viajan en base64)"""
+    global storage_client, bucket
+    from google.cloud import storage
+    try:
+        if "GOOGLE_CLOUD_CREDENTIALS" in os.environ:
+            with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.json') as temp:
+                temp.write(os.environ["GOOGLE_CLOUD_CREDENTIALS"])
+                temp_path = temp.name
+            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = temp_path
+            storage_client = storage.Client()
+            bucket = storage_client.bucket(GCS_BUCKET)
+            print(f"✓ Google Cloud Storage conectado: {GCS_BUCKET}")
+        elif os.getenv("STORAGE_EMULATOR_HOST"):
+            # Emulador local de GCS (benchmarks / pruebas sin credenciales)
+            from google.auth.credentials import AnonymousCredentials
+            storage_client = storage.Client(credentials=AnonymousCredentials(), project="local")
+            bucket = storage_client.bucket(GCS_BUCKET)
+            print(f"✓ Emulador de GCS: {os.environ['STORAGE_EMULATOR_HOST']}")
+    except Exception as e:
+        print(f"⚠️ GCS no disponible: {e}")
+
+
+def fetch_jpeg(camera):
+    """Descargar un JPEG desde /capture de la ESP32-CAM"""
     try:
-        r = requests.get(CAPTURE_URL, timeout=30)
+        r = http_pool.get(
+            camera["capture_url"],
+            connect_timeout=ESP32_CONNECT_TIMEOUT,
+            read_timeout=ESP32_READ_TIMEOUT
+        )
         if r.status_code != 200:
+            ESP32_ERRORS.labels(camera["id"], "status").inc()
             return None
-        
-        img_array = np.frombuffer(r.content, dtype=np.uint8)
-        frame = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-        return frame
+        return r.content
     except Exception as e:
-        print(f"Error capturando frame: {e}")
+        kind = "timeout" if isinstance(e, requests.Timeout) else "connection"
+        ESP32_ERRORS.labels(camera["id"], kind).inc()
+        print(f"[{camera['id']}] Error capturando frame: {e}")
         return None
 
 
-def trigger_led(state):
+def make_frame(jpeg_bytes, captured_at=None):
+    """Frame con los bytes originales; se decodifica reducido si supera la entrada del modelo"""
+    return Frame(jpeg_bytes, captured_at, target=IMGSZ)
+
+
+def capture_frame(camera):
+    """Capturar frame desde ESP32-CAM"""
+    jpeg_bytes = fetch_jpeg(camera)
+    if jpeg_bytes is None:
+        return None
+    return make_frame(jpeg_bytes)
+
+
+def trigger_led(camera, state):
     """Controlar LED de ESP32-CAM"""
     try:
-        requests.get(f"{BASE_ESP32_URL}/led?state={state}", timeout=2)
+        http_pool.get(
+            f"{camera['base_url']}/led?state={state}",
+            connect_timeout=ESP32_CONNECT_TIMEOUT,
+            read_timeout=2
+        )
     except:
         pass
 
 
-def upload_to_gcs(image_data, filename):
-    """Subir imagen a Google Cloud Storage"""
+def blink_led(camera, seconds=2):
+    """Encender el LED unos segundos sin bloquear al llamador"""
+    def _blink():
+        trigger_led(camera, 1)
+        time.sleep(seconds)
+        trigger_led(camera, 0)
+    threading.Thread(target=_blink, daemon=True).start()
+
+
+def upload_to_gcs(image_data, filename, camera_id):
+    """Subir imagen a Google Cloud Storage (lanza excepción si falla)"""
     if not bucket:
         return None
     
-    try:
-        blob = bucket.blob(f"exam_incidents/{filename}")
+    blob = bucket.blob(f"exam_incidents/{filename}")
+    with timed_step(camera_id, "gcs_upload"):
         blob.upload_from_string(image_data, content_type='image/jpeg')
-        # blob.make_public() - No necesario/permitido con Uniform Bucket-Level Access
-        return blob.public_url
-    except Exception as e:
-        print(f"Error subiendo a GCS: {e}")
-        return None
+    # blob.make_public() - No necesario/permitido con Uniform Bucket-Level Access
+    return blob.public_url
 
 
 def notify_backend(incident_data):
-    """Notificar al backend Node.js"""
-    try:
-        response = requests.post(
+    """Notificar al backend Node.js (lanza excepción si falla)"""
+    with timed_step(incident_data.get("camera_id", "unknown"), "backend_notify"):
+        response = http_pool.post(
             f"{NODE_BACKEND}/api/exam-alerts",
             json=incident_data,
-            timeout=5
+            connect_timeout=BACKEND_CONNECT_TIMEOUT,
+            read_timeout=BACKEND_READ_TIMEOUT
         )
-        print(f"✓ Alerta enviada al backend: {response.status_code}")
-    except Exception as e:
-        print(f"Error notificando backend: {e}")
+        response.raise_for_status()
+    print(f"✓ Alerta enviada al backend: {response.status_code}")
+
+
+def notify_backend_update(update_data):
+    """Actualizar la duración de un incidente existente en el backend"""
+    with timed_step(update_data.get("camera_id", "unknown"), "backend_update"):
+        response = http_pool.request(
+            "PATCH",
+            f"{NODE_BACKEND}/api/exam-alerts/by-key/{update_data['incident_key']}",
+            json=update_data,
+            connect_timeout=BACKEND_CONNECT_TIMEOUT,
+            read_timeout=BACKEND_READ_TIMEOUT
+        )
+        response.raise_for_status()
 
 
-def monitoring_loop():
-    """Loop de monitoreo continuo"""
-    print("🎬 Iniciando monitoreo...")
+def deliver_incident(job):
+    """Entregar un incidente del spool: subir imagen y notificar al backend"""
+    if job.get("kind") == "update":
+        # Si el alta aún no llegó al backend (404) se reintenta más tarde
+        notify_backend_update(job["incident"])
+        return
     
-    while not exam_state["stop_monitoring"]:
-        if not exam_state["active"]:
-            time.sleep(1)
-            continue
-        
-        # Capturar frame
-        frame = capture_frame()
-        if frame is None:
-            time.sleep(0.5)
-            continue
-        
-        # Detectar con YOLO
-        results = model(frame, verbose=False)
+    state = job["state"]
+    
+    # La imagen se sube una sola vez aunque falle el aviso al backend
+    if "image_url" not in state:
+        img_bytes = dispatcher.read_image(job)
+        image_url = upload_to_gcs(img_bytes, job["filename"], job["incident"]["camera_id"]) if img_bytes else None
         
-        detections = []
-        prohibited_items = []
+        # Si no hay GCS, usar base64
+        if not image_url and img_bytes:
+            image_base64 = base64.b64encode(img_bytes).decode('utf-8')
+            image_url = f"data:image/jpeg;base64,{image_base64}"
+        state["image_url"] = image_url
+        if image_url and not image_url.startswith("data:"):
+            incident_store.set_image_url(job["incident"]["incident_key"], image_url)
+    
+    incident_data = dict(job["incident"], image_url=state["image_url"])
+    notify_backend(incident_data)
+    
+    print(f"✓ Incidente entregado: {job['filename']}")
+
+
+def detect_objects(camera_id, frame):
+    """Inferencia de un Frame; devuelve (objetos prohibidos, número de personas)"""
+    t0 = time.perf_counter()
+    result = scheduler.infer(frame.image, source=camera_id)
+    t1 = time.perf_counter()
+    STAGE_SECONDS.labels(camera_id, "inference").observe(t1 - t0)
+    
+    # Coordenadas de la imagen original aunque se haya decodificado reducida
+    dets = parse_boxes(result.boxes, CONFIDENCE, scale=frame.scale)
+    prohibited_items = as_dicts(dets[prohibited_mask(dets)], model.names)
+    persons = count_persons(dets)
+    
+    STAGE_SECONDS.labels(camera_id, "postprocess").observe(time.perf_counter() - t1)
+    return prohibited_items, persons
+
+
+def track_incidents(session, items, now=None):
+    """
+    Actualizar el tracker de la sesión y decidir qué reportar.
+    
+    Devuelve eventos ("new", incidente, items) para objetos nuevos y
+    ("update", incidente, None) para actualizar la duración de uno existente.
+    """
+    now = time.time() if now is None else now
+    events = []
+    
+    with session["tracker_lock"]:
+        seen, ended = session["tracker"].update(items, now)
         
-        for result in results:
-            for box in result.boxes:
-                conf = float(box.conf[0])
-                if conf < CONFIDENCE:
+        for track in seen:
+            if track.incident is None:
+                if track.hits < TRACK_MIN_HITS:
                     continue
                 
-                class_id = int(box.cls[0])
-                class_name = model.names[class_id]
-                
-                detection = {
-                    'class_id': class_id,
-                    'name': class_name,
-                    'confidence': conf
-                }
-                
-                detections.append(detection)
-                
-                if class_id in PROHIBITED:
-                    prohibited_items.append(detection)
-        
-        # Si hay objetos prohibidos, generar alerta
-        if prohibited_items and exam_state["active"]:
-            handle_incident(frame, prohibited_items)
+                recent = pop_recent_incident(session, track, now)
+                if recent is not None:
+                    # Mismo objeto reaparecido donde estaba: se suma a su incidente
+                    track.incident = recent
+                    session["suppressed_detections"] += 1
+                else:
+                    track.incident = {
+                        "key": uuid.uuid4().hex,
+                        "camera_id": session["camera_id"],
+                        "first_seen": track.first_seen,
+                        "last_seen": now,
+                        "last_update": now
+                    }
+                    events.append(("new", track.incident, items))
+                    continue
+            else:
+                session["suppressed_detections"] += 1
+            
+            incident = track.incident
+            incident["last_seen"] = max(incident["last_seen"], track.last_seen)
+            if now - incident["last_update"] >= INCIDENT_UPDATE_INTERVAL:
+                incident["last_update"] = now
+                events.append(("update", incident, None))
         
-        # Pequeña pausa para no saturar
-        time.sleep(0.5)
+        # Objeto que desapareció: enviar duración final y recordar dónde estaba
+        for track in ended:
+            if track.incident is not None:
+                track.incident["last_seen"] = max(track.incident["last_seen"], track.last_seen)
+                events.append(("update", track.incident, None))
+                session["recent_incidents"].append({
+                    "class_id": track.class_id,
+                    "bbox": track.bbox,
+                    "incident": track.incident
+                })
     
-    print("🛑 Monitoreo detenido")
+    return events
+
+
+def pop_recent_incident(session, track, now):
+    """
+    Incidente de un track ya terminado de la misma clase y en el mismo lugar
+    (IoU o distancia de centroides con su última caja) dentro del cooldown.
+
+    Solo se consideran tracks terminados: un segundo objeto que aparece en
+    otro lugar, o mientras el primero sigue a la vista, es un incidente nuevo.
+    El incidente devuelto se quita de la lista (lo retoma un solo track).
+    """
+    recent = [r for r in session["recent_incidents"] if now - r["incident"]["last_seen"] < INCIDENT_COOLDOWN]
+    session["recent_incidents"] = recent
+    tracker = session["tracker"]
+    for i, r in enumerate(recent):
+        if r["class_id"] != track.class_id:
+            continue
+        if (iou(r["bbox"], track.bbox) >= tracker.iou_threshold
+                or centroid_distance(r["bbox"], track.bbox) <= tracker.max_centroid_distance):
+            return recent.pop(i)["incident"]
+    return None
 
 
-def handle_incident(frame, items):
+def build_pipeline(session):
+    """Crear el pipeline captura → decodificación → inferencia → incidentes de una sesión"""
+    camera_id = session["camera_id"]
+    stream = session["stream"]
+    last_seq = [0]
+    
+    capture_seconds = STAGE_SECONDS.labels(camera_id, "capture")
+    decode_seconds = STAGE_SECONDS.labels(camera_id, "decode")
+    
+    def capture():
+        with capture_seconds.time():
+            raw = _capture()
+        if raw is not None:
+            remember_frame(session, raw)
+        return raw
+    
+    def _capture():
+        if stream is not None:
+            # Modo MJPEG: tomar el frame más reciente del stream
+            frame = stream.wait_for_frame(last_seq[0], timeout=5)
+            if frame is None:
+                return None
+            last_seq[0] = frame[2]
+            return frame[0]
+        camera = cameras.get(camera_id)
+        return fetch_jpeg(camera) if camera else None
+    
+    def decode(raw):
+        frame = make_frame(raw)
+        with decode_seconds.time():
+            return frame if frame.image is not None else None
+    
+    def infer(frame):
+        if not engine_ready.is_set():
+            # Modelo aún cargando: la captura y los snapshots siguen funcionando
+            FRAMES.labels(camera_id, "warming_up").inc()
+            return []
+        gate = session["motion_gate"]
+        if gate is None or gate.check(frame.image):
+            session["last_items"], session["last_persons"] = detect_objects(camera_id, frame)
+            FRAMES.labels(camera_id, "inferred").inc()
+        else:
+            FRAMES.labels(camera_id, "static").inc()
+        # Sin cambios en la escena: se reutilizan las últimas detecciones
+        session["sampler"].observe(
+            prohibited=len(session["last_items"]),
+            persons=session["last_persons"],
+            motion=gate.last_score if gate else 1.0
+        )
+        publish_detections(session, frame)
+        return track_incidents(session, session["last_items"])
+    
+    def incident(frame, events):
+        camera = cameras.get(camera_id)
+        if camera is None:
+            return
+        # Todo evento en la cola viene de un frame de esta sesión: stop() la
+        # vacía antes de cerrar los incidentes abiertos
+        for kind, data, items in events:
+            if kind == "new":
+                handle_incident(session, camera, frame, items, data)
+            elif kind == "update":
+                submit_incident_update(data)
+    
+    return CameraPipeline(
+        camera_id,
+        capture_fn=capture,
+        decode_fn=decode,
+        infer_fn=infer,
+        incident_fn=incident,
+        interval=session["sampler"].next_interval
+    )
+
+
+def publish_detections(session, frame):
+    """Resumen de lo que ve la cámara (limitado a uno cada EVENTS_DETECTION_INTERVAL)"""
+    now = time.time()
+    if now - session["last_event_at"] < EVENTS_DETECTION_INTERVAL:
+        return
+    session["last_event_at"] = now
+    gate = session["motion_gate"]
+    broadcaster.publish("detections", {
+        "camera_id": session["camera_id"],
+        "timestamp": datetime.fromtimestamp(frame.captured_at).isoformat(),
+        "persons": session["last_persons"],
+        "items": [
+            {"object": PROHIBITED.get(item["class_id"], item["name"]), "confidence": round(item["confidence"], 3)}
+            for item in session["last_items"]
+        ],
+        "motion": round(gate.last_score, 4) if gate else None,
+        "active_tracks": len(session["tracker"].tracks),
+    })
+
+
+def submit_incident_update(incident):
+    """Encolar la actualización de duración de un incidente ya reportado"""
+    update = {
+        'incident_key': incident['key'],
+        'camera_id': incident['camera_id'],
+        'duration_seconds': round(incident['last_seen'] - incident['first_seen'], 1),
+        'last_seen': datetime.fromtimestamp(incident['last_seen']).isoformat()
+    }
+    dispatcher.submit(update, kind="update")
+    incident_store.update_duration(update['incident_key'], update['duration_seconds'], incident['last_seen'])
+    broadcaster.publish("incident_update", update)
+
+
+def handle_incident(session, camera, frame, items, incident):
     """Manejar incidente detectado"""
-    exam_state["incident_count"] += 1
+    session["incident_count"] += 1
+    INCIDENTS.labels(camera["id"]).inc()
     ts = datetime.now()
     
-    print(f"\n🚨 INCIDENTE #{exam_state['incident_count']}")
+    print(f"\n🚨 [{camera['id']}] INCIDENTE #{session['incident_count']}")
     
-    # Activar LED
-    trigger_led(1)
-    time.sleep(2)
-    trigger_led(0)
+    # Activar LED (en segundo plano, no detiene la detección)
+    blink_led(camera)
     
     # Guardar imagen
-    filename = f"incident_{exam_state['incident_count']}_{ts.strftime('%Y%m%d_%H%M%S')}.jpg"
-    
-    # Codificar imagen
-    _, img_encoded = cv2.imencode('.jpg', frame)
-    img_bytes = img_encoded.tobytes()
+    filename = f"incident_{camera['id']}_{session['incident_count']}_{ts.strftime('%Y%m%d_%H%M%S')}.jpg"
     
-    # Subir a GCS
-    image_url = upload_to_gcs(img_bytes, filename)
+    # Se sube el JPEG tal como llegó de la cámara (sin recodificar)
+    img_bytes = frame.jpeg
     
-    # Si no hay GCS, usar base64
-    if not image_url:
-        image_base64 = base64.b64encode(img_bytes).decode('utf-8')
-        image_url = f"data:image/jpeg;base64,{image_base64}"
-    
-    # Preparar datos del incidente
+    # Preparar datos del incidente (image_url se completa al entregarlo)
     incident_data = {
         'timestamp': ts.isoformat(),
-        'incident_number': exam_state['incident_count'],
-        'image_url': image_url,
+        'camera_id': camera['id'],
+        'incident_number': session['incident_count'],
+        'incident_key': incident['key'],
+        'duration_seconds': 0,
         'detections': [
             {
                 'object': PROHIBITED.get(item['class_id'], item['name']),
@@ -217,159 +692,805 @@ def handle_incident(frame, items):
         'severity': 'high' if len(items) > 1 else 'medium'
     }
     
-    # Notificar al backend
-    notify_backend(incident_data)
+    # Índice local: se guarda antes de la entrega para no depender del backend
+    incident_store.add(
+        incident['key'],
+        session['session_id'],
+        camera['id'],
+        ts.timestamp(),
+        session['incident_count'],
+        [
+            {
+                'class_id': item['class_id'],
+                'object': PROHIBITED.get(item['class_id'], item['name']),
+                'confidence': round(item['confidence'], 4),
+                'bbox': list(item['bbox'])
+            }
+            for item in items
+        ],
+        severity=incident_data['severity'],
+        image_ref=filename
+    )
+    
+    # Subida y aviso al backend en segundo plano, con reintentos
+    dispatcher.submit(incident_data, img_bytes, filename)
+    broadcaster.publish("incident", dict(incident_data, filename=filename))
     
-    print(f"✓ Incidente procesado: {filename}")
+    print(f"✓ Incidente encolado: {filename}")
 
 
-# ==================== ENDPOINTS API ====================
+def remember_frame(session, jpeg_bytes):
+    """Guardar los bytes JPEG más recientes tal como llegaron de la cámara"""
+    session["frame_seq"] += 1
+    session["latest_jpeg"] = {
+        "jpeg": jpeg_bytes,
+        "timestamp": time.time(),
+        "etag": f'"{session["camera_id"]}-{id(session):x}-{session["frame_seq"]}"',
+        "variants": {},
+    }
+    return session["latest_jpeg"]
 
-@app.route('/health', methods=['GET'])
-def health():
-    """Health check"""
-    return jsonify({
+
+def latest_snapshot(camera):
+    """
+    Último frame de una cámara sin molestar a la ESP32 si hay examen activo.
+    
+    Con el pipeline corriendo se sirve lo que ya capturó; sin examen se hace
+    una captura como máximo cada SNAPSHOT_MAX_AGE segundos.
+    """
+    session = get_session(camera["id"])
+    
+    def current():
+        snap = session["latest_jpeg"]
+        if snap is not None and (session["active"] or time.time() - snap["timestamp"] < SNAPSHOT_MAX_AGE):
+            return snap
+        return None
+    
+    snap = current()
+    if snap is not None:
+        return snap
+    
+    # Varios dashboards con el frame vencido: uno captura y los demás lo reutilizan
+    with session["snapshot_lock"]:
+        snap = current()
+        if snap is not None:
+            return snap
+        stream = session["stream"]
+        latest = stream.latest() if stream else None
+        jpeg_bytes = latest[0] if latest else fetch_jpeg(camera)
+        if jpeg_bytes is None:
+            return session["latest_jpeg"]
+        return remember_frame(session, jpeg_bytes)
+
+
+def snapshot_variant(snap, scale):
+    """JPEG original (scale 1) o reducido 1/2, 1/4, 1/8 (decodificación reducida, cacheada)"""
+    if scale == 1:
+        return snap["jpeg"]
+    variants = snap["variants"]
+    if scale not in variants:
+        img = decode_jpeg(snap["jpeg"], scale)
+        if img is None:
+            return None
+        _, encoded = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        variants[scale] = encoded.tobytes()
+    return variants[scale]
+
+
+def session_status(session):
+    """Serializar estado de una sesión"""
+    if not session["active"]:
+        return {
+            "camera_id": session["camera_id"],
+            "active": False,
+            "incident_count": 0
+        }
+    
+    elapsed = datetime.now() - session["start_time"]
+    
+    return {
+        "camera_id": session["camera_id"],
+        "active": True,
+        "session_id": session["session_id"],
+        "start_time": session["start_time"].isoformat(),
+        "elapsed_seconds": elapsed.total_seconds(),
+        "incident_count": session["incident_count"],
+        "capture_mode": "mjpeg" if session["stream"] else "poll",
+        "active_tracks": len(session["tracker"].tracks),
+        "suppressed_detections": session["suppressed_detections"],
+        "motion_gate": session["motion_gate"].stats() if session["motion_gate"] else None,
+        "sampling": session["sampler"].stats(),
+        "pipeline": session["pipeline"].stats() if session["pipeline"] else None,
+        "stream": session["stream"].stats() if session["stream"] else None
+    }
+
+
+@metrics.add_collector
+def collect_session_metrics():
+    """Copiar contadores de colas, streams y spool antes de exportar"""
+    active = 0
+    sessions = list(exam_sessions.items())
+    for camera_id, session in sessions:
+        # También las detenidas: lo que pasó entre el último scrape y el stop
+        active += session["active"]
+        if session["pipeline"]:
+            queues = session["pipeline"].stats()["queues"]
+            for queue_name in ("raw", "frames"):
+                export_total(FRAMES_DROPPED, session, queues[queue_name]["dropped"], camera_id, queue_name)
+            export_total(INCIDENT_QUEUE_OVERFLOWS, session, queues["incidents"]["overflows"], camera_id)
+        if session["stream"]:
+            export_total(STREAM_RECONNECTS, session, session["stream"].reconnects, camera_id)
+    # Olvidar totales de sesiones reemplazadas
+    current = {id(session) for _, session in sessions}
+    with _exported_lock:
+        for key in [k for k in _exported_totals if k[0] not in current]:
+            del _exported_totals[key]
+    ACTIVE_SESSIONS.set(active)
+    for phase in ("import_seconds", "model_load_seconds", "warmup_seconds", "ready_after_seconds"):
+        if startup[phase] is not None:
+            STARTUP_SECONDS.labels(phase.replace("_seconds", "")).set(startup[phase])
+    EVENT_SUBSCRIBERS.set(broadcaster.stats()["subscribers"])
+    DISPATCH_PENDING.set(dispatcher.stats()["pending"])
+
+
+# ==================== MOTOR ====================
+
+def start_session(camera, start_time=None, incident_count=0):
+    """Crear la sesión de una cámara y arrancar su pipeline"""
+    camera_id = camera["id"]
+    session = new_session(camera_id)
+    session["active"] = True
+    session["start_time"] = start_time or datetime.now()
+    session["session_id"] = f"{camera_id}-{session['start_time']:%Y%m%dT%H%M%S}"
+    session["incident_count"] = incident_count
+    
+    # Nueva sesión: un pipeline anterior que siga vivo conserva su propio estado
+    with sessions_lock:
+        if exam_sessions.get(camera_id, {}).get("active"):
+            return None
+        exam_sessions[camera_id] = session
+    
+    # Conexión persistente al stream MJPEG (opcional)
+    if CAPTURE_MODE == "mjpeg":
+        session["stream"] = MjpegStreamReader(
+            camera["stream_url"],
+            connect_timeout=ESP32_CONNECT_TIMEOUT,
+            session=http_pool.session_for(camera["stream_url"])
+        )
+        session["stream"].start()
+    
+    # Iniciar pipeline de monitoreo
+    session["pipeline"] = build_pipeline(session)
+    session["pipeline"].start()
+    print(f"🎬 [{camera_id}] Iniciando monitoreo...")
+    
+    state_store.save_session(session_status(session), os.getpid())
+    broadcaster.publish("status", session_status(session))
+    return session
+
+
+def sync_state():
+    """Publicar periódicamente el estado de las sesiones activas en el store compartido"""
+    while True:
+        for session in list(exam_sessions.values()):
+            with state_lock:
+                if not session["active"]:
+                    continue
+                try:
+                    state_store.save_session(session_status(session), os.getpid())
+                except Exception as e:
+                    print(f"⚠️ Error guardando estado de [{session['camera_id']}]: {e}")
+        time.sleep(STATE_SYNC_INTERVAL)
+
+
+def start_delivery():
+    """Conectar GCS y empezar a entregar incidentes (en segundo plano)"""
+    init_gcs()
+    dispatcher.start()
+
+
+def load_engine_model():
+    """Cargar YOLO y calentarlo con una inferencia (en segundo plano)"""
+    global model, scheduler
+    try:
+        # Cargar YOLO
+        t0 = time.perf_counter()
+        print(f"📦 Cargando YOLO (backend: {INFERENCE_BACKEND})...")
+        model = load_model(INFERENCE_BACKEND, auto_export=INFERENCE_AUTO_EXPORT)
+        startup["model_load_seconds"] = round(time.perf_counter() - t0, 3)
+        print(f"✓ YOLO cargado en {startup['model_load_seconds']} s")
+        
+        # Un solo hilo llama al modelo (YOLO no es thread-safe) con lotes de todas las cámaras
+        scheduler = InferenceScheduler(
+            make_infer_fn(model, INFERENCE_BACKEND, **predict_kwargs()),
+            max_batch=INFER_MAX_BATCH,
+            max_wait=INFER_MAX_WAIT_MS / 1000.0,
+            on_batch=on_inference_batch
+        )
+        scheduler.start()
+        
+        # La primera inferencia inicializa kernels y memoria: pagarla antes del primer examen
+        if MODEL_WARMUP:
+            t0 = time.perf_counter()
+            scheduler.infer(np.zeros((IMGSZ, IMGSZ, 3), dtype=np.uint8), source="warmup")
+            startup["warmup_seconds"] = round(time.perf_counter() - t0, 3)
+            print(f"✓ Modelo calentado en {startup['warmup_seconds']} s")
+    except Exception as e:
+        startup["error"] = f"{type(e).__name__}: {e}"
+        print(f"✗ Error cargando el modelo: {e}")
+        return
+    
+    startup["ready_after_seconds"] = round(time.perf_counter() - IMPORT_STARTED, 3)
+    engine_ready.set()
+    print(f"✓ Motor listo ({startup['ready_after_seconds']} s desde el arranque)")
+    broadcaster.publish("engine", {"ready": True, **startup})
+
+
+def init_engine():
+    """Registrar cámaras, despachador y sesiones; el modelo se carga en segundo plano"""
+    global dispatcher
+    
+    # Cámaras registradas por la API en ejecuciones anteriores; las del entorno tienen prioridad
+    for cam in state_store.cameras():
+        register_camera(cam["id"], cam["ip"], cam["stream_url"])
+    register_camera(DEFAULT_CAMERA, ESP32_IP, ESP32_STREAM_URL)
+    for entry in filter(None, (e.strip() for e in ESP32_CAMERAS.split(","))):
+        cam_id, _, cam_ip = entry.partition("=")
+        if cam_id and cam_ip:
+            register_camera(cam_id.strip(), cam_ip.strip())
+    
+    threading.Thread(target=load_engine_model, name="model-loader", daemon=True).start()
+    
+    # Los incidentes se aceptan en el spool de inmediato; la entrega empieza al conectar GCS
+    dispatcher = IncidentDispatcher(
+        INCIDENT_SPOOL_DIR,
+        deliver_incident,
+        workers=DISPATCH_WORKERS,
+        max_retries=DISPATCH_MAX_RETRIES
+    )
+    threading.Thread(target=start_delivery, name="delivery-init", daemon=True).start()
+    
+    # Exámenes que seguían activos cuando el motor se detuvo
+    for row in state_store.active_sessions():
+        camera = cameras.get(row["camera_id"])
+        if camera is None:
+            continue
+        start_time = datetime.fromisoformat(row["start_time"]) if row["start_time"] else None
+        print(f"♻️ [{camera['id']}] Retomando examen iniciado {start_time}")
+        start_session(camera, start_time, row["incident_count"])
+    
+    threading.Thread(target=sync_state, daemon=True).start()
+
+
+def op_health():
+    return {
         "status": "ok",
+        "ready": engine_ready.is_set(),
         "yolo_loaded": model is not None,
+        "inference_backend": INFERENCE_BACKEND,
         "gcs_available": bucket is not None,
-        "exam_active": exam_state["active"]
-    })
+        "exam_active": any(s["active"] for s in exam_sessions.values()),
+        "cameras": len(cameras),
+        "active_sessions": sum(1 for s in exam_sessions.values() if s["active"]),
+        "engine_pid": os.getpid()
+    }, 200
+
+
+def op_ready():
+    """Listo para monitorear: modelo cargado y calentado"""
+    ready = engine_ready.is_set()
+    return {
+        "ready": ready,
+        "phase": "ready" if ready else ("failed" if startup["error"] else "loading_model"),
+        "inference_backend": INFERENCE_BACKEND,
+        "startup": startup,
+        "engine_pid": os.getpid()
+    }, 200 if ready else 503
+
+
+def op_stats(name):
+    sources = {
+        "inference": lambda: scheduler.stats() if scheduler else {"ready": False},
+        "http": http_pool.stats,
+        "dispatcher": lambda: dispatcher.stats(),
+        "events": broadcaster.stats,
+    }
+    return sources[name](), 200
+
+
+def op_list_cameras():
+    return [
+        {
+            "id": cam["id"],
+            "ip": cam["ip"],
+            "active": get_session(cam["id"])["active"]
+        }
+        for cam in cameras.values()
+    ], 200
 
 
-@app.route('/api/exam/start', methods=['POST'])
-def start_exam():
-    """Iniciar modo examen"""
-    if exam_state["active"]:
-        return jsonify({"error": "Exam already active"}), 400
+def op_add_camera(data):
+    if not data.get('id') or not data.get('ip'):
+        return {"error": "Fields 'id' and 'ip' are required"}, 400
+    
+    if get_session(data['id'])["active"]:
+        return {"error": "Camera has an active exam"}, 400
+    
+    camera = register_camera(data['id'], data['ip'], data.get('stream_url'))
+    return {
+        "status": "registered",
+        "id": camera["id"],
+        "ip": camera["ip"],
+        "stream_url": camera["stream_url"]
+    }, 200
+
+
+def op_remove_camera(camera_id):
+    if camera_id not in cameras:
+        return {"error": "Unknown camera"}, 404
+    
+    if get_session(camera_id)["active"]:
+        return {"error": "Camera has an active exam"}, 400
+    
+    del cameras[camera_id]
+    with sessions_lock:
+        exam_sessions.pop(camera_id, None)
+    state_store.remove_camera(camera_id)
+    # Sin esto las series de la cámara seguirían en /metrics para siempre
+    metrics.remove(camera=camera_id)
+    
+    return {"status": "removed", "id": camera_id}, 200
+
+
+def op_start(camera_id):
+    camera = cameras.get(camera_id)
+    if camera is None:
+        return {"error": "Unknown camera"}, 404
+    
+    if get_session(camera_id)["active"]:
+        return {"error": "Exam already active"}, 400
     
     # Verificar conexión con ESP32
     try:
-        r = requests.get(f"{BASE_ESP32_URL}/", timeout=30)
+        r = http_pool.get(
+            f"{camera['base_url']}/",
+            connect_timeout=ESP32_CONNECT_TIMEOUT,
+            read_timeout=ESP32_READ_TIMEOUT
+        )
         if r.status_code != 200:
-            return jsonify({"error": "ESP32-CAM not reachable"}), 503
+            return {"error": "ESP32-CAM not reachable"}, 503
     except:
-        return jsonify({"error": "ESP32-CAM not reachable"}), 503
-    
-    # Iniciar examen
-    exam_state["active"] = True
-    exam_state["start_time"] = datetime.now()
-    exam_state["incident_count"] = 0
-    exam_state["stop_monitoring"] = False
+        return {"error": "ESP32-CAM not reachable"}, 503
     
-    # Iniciar thread de monitoreo
-    exam_state["monitoring_thread"] = threading.Thread(target=monitoring_loop, daemon=True)
-    exam_state["monitoring_thread"].start()
+    session = start_session(camera)
+    if session is None:
+        return {"error": "Exam already active"}, 400
     
-    print(f"\n🟢 EXAMEN INICIADO: {exam_state['start_time']}")
+    print(f"\n🟢 [{camera_id}] EXAMEN INICIADO: {session['start_time']}")
     
-    return jsonify({
+    return {
         "status": "started",
-        "start_time": exam_state["start_time"].isoformat(),
-        "esp32_ip": ESP32_IP
-    })
+        "camera_id": camera_id,
+        "session_id": session["session_id"],
+        "start_time": session["start_time"].isoformat(),
+        "esp32_ip": camera["ip"]
+    }, 200
 
 
-@app.route('/api/exam/stop', methods=['POST'])
-def stop_exam():
-    """Detener modo examen"""
-    if not exam_state["active"]:
-        return jsonify({"error": "No active exam"}), 400
+def op_stop(camera_id):
+    session = get_session(camera_id)
+    if not session["active"]:
+        return {"error": "No active exam"}, 400
     
     # Detener monitoreo
-    exam_state["stop_monitoring"] = True
-    exam_state["active"] = False
+    with state_lock:
+        session["active"] = False
+    if session["stream"]:
+        session["stream"].stop()
+    if session["pipeline"]:
+        # Espera a que se entreguen los incidentes ya detectados
+        session["pipeline"].stop()
+    
+    # Duración final de los objetos que seguían a la vista
+    with session["tracker_lock"]:
+        open_incidents = {id(t.incident): t.incident for t in session["tracker"].flush() if t.incident}
+    for incident in open_incidents.values():
+        submit_incident_update(incident)
+    print(f"🛑 [{camera_id}] Monitoreo detenido")
     
     end_time = datetime.now()
-    duration = end_time - exam_state["start_time"]
+    duration = end_time - session["start_time"]
     
-    print(f"\n🔴 EXAMEN FINALIZADO")
+    print(f"\n🔴 [{camera_id}] EXAMEN FINALIZADO")
     print(f"Duración: {duration}")
-    print(f"Incidentes: {exam_state['incident_count']}")
+    print(f"Incidentes: {session['incident_count']}")
     
     result = {
         "status": "stopped",
-        "start_time": exam_state["start_time"].isoformat(),
+        "camera_id": camera_id,
+        "session_id": session["session_id"],
+        "start_time": session["start_time"].isoformat(),
         "end_time": end_time.isoformat(),
         "duration_seconds": duration.total_seconds(),
-        "incident_count": exam_state["incident_count"]
+        "incident_count": session["incident_count"]
     }
+    state_store.save_session(session_status(session), os.getpid())
+    broadcaster.publish("status", dict(result, active=False))
     
-    return jsonify(result)
+    return result, 200
 
 
-@app.route('/api/exam/status', methods=['GET'])
-def exam_status():
-    """Obtener estado actual del examen"""
-    if not exam_state["active"]:
-        return jsonify({
-            "active": False,
-            "incident_count": 0
-        })
+def op_snapshot(camera_id, scale, if_none_match=None):
+    """
+    Último frame de una cámara. if_none_match es el encabezado If-None-Match
+    del cliente: si coincide se devuelve not_modified sin el JPEG (no viaja
+    por IPC ni se genera la versión reducida).
+    """
+    camera = cameras.get(camera_id)
+    if camera is None:
+        return {"error": "Unknown camera"}, 404
     
-    elapsed = datetime.now() - exam_state["start_time"]
+    snap = latest_snapshot(camera)
+    if snap is None:
+        return {"error": "Failed to capture frame"}, 500
     
-    return jsonify({
-        "active": True,
-        "start_time": exam_state["start_time"].isoformat(),
-        "elapsed_seconds": elapsed.total_seconds(),
-        "incident_count": exam_state["incident_count"]
-    })
-
-
-@app.route('/api/exam/snapshot', methods=['GET'])
-def get_snapshot():
-    """Obtener snapshot actual de la cámara"""
-    frame = capture_frame()
-    if frame is None:
-        return jsonify({"error": "Failed to capture frame"}), 500
+    etag = snap["etag"] if scale == 1 else f'{snap["etag"][:-1]}-{scale}"'
+    # Comparación débil (W/"..." coincide); "*" coincide siempre
+    if if_none_match and parse_etags(if_none_match).contains_weak(unquote_etag(etag)[0]):
+        return {"not_modified": True, "timestamp": snap["timestamp"], "etag": etag}, 200
     
-    _, img_encoded = cv2.imencode('.jpg', frame)
-    img_base64 = base64.b64encode(img_encoded.tobytes()).decode('utf-8')
+    jpeg_bytes = snapshot_variant(snap, scale)
+    if jpeg_bytes is None:
+        return {"error": "Failed to decode frame"}, 500
     
-    return jsonify({
-        "image": f"data:image/jpeg;base64,{img_base64}",
-        "timestamp": datetime.now().isoformat()
-    })
+    return {
+        "jpeg": jpeg_bytes,
+        "timestamp": snap["timestamp"],
+        "etag": etag
+    }, 200
 
 
-@app.route('/api/config', methods=['GET'])
-def get_config():
-    """Obtener configuración actual"""
-    return jsonify({
-        "esp32_ip": ESP32_IP,
+def op_get_config():
+    return {
+        "esp32_ip": cameras[DEFAULT_CAMERA]["ip"] if DEFAULT_CAMERA in cameras else ESP32_IP,
+        "cameras": {cam_id: cam["ip"] for cam_id, cam in cameras.items()},
         "confidence_threshold": CONFIDENCE,
+        "capture_mode": CAPTURE_MODE,
         "prohibited_objects": PROHIBITED,
         "gcs_bucket": GCS_BUCKET if bucket else None
-    })
+    }, 200
 
 
-@app.route('/api/config', methods=['POST'])
-def update_config():
-    """Actualizar configuración"""
+def op_update_config(data):
     global CONFIDENCE, ESP32_IP
     
-    data = request.json
-    
     if 'confidence' in data:
         CONFIDENCE = float(data['confidence'])
     
     if 'esp32_ip' in data:
         ESP32_IP = data['esp32_ip']
+        register_camera(DEFAULT_CAMERA, ESP32_IP, data.get('stream_url'))
     
-    return jsonify({
+    return {
         "status": "updated",
         "confidence": CONFIDENCE,
         "esp32_ip": ESP32_IP
+    }, 200
+
+
+ENGINE_OPS = {
+    "health": op_health,
+    "ready": op_ready,
+    "metrics": metrics.render,
+    "stats": op_stats,
+    "list_cameras": op_list_cameras,
+    "add_camera": op_add_camera,
+    "remove_camera": op_remove_camera,
+    "start": op_start,
+    "stop": op_stop,
+    "snapshot": op_snapshot,
+    "get_config": op_get_config,
+    "update_config": op_update_config,
+}
+
+
+# Cliente del motor (workers de gunicorn) o motor en este mismo proceso
+engine_client = None
+event_relay = None
+
+if EXAM_ENGINE == "remote":
+    engine_client = EngineClient(EXAM_ENGINE_ADDRESS, EXAM_ENGINE_AUTHKEY)
+    event_relay = EventRelay(engine_client, broadcaster)
+else:
+    init_engine()
+
+
+startup["import_seconds"] = round(time.perf_counter() - IMPORT_STARTED, 3)
+print(f"✓ Módulo importado en {startup['import_seconds']} s (modo: {EXAM_ENGINE})")
+
+
+def engine_call(op, *args):
+    """Ejecutar una operación del motor (local o por IPC)"""
+    if engine_client is not None:
+        return engine_client.call(op, *args)
+    return ENGINE_OPS[op](*args)
+
+
+def reply(result):
+    payload, code = result
+    return jsonify(payload), code
+
+
+def stored_status(camera_id):
+    """Estado de una sesión desde el store compartido (sin pasar por el motor)"""
+    return state_store.session(camera_id) or {
+        "camera_id": camera_id,
+        "active": False,
+        "incident_count": 0
+    }
+
+
+# ==================== ENDPOINTS API ====================
+
+@app.errorhandler(EngineUnavailable)
+def engine_unavailable(e):
+    return jsonify({"error": "Detection engine unavailable", "details": str(e)}), 503
+
+
+@app.errorhandler(RemoteError)
+def engine_error(e):
+    return jsonify({"error": "Detection engine error", "details": str(e)}), 500
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    """Health check"""
+    return reply(engine_call("health"))
+
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness: 503 hasta que el modelo esté cargado y calentado"""
+    payload, code = engine_call("ready")
+    payload["worker_import_seconds"] = startup["import_seconds"]
+    return jsonify(payload), code
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Métricas del pipeline en formato de texto de Prometheus"""
+    return Response(engine_call("metrics"), content_type=METRICS_CONTENT_TYPE)
+
+
+@app.route('/api/inference/stats', methods=['GET'])
+def inference_stats():
+    """Throughput y latencia del planificador de inferencia por lotes"""
+    return reply(engine_call("stats", "inference"))
+
+
+@app.route('/api/http/stats', methods=['GET'])
+def http_stats():
+    """Reutilización de conexiones HTTP por host"""
+    return reply(engine_call("stats", "http"))
+
+
+@app.route('/api/exam/dispatcher', methods=['GET'])
+def dispatcher_stats():
+    """Estado de la cola de entrega de incidentes"""
+    return reply(engine_call("stats", "dispatcher"))
+
+
+@app.route('/api/cameras', methods=['GET'])
+def list_cameras():
+    """Listar cámaras registradas y su estado"""
+    return reply(engine_call("list_cameras"))
+
+
+@app.route('/api/cameras', methods=['POST'])
+def add_camera():
+    """Registrar una cámara nueva"""
+    return reply(engine_call("add_camera", request.json or {}))
+
+
+@app.route('/api/cameras/<camera_id>', methods=['DELETE'])
+def remove_camera(camera_id):
+    """Eliminar una cámara del registro"""
+    return reply(engine_call("remove_camera", camera_id))
+
+
+@app.route('/api/exam/start', methods=['POST'], defaults={'camera_id': None})
+@app.route('/api/exam/<camera_id>/start', methods=['POST'])
+def start_exam(camera_id):
+    """Iniciar modo examen en una cámara"""
+    return reply(engine_call("start", camera_id or DEFAULT_CAMERA))
+
+
+@app.route('/api/exam/stop', methods=['POST'], defaults={'camera_id': None})
+@app.route('/api/exam/<camera_id>/stop', methods=['POST'])
+def stop_exam(camera_id):
+    """Detener modo examen en una cámara"""
+    return reply(engine_call("stop", camera_id or DEFAULT_CAMERA))
+
+
+@app.route('/api/exam/status', methods=['GET'], defaults={'camera_id': None})
+@app.route('/api/exam/<camera_id>/status', methods=['GET'])
+def exam_status(camera_id):
+    """Obtener estado actual del examen de una cámara"""
+    camera_id = camera_id or DEFAULT_CAMERA
+    if not state_store.has_camera(camera_id):
+        return jsonify({"error": "Unknown camera"}), 404
+    
+    return jsonify(stored_status(camera_id))
+
+
+@app.route('/api/exam/events', methods=['GET'])
+def exam_events():
+    """Stream SSE con cambios de estado, resúmenes de detecciones e incidentes"""
+    global events_rejected
+    if events_slots is not None and not events_slots.acquire(blocking=False):
+        # Sin hilos libres para otro dashboard: que reintente más tarde
+        # (o en otro worker) en lugar de dejar sin hilos a start/stop/status
+        with events_slots_lock:
+            events_rejected += 1
+        return jsonify({"error": "Too many event subscribers"}), 503, {"Retry-After": "5"}
+    try:
+        if event_relay is not None:
+            event_relay.ensure_started()
+        last_event_id = request.headers.get('Last-Event-ID', type=int)
+        initial = [("status", stored_status(cam["id"])) for cam in state_store.cameras()]
+        response = Response(
+            stream_with_context(broadcaster.stream(last_event_id, initial)),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    except Exception:
+        if events_slots is not None:
+            events_slots.release()
+        raise
+    if events_slots is not None:
+        # El servidor cierra la respuesta al desconectarse el cliente
+        response.call_on_close(events_slots.release)
+    return response
+
+
+@app.route('/api/exam/events/stats', methods=['GET'])
+def exam_events_stats():
+    """Suscriptores conectados y eventos publicados"""
+    stats = dict(broadcaster.stats(), max_clients=EVENTS_MAX_CLIENTS or None, rejected=events_rejected)
+    if engine_client is not None:
+        # Suscriptores de este worker; el motor solo ve un relay por worker
+        return jsonify(dict(stats, engine=engine_client.call("stats", "events")[0]))
+    return jsonify(stats)
+
+
+@app.route('/api/exam/sessions', methods=['GET'])
+def list_sessions():
+    """Estado de las sesiones de todas las cámaras"""
+    return jsonify([stored_status(cam["id"]) for cam in state_store.cameras()])
+
+
+def _timestamp_arg(name):
+    """Parámetro de fecha: ISO 8601 o segundos epoch"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+@app.route('/api/exam/incidents', methods=['GET'])
+def list_incidents():
+    """
+    Historial de incidentes, del más reciente al más antiguo.
+    
+    Filtros: session_id, camera_id, class_id, min_confidence, since, until.
+    Paginación por cursor: ?limit=N y ?cursor=<next_cursor de la página anterior>
+    """
+    try:
+        limit = min(max(request.args.get('limit', INCIDENTS_PAGE_SIZE, type=int), 1), INCIDENTS_MAX_PAGE_SIZE)
+        items, next_cursor = incident_store.query(
+            session_id=request.args.get('session_id'),
+            camera_id=request.args.get('camera_id'),
+            class_id=request.args.get('class_id', type=int),
+            min_confidence=request.args.get('min_confidence', type=float),
+            since=_timestamp_arg('since'),
+            until=_timestamp_arg('until'),
+            cursor=request.args.get('cursor'),
+            limit=limit
+        )
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+    
+    return jsonify({
+        "items": items,
+        "next_cursor": next_cursor,
+        "limit": limit
+    })
+
+
+@app.route('/api/exam/incidents/<incident_key>', methods=['GET'])
+def get_incident(incident_key):
+    incident = incident_store.get(incident_key)
+    if incident is None:
+        return jsonify({"error": "Unknown incident"}), 404
+    return jsonify(incident)
+
+
+def _snapshot_request(camera_id, if_none_match=None):
+    """Resolver cámara, escala y frame de una petición de snapshot"""
+    scale = request.args.get('scale', 1, type=int)
+    if scale not in REDUCED_FLAGS:
+        return None, (jsonify({"error": f"scale must be one of {sorted(REDUCED_FLAGS)}"}), 400)
+    
+    snap, code = engine_call("snapshot", camera_id or DEFAULT_CAMERA, scale, if_none_match)
+    if code != 200:
+        return None, (jsonify(snap), code)
+    return snap, None
+
+
+@app.route('/api/exam/snapshot.jpg', methods=['GET'], defaults={'camera_id': None})
+@app.route('/api/exam/<camera_id>/snapshot.jpg', methods=['GET'])
+def get_snapshot_jpeg(camera_id):
+    """Último frame como image/jpeg (ETag + If-None-Match; ?scale=2|4|8 reduce el tamaño)"""
+    # El motor compara el ETag: un 304 no copia el JPEG entre procesos
+    snap, error = _snapshot_request(camera_id, request.headers.get("If-None-Match"))
+    if error:
+        return error
+    
+    headers = {
+        "ETag": snap["etag"],
+        "Cache-Control": "no-cache",
+        "X-Frame-Timestamp": datetime.fromtimestamp(snap["timestamp"]).isoformat(),
+    }
+    if snap.get("not_modified"):
+        return Response(status=304, headers=headers)
+    return Response(snap["jpeg"], mimetype="image/jpeg", headers=headers)
+
+
+@app.route('/api/exam/snapshot', methods=['GET'], defaults={'camera_id': None})
+@app.route('/api/exam/<camera_id>/snapshot', methods=['GET'])
+def get_snapshot(camera_id):
+    """Último frame en JSON (base64) para clientes existentes"""
+    snap, error = _snapshot_request(camera_id)
+    if error:
+        return error
+    
+    img_base64 = base64.b64encode(snap["jpeg"]).decode('utf-8')
+    return jsonify({
+        "image": f"data:image/jpeg;base64,{img_base64}",
+        "timestamp": datetime.fromtimestamp(snap["timestamp"]).isoformat(),
+        "etag": snap["etag"]
     })
 
 
+@app.route('/api/config', methods=['GET'])
+def get_config():
+    """Obtener configuración actual"""
+    return reply(engine_call("get_config"))
+
+
+@app.route('/api/config', methods=['POST'])
+def update_config():
+    """Actualizar configuración"""
+    return reply(engine_call("update_config", request.json or {}))
+
+
 if __name__ == '__main__':
+    if "--engine" in sys.argv:
+        # Proceso dedicado: sin HTTP, atiende a los workers por IPC
+        EngineServer(EXAM_ENGINE_ADDRESS, EXAM_ENGINE_AUTHKEY, ENGINE_OPS, broadcaster).serve_forever()
+        sys.exit(0)
+    
     port = int(os.getenv('PORT', 5001))
     print(f"\n{'='*60}")
     print(f"  🎓 Servidor de Detección de Examen")
     print(f"  Puerto: {port}")
-    print(f"  ESP32-CAM: {ESP32_IP}")
-    print(f"  GCS: {'✓' if bucket else '✗'}")
+    for cam in cameras.values():
+        print(f"  ESP32-CAM [{cam['id']}]: {cam['ip']}")
+    print(f"  Bucket GCS: {GCS_BUCKET}")
+    print(f"  Modelo: cargando en segundo plano (ver /ready)")
     print(f"{'='*60}\n")
     
     app.run(host='0.0.0.0', port=port, debug=False)
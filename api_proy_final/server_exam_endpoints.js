@@ -21,17 +21,26 @@ const createExamAlertsTable = `
 `;
 
 db.query(createExamAlertsTable, (err) => {
-    if (err) console.error("Error creando tabla exam_alerts:", err);
-    else console.log("Tabla 'exam_alerts' verificada/creada");
+    if (err) return console.error("Error creando tabla exam_alerts:", err);
+    console.log("Tabla 'exam_alerts' verificada/creada");
+
+    // Columnas para incidentes con seguimiento (un registro por objeto, con duración)
+    ['ADD COLUMN incident_key VARCHAR(64) NULL', 'ADD COLUMN duration_seconds FLOAT DEFAULT 0'].forEach((column) => {
+        db.query(`ALTER TABLE exam_alerts ${column}`, (alterErr) => {
+            if (alterErr && alterErr.code !== 'ER_DUP_FIELDNAME') {
+                console.error("Error actualizando tabla exam_alerts:", alterErr);
+            }
+        });
+    });
 });
 
 // --- ENDPOINT PARA RECIBIR ALERTAS DE EXAMEN (Desde Python) ---
 app.post('/api/exam-alerts', (req, res) => {
-    const { timestamp, incident_number, image_url, detections, severity } = req.body;
+    const { timestamp, incident_number, image_url, detections, severity, incident_key, duration_seconds } = req.body;
 
     const query = `
-        INSERT INTO exam_alerts (timestamp, incident_number, image_url, detections, severity) 
-        VALUES (?, ?, ?, ?, ?)
+        INSERT INTO exam_alerts (timestamp, incident_number, image_url, detections, severity, incident_key, duration_seconds) 
+        VALUES (?, ?, ?, ?, ?, ?, ?)
     `;
 
     db.query(query, [
@@ -39,7 +48,9 @@ app.post('/api/exam-alerts', (req, res) => {
         incident_number,
         image_url,
         JSON.stringify(detections),
-        severity
+        severity,
+        incident_key || null,
+        duration_seconds || 0
     ], (err, result) => {
         if (err) {
             console.error('Error guardando alerta de examen:', err);
@@ -51,6 +62,25 @@ app.post('/api/exam-alerts', (req, res) => {
     });
 });
 
+// --- ENDPOINT PARA ACTUALIZAR DURACIÓN DE UNA ALERTA (Desde Python) ---
+app.patch('/api/exam-alerts/by-key/:key', (req, res) => {
+    const { key } = req.params;
+    const { duration_seconds } = req.body;
+    const query = 'UPDATE exam_alerts SET duration_seconds = ? WHERE incident_key = ?';
+
+    db.query(query, [duration_seconds || 0, key], (err, result) => {
+        if (err) {
+            console.error('Error actualizando alerta de examen:', err);
+            res.status(500).send('Error actualizando alerta');
+        } else if (result.affectedRows === 0) {
+            // El alta todavía no llega; Python reintenta
+            res.status(404).json({ status: 'not_found' });
+        } else {
+            res.json({ status: 'ok' });
+        }
+    });
+});
+
 // --- ENDPOINT PARA OBTENER ALERTAS DE EXAMEN (Dashboard) ---
 app.get('/api/exam-alerts', (req, res) => {
     const limit = req.query.limit || 50;
@@ -121,6 +151,9 @@ app.get('/api/exam/status', async (req, res) => {
     }
 });
 
+// Eventos en vivo (SSE) y último frame como JPEG
+require('./exam_stream_proxy')(app, PYTHON_SERVER);
+
 // Obtener snapshot de la cámara
 app.get('/api/exam/snapshot', async (req, res) => {
     try {
@@ -1,12 +1,18 @@
-from flask import Flask, request, jsonify, send_from_directory
-from google.cloud import speech
+from flask import Flask, Response, request, jsonify
 import os
 import json
 import tempfile
 import time
-import requests
+import uuid
 from dotenv import load_dotenv
-import wave
+from werkzeug.wsgi import wrap_file
+
+from audio_storage import WavRecorder, compress_to_flac, flac_available, pcm_memmap, stored_recording
+from http_client import http_pool
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Registry
+from job_queue import JobQueue, RetryJob
+from transcription import SAMPLE_WIDTH, SegmentTranscriber, StreamingTranscription, make_recognizer
+from voice_activity import VoiceActivityDetector
 
 load_dotenv()
 
@@ -22,123 +28,452 @@ if "GOOGLE_CLOUD_CREDENTIALS" in os.environ:
 else:
     print("ADVERTENCIA: No se encontró la variable GOOGLE_CLOUD_CREDENTIALS")
 
-speech_client = speech.SpeechClient()
+# Reconocedor: "google" o "local" (sustituto sin red para pruebas)
+TRANSCRIBER = os.getenv("TRANSCRIBER", "google").lower()
+# "stream" = transcribir mientras llega el audio, "batch" = al terminar la subida
+TRANSCRIPTION_MODE = os.getenv("TRANSCRIPTION_MODE", "stream").lower()
+# Espera máxima por la transcripción una vez terminada la subida
+TRANSCRIPTION_TIMEOUT = float(os.getenv("TRANSCRIPTION_TIMEOUT", "60"))
+# Modo batch: grabaciones largas se cortan en silencios de a lo sumo
+# SEGMENT_MAX_SECONDS y se transcriben en paralelo (TRANSCRIBE_WORKERS a la vez)
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "4"))
+SEGMENT_MAX_SECONDS = float(os.getenv("SEGMENT_MAX_SECONDS", "55"))
+
+recognizer = make_recognizer(TRANSCRIBER)
+segmenter = SegmentTranscriber(
+    recognizer,
+    workers=TRANSCRIBE_WORKERS,
+    min_seconds=SEGMENT_MAX_SECONDS * 0.5,
+    max_seconds=SEGMENT_MAX_SECONDS
+)
+
+# Detección de voz: solo se transcriben los tramos con voz y se descartan las
+# grabaciones con menos de MIN_SPEECH_SECONDS de voz (ruido, micrófono abierto)
+VAD = os.getenv("VAD", "1") == "1"
+MIN_SPEECH_SECONDS = float(os.getenv("MIN_SPEECH_SECONDS", "0.5"))
+
+# Cola de transcripciones: estado de cada trabajo en JOBS_DIR (/jobs/<id>)
+JOBS_DIR = os.getenv("JOBS_DIR", "transcription_jobs")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+# Almacenamiento: las grabaciones se comprimen a FLAC (sin pérdida) al terminar
+# su trabajo; requiere soundfile (sin él se quedan en WAV)
+COMPRESS_AUDIO = os.getenv("COMPRESS_AUDIO", "1") == "1"
+if COMPRESS_AUDIO and not flac_available():
+    print("ADVERTENCIA: COMPRESS_AUDIO=1 pero soundfile no está instalado; las grabaciones se guardarán como WAV")
+    COMPRESS_AUDIO = False
+KEEP_WAV = os.getenv("KEEP_WAV", "0") == "1"
+# Una grabación en su formato final no cambia: el navegador puede cachearla
+# sin revalidar (un WAV que aún se va a comprimir se sirve con no-cache)
+AUDIO_CACHE_SECONDS = int(os.getenv("AUDIO_CACHE_SECONDS", str(365 * 24 * 3600)))
+
+PORT = int(os.getenv("PORT", "5001"))
+
+# Grabaciones más cortas se descartan (ruido o falsos contactos)
+# 16kHz * 2 bytes * 0.5s = ~16000 bytes. 
+# Usaremos 4096 bytes como mínimo seguro.
+MIN_AUDIO_BYTES = 4096
 
 # Directorio para guardar audios
 AUDIO_DIR = "recordings"
 if not os.path.exists(AUDIO_DIR):
     os.makedirs(AUDIO_DIR)
 
+# Métricas de /upload_stream
+metrics = Registry()
+UPLOADS = metrics.counter(
+    "micro_uploads_total", "Grabaciones recibidas por resultado", ("status",))
+UPLOAD_BYTES = metrics.counter(
+    "micro_upload_bytes_total", "Bytes de audio recibidos")
+UPLOAD_SECONDS = metrics.histogram(
+    "micro_upload_receive_seconds", "Duración de la recepción del stream de audio")
+WRITE_SECONDS = metrics.histogram(
+    "micro_upload_write_seconds", "Tiempo escribiendo el audio a disco por grabación")
+TRANSCRIPTION_SECONDS = metrics.histogram(
+    "micro_transcription_seconds", "Duración de la transcripción con Google Speech", ("status",))
+TRANSCRIPTION_LAG = metrics.histogram(
+    "micro_transcription_lag_seconds", "Tiempo desde el fin de la subida hasta tener la transcripción", ("mode",))
+RECOGNIZER_BYTES = metrics.counter(
+    "micro_recognizer_bytes_total", "Bytes de audio enviados al reconocedor (sin silencios)")
+SPEECH_RATIO = metrics.histogram(
+    "micro_speech_ratio", "Fracción de cada grabación con voz según el VAD",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0))
+AUDIO_RESPONSES = metrics.counter(
+    "micro_audio_responses_total", "Respuestas de /audio por código (200, 206, 304, 416)", ("status",))
+AUDIO_SENT_BYTES = metrics.counter(
+    "micro_audio_sent_bytes_total", "Bytes de audio enviados por /audio")
+NOTIFY_SECONDS = metrics.histogram(
+    "micro_backend_notify_seconds", "Latencia del aviso al backend Node.js", ("status",))
+JOBS_QUEUED = metrics.gauge(
+    "micro_jobs_queued", "Transcripciones esperando un worker")
+JOBS_RUNNING = metrics.gauge(
+    "micro_jobs_running", "Transcripciones en proceso")
+JOBS_RETRYING = metrics.gauge(
+    "micro_jobs_waiting_retry", "Trabajos esperando reintentar el aviso al backend")
+COMPRESS_SECONDS = metrics.histogram(
+    "micro_audio_compress_seconds", "Tiempo comprimiendo una grabación a FLAC")
+STORED_BYTES = metrics.counter(
+    "micro_audio_stored_bytes_total", "Bytes de grabaciones guardadas por formato final", ("format",))
+
 # URL del backend Node.js (ajusta si es necesario, e.g., si corres local o en render)
 NODE_BACKEND_URL = "https://api-tresa.onrender.com/api/recordings" 
 # Si estás probando localmente, usa:
 # NODE_BACKEND_URL = "http://localhost:3000/api/recordings"
 
+def process_recording(job, update, streaming=None):
+    """
+    Transcribir una grabación guardada y avisar al backend (worker de la cola).
+
+    Un trabajo reintentado o retomado tras un reinicio se salta los pasos que
+    ya guardó (la transcripción); si el aviso falla se reintenta con espera.
+    """
+    filename = job["file"]
+    if job.get("transcription") is None:
+        # Retomado tras un reinicio: la grabación puede estar ya comprimida
+        stored = stored_recording(AUDIO_DIR, filename)
+        if stored is None:
+            raise FileNotFoundError(f"Grabación no encontrada: {filename}")
+        if stored[0] != filename and streaming is None:
+            raise ValueError(f"{filename} ya se comprimió sin haberse transcrito")
+        transcribe_recording(job, update, os.path.join(AUDIO_DIR, stored[0]), streaming)
+
+    update(stage="notifying")
+    notify_recording(job, update)
+
+
+def transcribe_recording(job, update, filepath, streaming=None):
+    """Transcribir y luego comprimir la grabación; guarda el texto en el trabajo"""
+    update(stage="transcribing")
+    t_transcribe = time.perf_counter()
+    segments = []
+    try:
+        if streaming is not None:
+            # El reconocedor ya procesó casi todo durante la subida
+            transcription, segments = streaming.finish(TRANSCRIPTION_TIMEOUT)
+        else:
+            # Modo batch (o trabajo retomado tras un reinicio): desde el archivo,
+            # sin cargarlo en memoria; los segmentos se leen al enviarlos
+            pcm = pcm_memmap(filepath)
+            transcription, segments = segmenter.transcribe(
+                pcm,
+                job.get("regions"),
+                progress=lambda done, total: update(progress={"segments_done": done, "segments_total": total})
+            )
+        
+        print(f"Transcripción: {transcription}")
+        TRANSCRIPTION_LAG.labels(job["mode"]).observe(time.time() - job["created_at"])
+        TRANSCRIPTION_SECONDS.labels("ok").observe(time.perf_counter() - t_transcribe)
+
+    except Exception as trans_error:
+        print(f"⚠️ Error en transcripción: {trans_error}")
+        TRANSCRIPTION_SECONDS.labels("error").observe(time.perf_counter() - t_transcribe)
+        transcription = "[Error de Transcripción - Audio Guardado]"
+        update(transcription_error=str(trans_error))
+
+    # Comprimir antes de avisar: cuando el backend recibe la URL la grabación
+    # ya está en su formato final (y se puede cachear como inmutable)
+    update(stage="storing", transcription=transcription, segments=segments)
+    store_recording(filepath, update)
+
+
+def notify_recording(job, update):
+    """Avisar al backend Node.js; RetryJob si falla (la cola reintenta con espera)"""
+    filename = job["file"]
+    transcription = job["transcription"]
+
+    # Notificar al servidor Node.js
+    # La URL del archivo será accesible desde este servidor Python
+    # Asumimos que este servidor es accesible públicamente o localmente
+    # Para Render, necesitamos la URL pública de este servicio
+    # Por ahora usaremos una URL relativa o IP local si es prueba
+    
+    # IMPORTANTE: Si esto corre en Render, necesitas la URL de TU servicio Python en Render
+    # Ejemplo: https://mi-python-service.onrender.com/audio/rec_123.wav
+    
+    # Para simplificar, enviaremos el nombre del archivo y el frontend construirá la URL
+    # O mejor, enviamos la ruta relativa
+    file_url = f"/audio/{filename}" 
+
+    t_notify = time.perf_counter()
+    try:
+        http_pool.post(NODE_BACKEND_URL, json={
+            "archivo_url": file_url,
+            "transcripcion": transcription
+        }, connect_timeout=5, read_timeout=10)
+        NOTIFY_SECONDS.labels("ok").observe(time.perf_counter() - t_notify)
+        print("Metadatos enviados a Node.js")
+        update(stage="notified")
+    except Exception as e:
+        NOTIFY_SECONDS.labels("error").observe(time.perf_counter() - t_notify)
+        print(f"Error enviando a Node: {e}")
+        update(stage="notify_failed", backend_error=str(e))
+        raise RetryJob(f"Aviso al backend falló: {e}")
+
+
+def store_recording(filepath, update):
+    """Comprimir la grabación ya transcrita; si falla se conserva el WAV"""
+    size = os.path.getsize(filepath)
+    stored = filepath if filepath.endswith(".flac") else None
+    if COMPRESS_AUDIO and stored is None:
+        t_compress = time.perf_counter()
+        try:
+            stored = compress_to_flac(filepath, keep_wav=KEEP_WAV)
+        except Exception as e:
+            print(f"⚠️ Error comprimiendo {filepath}: {e}")
+            update(storage_error=str(e))
+        if stored is not None:
+            COMPRESS_SECONDS.observe(time.perf_counter() - t_compress)
+            print(f"🗜️ {os.path.basename(stored)}: {os.path.getsize(stored) / size:.0%} del WAV")
+
+    if stored is None:
+        STORED_BYTES.labels("wav").inc(size)
+        update(stored_file=os.path.basename(filepath), stored_bytes=size)
+    else:
+        STORED_BYTES.labels("flac").inc(os.path.getsize(stored))
+        update(stored_file=os.path.basename(stored), stored_bytes=os.path.getsize(stored))
+
+
+# Transcripción y aviso al backend en un pool acotado de workers; con varios
+# workers de gunicorn cada trabajo lo procesa un solo proceso (flock por trabajo)
+jobs = JobQueue(JOBS_DIR, process_recording, workers=JOB_WORKERS)
+jobs.start()
+
+
+@metrics.add_collector
+def collect_job_metrics():
+    stats = jobs.stats()
+    JOBS_QUEUED.set(stats["queued"])
+    JOBS_RUNNING.set(stats["running"])
+    JOBS_RETRYING.set(stats["waiting_retry"])
+
+
 @app.route('/upload_stream', methods=['POST'])
 def upload_stream():
     try:
         # Generar nombre de archivo único
-        filename = f"rec_{int(time.time())}.wav"
+        # (sufijo aleatorio: varios micrófonos pueden subir en el mismo segundo)
+        filename = f"rec_{int(time.time())}_{uuid.uuid4().hex[:6]}.wav"
         filepath = os.path.join(AUDIO_DIR, filename)
         
         print(f"Recibiendo stream de audio... Guardando en {filepath}")
 
         # Guardar el stream directamente a un archivo
         # El ESP32 enviará RAW PCM (16-bit, 16kHz, Mono)
-        # Necesitamos guardarlo y luego convertirlo o envolverlo en WAV
+        # Se escribe como WAV: la cabecera va primero y sus tamaños se
+        # corrigen al cerrar (el archivo es .part hasta entonces)
+        # En modo stream cada fragmento va también al reconocedor (tee)
+        streaming = StreamingTranscription(recognizer, min_bytes=MIN_AUDIO_BYTES) if TRANSCRIPTION_MODE == "stream" else None
+        # El VAD corre por bloques sobre cada fragmento; los tramos con voz van
+        # al reconocedor (stream) o se anotan para cortar los segmentos (batch)
+        vad = VoiceActivityDetector() if VAD else None
+        regions = []
         
-        # Opción A: Guardar raw y luego convertir
-        # Opción B: Escribir cabecera WAV y luego los datos (más eficiente si sabemos el tamaño, pero en stream no siempre)
-        # Opción C: Guardar raw y usar speech config para raw
+        def on_audio(pieces):
+            for at, audio in pieces:
+                RECOGNIZER_BYTES.inc(len(audio))
+                if streaming is not None:
+                    streaming.feed(audio, at)
+                elif at is not None:
+                    start, end = at // SAMPLE_WIDTH, (at + len(audio)) // SAMPLE_WIDTH
+                    if regions and regions[-1][1] == start:
+                        regions[-1] = (regions[-1][0], end)
+                    else:
+                        regions.append((start, end))
         
-        # Vamos a guardar los datos raw tal cual llegan
-        with open(filepath, 'wb') as f:
+        t_receive = time.perf_counter()
+        write_seconds = 0.0
+        recorder = WavRecorder(filepath)
+        try:
             # Flask stream processing
             chunk_size = 4096
             while True:
                 chunk = request.stream.read(chunk_size)
                 if len(chunk) == 0:
                     break
-                f.write(chunk)
+                t_write = time.perf_counter()
+                recorder.write(chunk)
+                write_seconds += time.perf_counter() - t_write
+                UPLOAD_BYTES.inc(len(chunk))
+                on_audio(vad.feed(chunk) if vad is not None else [(None, chunk)])
+            if vad is not None:
+                on_audio(vad.flush())
+        except Exception:
+            # Subida interrumpida: liberar el hilo del reconocedor y no dejar
+            # un WAV incompleto
+            if streaming is not None:
+                streaming.abort()
+            recorder.discard()
+            raise
+        UPLOAD_SECONDS.observe(time.perf_counter() - t_receive)
         
         print("Stream finalizado. Verificando tamaño...")
         
-        file_size = os.path.getsize(filepath)
-        print(f"Tamaño del archivo: {file_size} bytes")
+        file_size = recorder.data_bytes
+        print(f"Tamaño del audio: {file_size} bytes")
 
         # Filtrar grabaciones muy cortas (ruido o falsos contactos)
-        # 16kHz * 2 bytes * 0.5s = ~16000 bytes. 
-        # Usaremos 4096 bytes como mínimo seguro.
-        if file_size < 4096:
+        if file_size < MIN_AUDIO_BYTES:
             print("Archivo muy pequeño (posible ruido), ignorando.")
-            os.remove(filepath)
+            recorder.discard()
+            UPLOADS.labels("ignored").inc()
             return jsonify({"status": "ignored", "message": "Audio too short"}), 200
 
-        transcription = ""
-        try:
-            # Transcribir con Google Speech
-            with open(filepath, 'rb') as audio_file:
-                content = audio_file.read()
-
-            audio = speech.RecognitionAudio(content=content)
-            config = speech.RecognitionConfig(
-                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-                sample_rate_hertz=16000,
-                language_code="es-MX",
-            )
-
-            response = speech_client.recognize(config=config, audio=audio)
-
-            for result in response.results:
-                transcription += result.alternatives[0].transcript
+        speech_ratio = None
+        if vad is not None:
+            speech_ratio = round(vad.speech_ratio, 3)
+            speech_seconds = vad.speech_frames * vad.frame_ms / 1000
+            SPEECH_RATIO.observe(vad.speech_ratio)
+            print(f"Voz: {speech_seconds:.1f} s ({speech_ratio:.0%} de la grabación)")
             
-            print(f"Transcripción: {transcription}")
-
-        except Exception as trans_error:
-            print(f"⚠️ Error en transcripción: {trans_error}")
-            transcription = "[Error de Transcripción - Audio Guardado]"
-
-        # Notificar al servidor Node.js
-        # La URL del archivo será accesible desde este servidor Python
-        # Asumimos que este servidor es accesible públicamente o localmente
-        # Para Render, necesitamos la URL pública de este servicio
-        # Por ahora usaremos una URL relativa o IP local si es prueba
-        
-        # IMPORTANTE: Si esto corre en Render, necesitas la URL de TU servicio Python en Render
-        # Ejemplo: https://mi-python-service.onrender.com/audio/rec_123.wav
-        
-        # Para simplificar, enviaremos el nombre del archivo y el frontend construirá la URL
-        # O mejor, enviamos la ruta relativa
-        file_url = f"/audio/{filename}" 
+            # Solo ruido o silencio: no se gasta una llamada al reconocedor
+            if speech_seconds < MIN_SPEECH_SECONDS:
+                print("Sin voz detectada, ignorando.")
+                if streaming is not None:
+                    streaming.abort()
+                recorder.discard()
+                UPLOADS.labels("no_speech").inc()
+                return jsonify({
+                    "status": "ignored",
+                    "message": "No speech detected",
+                    "speech_ratio": speech_ratio
+                }), 200
 
-        try:
-            requests.post(NODE_BACKEND_URL, json={
-                "archivo_url": file_url,
-                "transcripcion": transcription
-            })
-            print("Metadatos enviados a Node.js")
-        except Exception as e:
-            print(f"Error enviando a Node: {e}")
+        t_write = time.perf_counter()
+        recorder.close()
+        WRITE_SECONDS.observe(write_seconds + time.perf_counter() - t_write)
 
+        # Audio guardado: la transcripción y el aviso al backend siguen en
+        # segundo plano y el ESP32 queda libre de inmediato
+        job = jobs.submit(
+            context=streaming,
+            file=filename,
+            mode="stream" if streaming is not None else "batch",
+            size_bytes=file_size,
+            speech_ratio=speech_ratio,
+            regions=regions if vad is not None and streaming is None else None
+        )
+        UPLOADS.labels("accepted").inc()
         return jsonify({
-            "status": "success",
-            "transcription": transcription,
+            "status": "accepted",
+            "job_id": job["id"],
+            "status_url": f"/jobs/{job['id']}",
+            "speech_ratio": speech_ratio,
             "file": filename
-        }), 200
+        }), 202
 
     except Exception as e:
         print(f"Error: {str(e)}")
+        UPLOADS.labels("error").inc()
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Estado de una transcripción (queued → running → done | failed)"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    job.pop("regions", None)
+    return jsonify(job), 200
+
+def _read_range(f, length, block=64 * 1024):
+    """Enviar length bytes desde la posición actual (servidores que no cortan en Content-Length)"""
+    try:
+        while length > 0:
+            data = f.read(min(block, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        f.close()
+
+
+def _recording_response(status, mimetype, etag, mtime, final, body=None):
+    response = Response(body, status=status, mimetype=mimetype, direct_passthrough=True)
+    response.set_etag(etag)
+    response.last_modified = mtime
+    response.cache_control.public = True
+    if final:
+        response.cache_control.max_age = AUDIO_CACHE_SECONDS
+        response.cache_control.immutable = True
+    else:
+        # El WAV se reemplazará por el FLAC: revalidar siempre con el ETag
+        response.cache_control.no_cache = True
+    response.headers["Accept-Ranges"] = "bytes"
+    AUDIO_RESPONSES.labels(str(status)).inc()
+    return response
+
+
 # Endpoint para servir los archivos de audio
+# El backend guarda /audio/rec_x.wav; si ya se comprimió se sirve el FLAC
 @app.route('/audio/<path:filename>')
 def serve_audio(filename):
-    return send_from_directory(AUDIO_DIR, filename)
+    """
+    Grabación con soporte de Range (el reproductor pide solo el tramo al
+    buscar), ETag fuerte y caché inmutable una vez en su formato final.
+
+    Las grabaciones se escriben como .part y se renombran al terminar, así que
+    inodo + tamaño + mtime identifican el contenido. Con gunicorn el cuerpo
+    es su wsgi.file_wrapper con el archivo ya posicionado y Content-Length
+    exacto, y el envío usa sendfile (sin copiar por Python).
+    """
+    stored = stored_recording(AUDIO_DIR, filename)
+    if stored is None:
+        return jsonify({"error": "Unknown recording"}), 404
+    name, mimetype = stored
+    path = os.path.join(AUDIO_DIR, name)
+    st = os.stat(path)
+    size = st.st_size
+    etag = f"{st.st_ino:x}-{size:x}-{st.st_mtime_ns:x}"
+    # Final: ya es FLAC, o el WAV pedido se conserva (o no se comprime)
+    final = name != filename or filename.endswith(".flac") or KEEP_WAV or not COMPRESS_AUDIO
+
+    if request.if_none_match.contains(etag):
+        return _recording_response(304, mimetype, etag, st.st_mtime, final)
+
+    # Range solo si es un único tramo y (con If-Range) el archivo no cambió
+    start, end = 0, size
+    partial = (
+        request.range is not None
+        and request.range.units == "bytes"
+        and len(request.range.ranges) == 1
+        and request.if_range.date is None
+        and request.if_range.etag in (None, etag)
+    )
+    if partial:
+        bounds = request.range.range_for_length(size)
+        if bounds is None:
+            response = Response(status=416)
+            response.headers["Content-Range"] = f"bytes */{size}"
+            AUDIO_RESPONSES.labels("416").inc()
+            return response
+        start, end = bounds
+
+    f = open(path, 'rb')
+    f.seek(start)
+    length = end - start
+    # gunicorn corta en Content-Length (también con sendfile); el servidor de
+    # desarrollo envía hasta el final del archivo, así que ahí se limita a mano
+    if end == size or request.environ.get("SERVER_SOFTWARE", "").startswith("gunicorn"):
+        body = wrap_file(request.environ, f)
+    else:
+        body = _read_range(f, length)
+
+    response = _recording_response(206 if partial else 200, mimetype, etag, st.st_mtime, final, body)
+    response.headers["Content-Length"] = str(length)
+    if partial:
+        response.headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    AUDIO_SENT_BYTES.inc(length)
+    return response
 
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({"status": "Server running"}), 200
+    return jsonify({"status": "Server running", "http": http_pool.stats(), "jobs": jobs.stats()}), 200
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
 
 if __name__ == '__main__':
-    print("Servidor Python iniciado en puerto 5001")
-    app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+    print(f"Servidor Python iniciado en puerto {PORT}")
+    app.run(host='0.0.0.0', port=PORT, threaded=True)
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+Seguimiento ligero de objetos entre frames (IoU + centroide)
+Asigna IDs persistentes a las cajas de YOLO para no generar un incidente por frame
+"""
+
+import itertools
+import time
+
+
+def iou(a, b):
+    """Intersección sobre unión de dos cajas (x1, y1, x2, y2)"""
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / float(area_a + area_b - inter)
+
+
+def centroid_distance(a, b):
+    """Distancia entre centros relativa al tamaño de la caja a"""
+    ax, ay = (a[0] + a[2]) / 2.0, (a[1] + a[3]) / 2.0
+    bx, by = (b[0] + b[2]) / 2.0, (b[1] + b[3]) / 2.0
+    size = max(a[2] - a[0], a[3] - a[1], 1)
+    return ((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5 / size
+
+
+class Track:
+    """Objeto seguido a lo largo de varios frames"""
+
+    def __init__(self, track_id, detection, now):
+        self.id = track_id
+        self.class_id = detection["class_id"]
+        self.name = detection.get("name")
+        self.bbox = detection["bbox"]
+        self.confidence = detection["confidence"]
+        self.max_confidence = detection["confidence"]
+        self.first_seen = now
+        self.last_seen = now
+        self.hits = 1
+        self.incident = None  # datos del incidente asociado (si se reportó)
+        self.last_update = now
+
+    @property
+    def duration(self):
+        return self.last_seen - self.first_seen
+
+    def update(self, detection, now):
+        self.bbox = detection["bbox"]
+        self.confidence = detection["confidence"]
+        self.max_confidence = max(self.max_confidence, detection["confidence"])
+        self.last_seen = now
+        self.hits += 1
+
+
+class IoUTracker:
+    """
+    Asociación voraz por IoU (misma clase) con respaldo por distancia de centroides.
+
+    Un track termina cuando no se ve durante max_idle segundos (se usa tiempo
+    y no número de frames porque la frecuencia de muestreo varía).
+    """
+
+    def __init__(self, iou_threshold=0.3, max_centroid_distance=0.5, max_idle=5.0):
+        self.iou_threshold = iou_threshold
+        self.max_centroid_distance = max_centroid_distance
+        self.max_idle = max_idle
+        self.tracks = {}
+        self._ids = itertools.count(1)
+
+    def update(self, detections, now=None):
+        """
+        Asociar detecciones del frame a tracks.
+
+        Devuelve (tracks_vistos, tracks_terminados).
+        """
+        now = time.time() if now is None else now
+        unmatched_tracks = set(self.tracks)
+        unmatched_dets = set(range(len(detections)))
+        matched = []
+
+        # 1) Pares por IoU, de mayor a menor
+        pairs = []
+        for tid, track in self.tracks.items():
+            for di, det in enumerate(detections):
+                if det["class_id"] != track.class_id:
+                    continue
+                score = iou(track.bbox, det["bbox"])
+                if score >= self.iou_threshold:
+                    pairs.append((score, tid, di))
+        for _, tid, di in sorted(pairs, reverse=True):
+            if tid in unmatched_tracks and di in unmatched_dets:
+                unmatched_tracks.discard(tid)
+                unmatched_dets.discard(di)
+                matched.append((tid, di))
+
+        # 2) Respaldo por centroide (objeto que se movió más que su tamaño de caja)
+        pairs = []
+        for tid in unmatched_tracks:
+            track = self.tracks[tid]
+            for di in unmatched_dets:
+                det = detections[di]
+                if det["class_id"] != track.class_id:
+                    continue
+                dist = centroid_distance(track.bbox, det["bbox"])
+                if dist <= self.max_centroid_distance:
+                    pairs.append((dist, tid, di))
+        for _, tid, di in sorted(pairs):
+            if tid in unmatched_tracks and di in unmatched_dets:
+                unmatched_tracks.discard(tid)
+                unmatched_dets.discard(di)
+                matched.append((tid, di))
+
+        seen = []
+        for tid, di in matched:
+            self.tracks[tid].update(detections[di], now)
+            seen.append(self.tracks[tid])
+
+        for di in sorted(unmatched_dets):
+            track = Track(next(self._ids), detections[di], now)
+            self.tracks[track.id] = track
+            seen.append(track)
+
+        ended = []
+        for tid in list(unmatched_tracks):
+            if now - self.tracks[tid].last_seen > self.max_idle:
+                ended.append(self.tracks.pop(tid))
+
+        return seen, ended
+
+    def flush(self):
+        """Terminar todos los tracks (al detener la sesión)"""
+        ended = list(self.tracks.values())
+        self.tracks.clear()
+        return ended
@@ -0,0 +1,469 @@
+"""
+Transcripción de las grabaciones del micrófono (PCM 16-bit, 16 kHz, mono)
+Reconocedor de Google Speech (síncrono o en streaming), un sustituto local sin
+red para pruebas, StreamingTranscription, que alimenta al reconocedor con los
+fragmentos a medida que llegan de la petición HTTP, y SegmentTranscriber, que
+corta grabaciones largas en silencios y transcribe los segmentos en paralelo
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # bytes por muestra
+BYTES_PER_SECOND = SAMPLE_RATE * SAMPLE_WIDTH
+LANGUAGE_CODE = os.getenv("SPEECH_LANGUAGE", "es-MX")
+
+# Google acepta como máximo 25 600 bytes de audio por mensaje de streaming
+MAX_STREAM_CHUNK = 25600
+
+# recognize() admite ~1 minuto de audio y un stream ~5 minutos: los segmentos
+# se cortan en el silencio más largo entre min y max segundos
+SEGMENT_MIN_SECONDS = 30.0
+SEGMENT_MAX_SECONDS = 55.0
+SEGMENT_OVERLAP = 0.3
+STREAM_SEGMENT_MIN_SECONDS = 200.0
+STREAM_SEGMENT_MAX_SECONDS = 280.0
+# Un stream de Google sin audio por ~10 s falla (Audio Timeout): en pausas
+# más largas que esto (tramos omitidos por el VAD) se cierra y luego se abre otro
+STREAM_MAX_PAUSE_SECONDS = 4.0
+
+FRAME_MS = 30
+# Ventana para buscar pausas (no el frame más silencioso aislado)
+PAUSE_MS = 300
+
+
+def _split(chunk, size):
+    for i in range(0, len(chunk), size):
+        yield chunk[i:i + size]
+
+
+def frame_energy(pcm, frame_len, block_frames=4096):
+    """
+    Energía media (RMS²) por frame de un arreglo int16.
+
+    Se procesa por bloques para no convertir a float la grabación completa
+    (pcm puede ser un np.memmap de una hora de audio).
+    """
+    n_frames = len(pcm) // frame_len
+    energy = np.empty(n_frames, dtype=np.float32)
+    for first in range(0, n_frames, block_frames):
+        last = min(first + block_frames, n_frames)
+        block = np.asarray(pcm[first * frame_len:last * frame_len], dtype=np.float32)
+        energy[first:last] = np.square(block).reshape(-1, frame_len).mean(axis=1)
+    return energy
+
+
+def find_cuts(pcm, min_seconds=SEGMENT_MIN_SECONDS, max_seconds=SEGMENT_MAX_SECONDS, sample_rate=SAMPLE_RATE):
+    """
+    Muestras donde cortar: la pausa más silenciosa entre min y max segundos de cada segmento.
+
+    El último corte nunca deja una cola más corta que min_seconds (quedaría
+    dentro del solape del segmento anterior); si lo que queda no alcanza para
+    dos segmentos de min_seconds, se reparte entre los dos sin pasar de max.
+    """
+    frame_len = sample_rate * FRAME_MS // 1000
+    energy = frame_energy(pcm, frame_len)
+    pause = max(1, PAUSE_MS // FRAME_MS)
+    smoothed = np.convolve(energy, np.ones(pause, dtype=np.float32) / pause, mode="same")
+    
+    min_frames = int(min_seconds * 1000 / FRAME_MS)
+    max_frames = int(max_seconds * 1000 / FRAME_MS)
+    cuts = []
+    start = 0
+    while len(energy) - start > max_frames:
+        remaining = len(energy) - start
+        lo, hi = min_frames, min(max_frames, remaining - min_frames)
+        if hi <= lo:
+            lo, hi = max(remaining - max_frames, remaining // 4), min(max_frames, 3 * remaining // 4)
+        start += lo + int(np.argmin(smoothed[start + lo:start + hi]))
+        cuts.append(start * frame_len)
+    return cuts
+
+
+def segment_bounds(n_samples, cuts, overlap=SEGMENT_OVERLAP, sample_rate=SAMPLE_RATE):
+    """(inicio, fin) en muestras de cada segmento, solapados overlap segundos en cada corte"""
+    pad = int(overlap * sample_rate)
+    edges = [0, *cuts, n_samples]
+    return [
+        (max(0, a - pad), min(n_samples, b + pad))
+        for a, b in zip(edges[:-1], edges[1:])
+    ]
+
+
+def stitch(texts, max_repeat=3):
+    """Unir textos de segmentos consecutivos quitando palabras repetidas por el solape"""
+    words = []
+    for text in texts:
+        new = text.split()
+        for k in range(min(max_repeat, len(words), len(new)), 0, -1):
+            if [w.lower() for w in words[-k:]] == [w.lower() for w in new[:k]]:
+                new = new[k:]
+                break
+        words.extend(new)
+    return " ".join(words)
+
+
+class GoogleRecognizer:
+    """Google Cloud Speech-to-Text (LINEAR16)"""
+
+    def __init__(self, language_code=LANGUAGE_CODE, sample_rate=SAMPLE_RATE):
+        from google.cloud import speech
+
+        self.speech = speech
+        self.client = speech.SpeechClient()
+        self.config = speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+            sample_rate_hertz=sample_rate,
+            language_code=language_code,
+        )
+
+    @staticmethod
+    def _join(results):
+        return " ".join(r.alternatives[0].transcript.strip() for r in results if r.alternatives)
+
+    def recognize(self, content):
+        """Audio completo en una sola llamada (máx. ~1 minuto)"""
+        audio = self.speech.RecognitionAudio(content=content)
+        response = self.client.recognize(config=self.config, audio=audio)
+        return self._join(response.results)
+
+    def stream(self, chunks):
+        """Transcribir un iterable de fragmentos mientras se van produciendo"""
+        requests = (
+            self.speech.StreamingRecognizeRequest(audio_content=part)
+            for chunk in chunks
+            for part in _split(chunk, MAX_STREAM_CHUNK)
+        )
+        responses = self.client.streaming_recognize(
+            config=self.speech.StreamingRecognitionConfig(config=self.config),
+            requests=requests
+        )
+        final = []
+        for response in responses:
+            final.extend(r for r in response.results if r.is_final)
+        return self._join(final)
+
+
+class LocalRecognizer:
+    """
+    Sustituto sin red para pruebas: "transcribe" la duración del audio.
+
+    realtime_factor simula la latencia del servicio (segundos de cómputo por
+    segundo de audio), repartida a medida que llegan los fragmentos.
+    max_idle simula el timeout de audio de Google: el stream falla si pasan
+    más de max_idle segundos sin recibir un fragmento.
+    """
+
+    def __init__(self, realtime_factor=0.0, max_idle=None):
+        self.realtime_factor = realtime_factor
+        self.max_idle = max_idle
+
+    def recognize(self, content):
+        return self.stream([content])
+
+    def _check_idle(self, last):
+        now = time.monotonic()
+        if self.max_idle is not None and now - last > self.max_idle:
+            raise TimeoutError(f"Audio Timeout: {now - last:.1f} s sin audio en el stream")
+        return now
+
+    def stream(self, chunks):
+        total = 0
+        last = time.monotonic()
+        for chunk in chunks:
+            last = self._check_idle(last)
+            total += len(chunk)
+            if self.realtime_factor:
+                time.sleep(len(chunk) / BYTES_PER_SECOND * self.realtime_factor)
+                last = time.monotonic()
+        self._check_idle(last)
+        return f"[local] {total / BYTES_PER_SECOND:.2f} s de audio"
+
+
+def make_recognizer(name):
+    """"google" | "local" (LOCAL_RECOGNIZER_FACTOR / _MAX_IDLE simulan latencia y timeout)"""
+    if name == "google":
+        return GoogleRecognizer()
+    if name == "local":
+        max_idle = os.getenv("LOCAL_RECOGNIZER_MAX_IDLE")
+        return LocalRecognizer(
+            float(os.getenv("LOCAL_RECOGNIZER_FACTOR", "0")),
+            max_idle=float(max_idle) if max_idle else None
+        )
+    raise ValueError(f"Reconocedor desconocido: {name} (opciones: google, local)")
+
+
+class _StreamSegment:
+    """
+    Un stream del reconocedor alimentado desde una cola acotada en su propio hilo.
+
+    Si no llega audio en max_pause segundos el stream se cierra solo (antes
+    del timeout del servicio); put() devuelve entonces False.
+    """
+
+    def __init__(self, recognizer, start, max_pending, max_pause=None):
+        self.recognizer = recognizer
+        self.start = start  # posición en la grabación original (bytes)
+        self.end = start
+        self.size = 0  # bytes enviados (sin los tramos omitidos)
+        self.transcript = None
+        self.error = None
+        self.closed = False
+        self.max_pause = max_pause
+        self._queue = queue.Queue(max_pending)
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _chunks(self):
+        while True:
+            try:
+                chunk = self._queue.get(timeout=self.max_pause)
+            except queue.Empty:
+                with self._lock:
+                    if self._queue.empty():
+                        self.closed = True
+                        return
+                continue
+            if chunk is None:
+                return
+            yield chunk
+
+    def _run(self):
+        try:
+            self.transcript = self.recognizer.stream(self._chunks())
+        except Exception as e:
+            self.error = e
+
+    def put(self, item):
+        # Si el reconocedor falló o el stream se cerró por la pausa no queda
+        # nadie leyendo la cola
+        while self._thread.is_alive():
+            with self._lock:
+                if self.closed:
+                    return False
+                try:
+                    self._queue.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+        return False
+
+    def join(self, timeout):
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+
+class StreamingTranscription:
+    """
+    Transcripción que avanza mientras llega la subida.
+
+    Cada stream del reconocedor corre en su propio hilo y consume los
+    fragmentos de una cola acotada (feed bloquea si se atrasa más de
+    max_pending fragmentos). Pasados min_seconds, el stream se cierra en el
+    primer silencio (fragmento débil o tramo omitido por el VAD) o a los
+    max_seconds y se abre otro, para no chocar con el límite de duración de
+    un stream; los segmentos se unen en orden con sus tiempos. No se abre ningún stream hasta reunir min_bytes,
+    para no gastar una llamada en grabaciones demasiado cortas.
+
+    Una pausa de más de max_pause_seconds (salto del VAD, o sin fragmentos
+    durante ese tiempo real) cierra el stream sea cual sea su tamaño: el
+    servicio corta un stream que pasa ~10 s sin audio.
+    """
+
+    def __init__(self, recognizer, min_bytes=0, max_pending=256,
+                 min_seconds=STREAM_SEGMENT_MIN_SECONDS, max_seconds=STREAM_SEGMENT_MAX_SECONDS,
+                 silence_ratio=0.1, max_pause_seconds=STREAM_MAX_PAUSE_SECONDS):
+        self.recognizer = recognizer
+        self.min_bytes = min_bytes
+        self.max_pending = max_pending
+        self.min_segment_bytes = int(min_seconds * BYTES_PER_SECOND)
+        self.max_segment_bytes = int(max_seconds * BYTES_PER_SECOND)
+        self.silence_ratio = silence_ratio
+        self.max_pause_seconds = max_pause_seconds
+        self.max_pause_bytes = int(max_pause_seconds * BYTES_PER_SECOND)
+        self.received = 0
+        self.segments = []
+        self._current = None
+        self._position = 0  # bytes de la grabación original vistos
+        self._buffer = []
+        self._carry = b""  # byte suelto: un corte nunca parte una muestra
+        self._mean_energy = None
+
+    def _is_silent(self, chunk):
+        energy = float(np.square(np.frombuffer(chunk, dtype=np.int16).astype(np.float32)).mean())
+        if self._mean_energy is None:
+            self._mean_energy = energy
+        silent = energy < self.silence_ratio * self._mean_energy
+        self._mean_energy = 0.95 * self._mean_energy + 0.05 * energy
+        return silent
+
+    def feed(self, chunk, at=None):
+        """
+        at: posición (bytes) del fragmento en la grabación original cuando se
+        omitieron tramos (VAD, fragmentos alineados a muestras); un salto cuenta
+        como silencio para rotar el stream.
+        """
+        if at is None:
+            at = self._position - len(self._carry)
+            self._position += len(chunk)
+            chunk = self._carry + chunk
+            cut = len(chunk) - len(chunk) % SAMPLE_WIDTH
+            chunk, self._carry = chunk[:cut], chunk[cut:]
+            gap = None
+        else:
+            gap = at - self._position
+            self._position = at + len(chunk)
+        if not chunk:
+            return
+        
+        self.received += len(chunk)
+        if not self.segments:
+            self._buffer.append((at, chunk))
+            if self.received < self.min_bytes:
+                return
+            at = self._buffer[0][0]
+            chunk = b"".join(c for _, c in self._buffer)
+            self._buffer = []
+        
+        if gap and self._current is not None and (
+                self._current.size >= self.min_segment_bytes or gap >= self.max_pause_bytes):
+            self.abort()
+        while True:
+            if self._current is None:
+                self._current = _StreamSegment(self.recognizer, at, self.max_pending, self.max_pause_seconds)
+                self.segments.append(self._current)
+            if self._current.put(chunk) or not self._current.closed:
+                break
+            # El stream se cerró solo durante la pausa: seguir en uno nuevo
+            self._current = None
+        
+        segment = self._current
+        segment.size += len(chunk)
+        segment.end = at + len(chunk)
+        # Sin VAD: un fragmento mucho más débil que el promedio marca la pausa
+        quiet = gap is None and self._is_silent(chunk)
+        if segment.size >= self.max_segment_bytes or (segment.size >= self.min_segment_bytes and quiet):
+            self.abort()
+
+    def abort(self):
+        """Cerrar el stream actual sin esperar el resultado"""
+        if self._current is not None:
+            self._current.put(None)
+            self._current = None
+
+    def finish(self, timeout=None):
+        """
+        Cerrar el audio y esperar el texto.
+
+        Devuelve (texto, segmentos) o (None, []) si nunca se abrió un stream.
+        """
+        if not self.segments:
+            return None, []
+        self.abort()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for segment in self.segments:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not segment.join(remaining):
+                raise TimeoutError("El reconocedor no terminó a tiempo")
+            if segment.error is not None:
+                raise segment.error
+        
+        timeline = [
+            {
+                "start": round(seg.start / BYTES_PER_SECOND, 2),
+                "end": round(seg.end / BYTES_PER_SECOND, 2),
+                "text": seg.transcript or "",
+            }
+            for seg in self.segments
+        ]
+        return stitch(seg["text"] for seg in timeline), timeline
+
+
+class SegmentTranscriber:
+    """
+    Transcripción de una grabación completa por segmentos en paralelo.
+
+    Corta en silencios (find_cuts) y envía cada segmento a recognize() en un
+    pool acotado compartido por todas las peticiones; el tiempo total queda
+    cerca del segmento más lento en lugar de la suma de todos.
+    """
+
+    def __init__(self, recognizer, workers=4, min_seconds=SEGMENT_MIN_SECONDS,
+                 max_seconds=SEGMENT_MAX_SECONDS, overlap=SEGMENT_OVERLAP):
+        self.recognizer = recognizer
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.overlap = overlap
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="transcribe")
+
+    def plan(self, pcm, regions=None):
+        """
+        Segmentos como listas de rangos (inicio, fin) en muestras.
+
+        regions son los tramos con voz (VAD): se agrupan hasta max_seconds de
+        audio por segmento (el silencio entre tramos no se envía); un tramo
+        más largo se corta en sus pausas con solape.
+        """
+        if regions is None:
+            regions = [(0, len(pcm))]
+        max_samples = int(self.max_seconds * SAMPLE_RATE)
+        
+        pieces = []
+        for a, b in regions:
+            if b - a <= max_samples:
+                pieces.append((a, b))
+                continue
+            cuts = find_cuts(pcm[a:b], self.min_seconds, self.max_seconds)
+            pieces.extend((a + start, a + end) for start, end in segment_bounds(b - a, cuts, self.overlap))
+        
+        segments = []
+        size = 0
+        for a, b in pieces:
+            if not segments or size + (b - a) > max_samples:
+                segments.append([])
+                size = 0
+            segments[-1].append((a, b))
+            size += b - a
+        return segments
+
+    def transcribe(self, pcm, regions=None, progress=None):
+        """
+        pcm: arreglo int16 (o memmap); devuelve (texto, segmentos con tiempos).
+
+        progress(terminados, total) se llama cada vez que termina un segmento.
+        """
+        segments = self.plan(pcm, regions)
+        futures = [self.pool.submit(self._recognize, pcm, ranges) for ranges in segments]
+        if progress is not None:
+            done = [0]
+            lock = threading.Lock()
+            
+            def on_done(_):
+                with lock:
+                    done[0] += 1
+                    progress(done[0], len(futures))
+            
+            progress(0, len(futures))
+            for future in futures:
+                future.add_done_callback(on_done)
+        timeline = [
+            {
+                "start": round(ranges[0][0] / SAMPLE_RATE, 2),
+                "end": round(ranges[-1][1] / SAMPLE_RATE, 2),
+                "text": future.result(),
+            }
+            for ranges, future in zip(segments, futures)
+        ]
+        return stitch(seg["text"] for seg in timeline), timeline
+
+    def _recognize(self, pcm, ranges):
+        # El audio se lee en el hilo del pool: solo los segmentos en curso
+        # ocupan memoria, no la grabación completa
+        return self.recognizer.recognize(b"".join(np.asarray(pcm[a:b]).tobytes() for a, b in ranges))
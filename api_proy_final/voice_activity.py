@@ -0,0 +1,116 @@
+"""
+Detección de voz previa a la transcripción
+Clasifica frames de 30 ms del PCM int16 por energía y tasa de cruces por cero,
+por bloques y a medida que llega el audio, y solo deja pasar los tramos con voz
+(más un margen) para no mandar silencio ni ruido al reconocedor
+"""
+
+import numpy as np
+
+
+class VoiceActivityDetector:
+    """
+    energy_ratio: veces sobre el piso de ruido que debe superar la energía de un frame
+    min_rms:      energía absoluta mínima (RMS en unidades int16) para considerar voz
+    max_zcr:      tasa de cruces por cero (0-1) sobre la cual un frame débil se toma
+                  como ruido (el siseo cruza mucho más que la voz sonora)
+    hangover_ms:  margen conservado antes y después de cada tramo de voz
+
+    feed() devuelve los tramos con voz con un retraso de hangover_ms (necesita
+    ver los frames siguientes para decidir el margen); flush() entrega el resto.
+    """
+
+    def __init__(self, sample_rate=16000, frame_ms=30, energy_ratio=3.0, min_rms=150.0,
+                 max_zcr=0.35, hangover_ms=300):
+        self.frame_ms = frame_ms
+        self.frame_len = sample_rate * frame_ms // 1000
+        self.frame_bytes = self.frame_len * 2
+        self.energy_ratio = energy_ratio
+        self.min_energy = min_rms ** 2
+        self.max_zcr = max_zcr
+        self.hang = max(1, hangover_ms // frame_ms)
+
+        self.noise_floor = None
+        self._tail = b""           # bytes de un frame incompleto
+        self._pending = b""        # frames aún sin decidir (esperan el margen)
+        self._pending_start = 0    # índice del primer frame pendiente
+        self._mask = np.zeros(0, dtype=bool)  # voz de los frames [pending_start - hang, ...)
+
+        self.frames = 0
+        self.speech_frames = 0
+        self.kept_frames = 0
+
+    def classify(self, samples):
+        """Máscara de voz para un bloque de frames completos (arreglo int16 2D)"""
+        frames = samples.astype(np.float32)
+        energy = np.square(frames).mean(axis=1)
+        zcr = np.count_nonzero(np.diff(np.signbit(samples), axis=1), axis=1) / self.frame_len
+
+        # Piso de ruido: los frames más silenciosos del bloque; puede subir como
+        # mucho un 10 % por segundo de audio (ruido ambiente que aumenta)
+        block_floor = float(np.percentile(energy, 10))
+        if self.noise_floor is None:
+            self.noise_floor = block_floor
+        else:
+            rise = 1.1 ** (len(energy) * self.frame_ms / 1000)
+            self.noise_floor = min(block_floor, self.noise_floor * rise)
+
+        threshold = max(self.min_energy, self.noise_floor * self.energy_ratio)
+        speech = (energy > threshold) & ((zcr < self.max_zcr) | (energy > 4 * threshold))
+        self.frames += len(speech)
+        self.speech_frames += int(np.count_nonzero(speech))
+        return speech
+
+    def feed(self, chunk):
+        """Procesar bytes recibidos; devuelve [(offset en bytes, bytes con voz), ...]"""
+        data = self._tail + chunk
+        n = len(data) // self.frame_bytes
+        self._tail = data[n * self.frame_bytes:]
+        if n == 0:
+            return []
+        samples = np.frombuffer(data[:n * self.frame_bytes], dtype=np.int16).reshape(n, self.frame_len)
+        self._mask = np.concatenate([self._mask, self.classify(samples)])
+        self._pending += data[:n * self.frame_bytes]
+        return self._emit(final=False)
+
+    def flush(self):
+        """Fin del audio: decidir los frames pendientes (el frame incompleto se descarta)"""
+        self._tail = b""
+        return self._emit(final=True)
+
+    def _emit(self, final):
+        history = min(self.hang, self._pending_start)
+        pending = len(self._pending) // self.frame_bytes
+        ready = pending if final else max(0, pending - self.hang)
+        if ready == 0:
+            return []
+
+        # Un frame se conserva si hay voz a menos de hang frames (antes o después)
+        width = 2 * self.hang + 1
+        near = np.convolve(self._mask.astype(np.int32), np.ones(width, dtype=np.int32), mode="same") > 0
+        keep = near[history:history + ready]
+        self.kept_frames += int(np.count_nonzero(keep))
+
+        pieces = []
+        edges = np.flatnonzero(np.diff(np.concatenate(([False], keep, [False])).astype(np.int8)))
+        for first, last in zip(edges[::2], edges[1::2]):
+            offset = int(self._pending_start + first) * self.frame_bytes
+            pieces.append((offset, self._pending[first * self.frame_bytes:last * self.frame_bytes]))
+
+        self._pending = self._pending[ready * self.frame_bytes:]
+        self._pending_start += ready
+        self._mask = self._mask[history + ready - min(self.hang, self._pending_start):]
+        return pieces
+
+    @property
+    def speech_ratio(self):
+        return self.speech_frames / self.frames if self.frames else 0.0
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "speech_frames": self.speech_frames,
+            "kept_frames": self.kept_frames,
+            "speech_ratio": round(self.speech_ratio, 3),
+            "noise_floor_rms": round(self.noise_floor ** 0.5, 1) if self.noise_floor is not None else None,
+        }